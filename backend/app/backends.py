@@ -0,0 +1,194 @@
+import os
+from functools import cached_property
+from typing import Any, Dict, Optional
+from sqlalchemy import MetaData, Text, text
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.engine import Connection, Engine, make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+from sqlalchemy.types import TypeDecorator
+from sqlmodel import create_engine
+from .db_config import SCHEMA_VERSION, install_sqlite_pragmas, migrate, pool_options, sqlite_connect_args
+
+DEFAULT_DB_URL = "sqlite:///./fitness_agent.db"
+
+
+class JSONText(TypeDecorator):
+    """Encoded JSON (bytes in Python); stored as JSONB on PostgreSQL, TEXT elsewhere.
+
+    Values are written exactly as serialization.dumps produced them and come
+    back as bytes; PostgreSQL engines pass the text straight through (see
+    PostgresBackend), so JSON is never parsed just to cross the driver boundary.
+    """
+
+    impl = Text
+    cache_ok = True
+
+    def load_dialect_impl(self, dialect):
+        if dialect.name == "postgresql":
+            return dialect.type_descriptor(JSONB())
+        return dialect.type_descriptor(Text())
+
+    def process_bind_param(self, value, dialect):
+        return _raw_json(value)
+
+    def process_result_value(self, value, dialect):
+        return value.encode("utf-8") if isinstance(value, str) else value
+
+
+def _raw_json(value: Any) -> Any:
+    return bytes(value).decode("utf-8") if isinstance(value, (bytes, bytearray, memoryview)) else value
+
+
+class StorageBackend:
+    """Connection layer behind storage.py.
+
+    Owns the primary engines (sync + async), optional read-replica engines for
+    log reads, the dialect's INSERT construct (for ON CONFLICT upserts) and
+    schema setup. storage.upsert_profile / save_plan / add_log / get_logs and
+    the other helpers run on whichever backend is configured.
+    """
+
+    name = "base"
+    async_driver = ""
+
+    def __init__(self, url: str, read_url: Optional[str] = None):
+        self.url = url
+        self.read_url = read_url
+
+    # Engines (and their pools) are created on first use, not at import
+
+    @cached_property
+    def engine(self) -> Engine:
+        return self._create_engine(self.url)
+
+    @cached_property
+    def async_engine(self) -> AsyncEngine:
+        return self._create_async_engine(self._async_url(self.url))
+
+    @cached_property
+    def read_engine(self) -> Engine:
+        return self._create_engine(self.read_url) if self.read_url else self.engine
+
+    @cached_property
+    def async_read_engine(self) -> AsyncEngine:
+        return self._create_async_engine(self._async_url(self.read_url)) if self.read_url else self.async_engine
+
+    def _async_url(self, url: str) -> str:
+        return str(make_url(url).set(drivername=f"{make_url(url).get_backend_name()}+{self.async_driver}"))
+
+    def _engine_options(self) -> Dict[str, Any]:
+        return {"echo": False, **pool_options()}
+
+    def _create_engine(self, url: str) -> Engine:
+        return create_engine(url, **self._engine_options())
+
+    def _create_async_engine(self, url: str) -> AsyncEngine:
+        return create_async_engine(url, **self._engine_options())
+
+    def insert(self, table):
+        raise NotImplementedError
+
+    def schema_version(self, conn: Connection) -> int:
+        raise NotImplementedError
+
+    def set_schema_version(self, conn: Connection, version: int) -> None:
+        raise NotImplementedError
+
+    def init_schema(self, metadata: MetaData) -> int:
+        # A database already at SCHEMA_VERSION needs neither create_all nor migrations
+        with self.engine.begin() as conn:
+            found = self.schema_version(conn)
+        if found >= SCHEMA_VERSION:
+            return found
+        metadata.create_all(self.engine)
+        return migrate(self.engine, self.schema_version, self.set_schema_version)
+
+    def dispose(self) -> None:
+        # Only engines that were actually created; adispose() also closes the async ones
+        for name in ("engine", "read_engine"):
+            eng = self.__dict__.get(name)
+            if eng is not None:
+                eng.dispose()
+
+    async def adispose(self) -> None:
+        for name in ("async_engine", "async_read_engine"):
+            eng = self.__dict__.get(name)
+            if eng is not None:
+                await eng.dispose()
+        self.dispose()
+
+
+class SQLiteBackend(StorageBackend):
+    name = "sqlite"
+    async_driver = "aiosqlite"
+
+    def __init__(self, url: str = DEFAULT_DB_URL, read_url: Optional[str] = None):
+        # A replica makes no sense for a local file; reads share the primary
+        super().__init__(url, None)
+
+    def _engine_options(self) -> Dict[str, Any]:
+        return {**super()._engine_options(), "connect_args": sqlite_connect_args()}
+
+    def _create_engine(self, url: str) -> Engine:
+        eng = super()._create_engine(url)
+        install_sqlite_pragmas(eng)
+        return eng
+
+    def _create_async_engine(self, url: str) -> AsyncEngine:
+        eng = super()._create_async_engine(url)
+        install_sqlite_pragmas(eng.sync_engine)
+        return eng
+
+    def insert(self, table):
+        return sqlite.insert(table)
+
+    def schema_version(self, conn: Connection) -> int:
+        return conn.execute(text("PRAGMA user_version")).scalar() or 0
+
+    def set_schema_version(self, conn: Connection, version: int) -> None:
+        conn.execute(text(f"PRAGMA user_version={int(version)}"))
+
+
+class PostgresBackend(StorageBackend):
+    name = "postgresql"
+    async_driver = "psycopg"
+
+    def __init__(self, url: str, read_url: Optional[str] = None):
+        # psycopg 3 serves both the sync and the async engine
+        super().__init__(self._with_driver(url), self._with_driver(read_url) if read_url else None)
+
+    @staticmethod
+    def _with_driver(url: str) -> str:
+        u = make_url(url)
+        return str(u.set(drivername="postgresql+psycopg")) if u.drivername == "postgresql" else url
+
+    def _engine_options(self) -> Dict[str, Any]:
+        return {
+            **super()._engine_options(),
+            "pool_pre_ping": True,
+            "json_serializer": _raw_json,
+            "json_deserializer": _raw_json,
+        }
+
+    def insert(self, table):
+        return postgresql.insert(table)
+
+    def schema_version(self, conn: Connection) -> int:
+        conn.execute(text("CREATE TABLE IF NOT EXISTS schema_version (version INTEGER NOT NULL)"))
+        return conn.execute(text("SELECT MAX(version) FROM schema_version")).scalar() or 0
+
+    def set_schema_version(self, conn: Connection, version: int) -> None:
+        conn.execute(text("DELETE FROM schema_version"))
+        conn.execute(text("INSERT INTO schema_version (version) VALUES (:v)"), {"v": int(version)})
+
+
+BACKENDS = {"sqlite": SQLiteBackend, "postgresql": PostgresBackend}
+
+
+def backend_from_env() -> StorageBackend:
+    url = os.getenv("DB_URL", DEFAULT_DB_URL)
+    kind = make_url(url).get_backend_name()
+    if kind not in BACKENDS:
+        raise RuntimeError(f"Unsupported DB_URL backend: {kind!r}")
+    return BACKENDS[kind](url, os.getenv("DB_READ_URL") or None)
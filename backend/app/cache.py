@@ -0,0 +1,405 @@
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Protocol, Tuple
+
+# Lives next to fitness_agent.db (both are relative to the working directory)
+DEFAULT_DISK_PATH = "./llm_cache.db"
+
+
+class ResponseCache(Protocol):
+    def get(self, key: str) -> Optional[str]: ...
+    def set(self, key: str, value: str) -> None: ...
+    async def aget(self, key: str) -> Optional[str]: ...
+    async def aset(self, key: str, value: str) -> None: ...
+    def stats(self) -> Dict[str, int]: ...
+
+
+def _normalize(text: str) -> str:
+    # Indentation and trailing blanks from f-string prompts shouldn't split the key
+    return "\n".join(line.strip() for line in text.strip().splitlines())
+
+
+def prompt_key(model: str, system: str, user: str, temperature: float) -> str:
+    payload = json.dumps(
+        [model, _normalize(system), _normalize(user), round(float(temperature), 3)],
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class SQLiteTier:
+    def __init__(self, path: str = DEFAULT_DISK_PATH, ttl_seconds: float = 86400.0):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS llm_cache ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, created_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[Tuple[str, float]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, created_at FROM llm_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if time.time() - row[1] > self.ttl_seconds:
+                self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                self._conn.commit()
+                return None
+            return row[0], row[1]
+
+    def set(self, key: str, value: str, created_at: float) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, value, created_at) VALUES (?, ?, ?)",
+                (key, value, created_at),
+            )
+            self._conn.commit()
+
+
+class LLMResponseCache:
+    """Two-tier cache: in-process LRU with TTL, optionally backed by SQLite."""
+
+    def __init__(
+        self,
+        max_entries: int = 1024,
+        max_bytes: int = 16 * 1024 * 1024,
+        ttl_seconds: float = 3600.0,
+        disk: Optional[SQLiteTier] = None,
+    ):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.disk = disk
+        self._lock = threading.Lock()
+        self._items: "OrderedDict[str, Tuple[str, float, int]]" = OrderedDict()
+        self._bytes = 0
+        self._stats = {"hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0, "expired": 0}
+
+    def get(self, key: str) -> Optional[str]:
+        value = self._memory(key)
+        if value is None and self.disk is not None:
+            value = self._promote(key, self.disk.get(key))
+        return self._counted(value)
+
+    async def aget(self, key: str) -> Optional[str]:
+        """get() for the event loop: the SQLite tier is read in a worker thread."""
+        value = self._memory(key)
+        if value is None and self.disk is not None:
+            value = self._promote(key, await asyncio.to_thread(self.disk.get, key))
+        return self._counted(value)
+
+    def set(self, key: str, value: str) -> None:
+        now = time.time()
+        with self._lock:
+            self._put(key, value, now)
+        if self.disk is not None:
+            self.disk.set(key, value, now)
+
+    async def aset(self, key: str, value: str) -> None:
+        now = time.time()
+        with self._lock:
+            self._put(key, value, now)
+        if self.disk is not None:
+            await asyncio.to_thread(self.disk.set, key, value, now)
+
+    def _memory(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            item = self._items.get(key)
+            if item is not None:
+                value, created_at, _ = item
+                if now - created_at <= self.ttl_seconds:
+                    self._items.move_to_end(key)
+                    self._stats["hits"] += 1
+                    return value
+                self._drop(key)
+                self._stats["expired"] += 1
+        return None
+
+    def _promote(self, key: str, found: Optional[Tuple[str, float]]) -> Optional[str]:
+        if found is None:
+            return None
+        value, created_at = found
+        with self._lock:
+            self._stats["disk_hits"] += 1
+            self._put(key, value, created_at)
+        return value
+
+    def _counted(self, value: Optional[str]) -> Optional[str]:
+        if value is None:
+            with self._lock:
+                self._stats["misses"] += 1
+        return value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {**self._stats, "entries": len(self._items), "bytes": self._bytes}
+
+    # Callers hold self._lock
+    def _put(self, key: str, value: str, created_at: float) -> None:
+        size = len(value.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        if key in self._items:
+            self._drop(key)
+        self._items[key] = (value, created_at, size)
+        self._bytes += size
+        while len(self._items) > self.max_entries or self._bytes > self.max_bytes:
+            oldest = next(iter(self._items))
+            self._drop(oldest)
+            self._stats["evictions"] += 1
+
+    def _drop(self, key: str) -> None:
+        _, _, size = self._items.pop(key)
+        self._bytes -= size
+
+
+class PlanCache:
+    """In-process LRU of decoded plan records, grouped by profile.
+
+    Each profile entry holds its latest plan plus any plans fetched by id, and
+    is dropped as a whole by invalidate(profile_id). A fill started before an
+    invalidation is discarded (see version()), so a slow read can't re-cache
+    stale data. Cached records are shared; callers must not mutate them.
+    """
+
+    def __init__(self, max_profiles: int = 1024):
+        self.max_profiles = max_profiles
+        self._lock = threading.Lock()
+        # profile_id -> {"name": str, "latest": plan_id | None, "plans": {plan_id: record}}
+        self._profiles: "OrderedDict[int, Dict[str, Any]]" = OrderedDict()
+        self._names: Dict[str, int] = {}
+        self._owners: Dict[int, int] = {}
+        # PlanContent fingerprint -> profiles holding a record built from it
+        self._content: Dict[str, set] = {}
+        self._version = 0
+        self._stats = {"hits": 0, "misses": 0, "invalidations": 0, "evictions": 0}
+
+    def version(self) -> int:
+        return self._version
+
+    def latest(self, profile_name: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            pid = self._names.get(profile_name)
+            entry = self._profiles.get(pid) if pid is not None else None
+            if entry is None or entry["latest"] is None:
+                self._stats["misses"] += 1
+                return None
+            self._profiles.move_to_end(pid)
+            self._stats["hits"] += 1
+            return entry["plans"][entry["latest"]]
+
+    def get(self, plan_id: int) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            pid = self._owners.get(plan_id)
+            if pid is None:
+                self._stats["misses"] += 1
+                return None
+            self._profiles.move_to_end(pid)
+            self._stats["hits"] += 1
+            return self._profiles[pid]["plans"][plan_id]
+
+    def put(self, rec: Dict[str, Any], version: int, latest: bool = False) -> None:
+        """Cache `rec` (which must carry id, profile_id and profile_name) if nothing was invalidated since `version`."""
+        if self.max_profiles <= 0:
+            return
+        with self._lock:
+            if version != self._version:
+                return
+            pid = rec["profile_id"]
+            entry = self._profiles.get(pid)
+            if entry is None:
+                entry = self._profiles[pid] = {"name": rec["profile_name"], "latest": None, "plans": {}}
+                self._names[rec["profile_name"]] = pid
+            entry["plans"][rec["id"]] = rec
+            self._owners[rec["id"]] = pid
+            if rec.get("content_key"):
+                self._content.setdefault(rec["content_key"], set()).add(pid)
+            if latest:
+                entry["latest"] = rec["id"]
+            self._profiles.move_to_end(pid)
+            while len(self._profiles) > self.max_profiles:
+                self._drop(next(iter(self._profiles)))
+                self._stats["evictions"] += 1
+
+    def invalidate(self, profile_id: int) -> None:
+        with self._lock:
+            self._version += 1
+            self._stats["invalidations"] += 1
+            if profile_id in self._profiles:
+                self._drop(profile_id)
+
+    def invalidate_content(self, content_key: str) -> None:
+        """Drop every profile whose cached plans share the rewritten content."""
+        with self._lock:
+            self._version += 1
+            self._stats["invalidations"] += 1
+            for pid in self._content.pop(content_key, ()):
+                if pid in self._profiles:
+                    self._drop(pid)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._version += 1
+            self._profiles.clear()
+            self._names.clear()
+            self._owners.clear()
+            self._content.clear()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                **self._stats,
+                "profiles": len(self._profiles),
+                "plans": len(self._owners),
+            }
+
+    # Callers hold self._lock
+    def _drop(self, profile_id: int) -> None:
+        entry = self._profiles.pop(profile_id)
+        if self._names.get(entry["name"]) == profile_id:
+            del self._names[entry["name"]]
+        for plan_id, rec in entry["plans"].items():
+            self._owners.pop(plan_id, None)
+            holders = self._content.get(rec.get("content_key"))
+            if holders is not None:
+                holders.discard(profile_id)
+                if not holders:
+                    del self._content[rec["content_key"]]
+
+
+class ProgressCache:
+    """In-process LRU of each profile's log columns and the progress computed from them.
+
+    add_log appends its row to a cached profile (append()) instead of dropping
+    it, so the next /progress folds the new rows into the columns without
+    re-reading the history; a rewrite of existing rows drops the profile
+    (invalidate()). A fill started before a write to the same profile is
+    discarded (see version()). Columns and results are opaque here; see
+    progress.py. Cached values are shared; callers must not mutate them.
+    """
+
+    def __init__(self, max_profiles: int = 256):
+        self.max_profiles = max_profiles
+        self._lock = threading.Lock()
+        # profile_id -> {"columns": ..., "pending": [row, ...], "result": ... | None}
+        self._profiles: "OrderedDict[int, Dict[str, Any]]" = OrderedDict()
+        # profile_id -> version of its latest write, oldest first; bounded, and
+        # fills older than the newest forgotten write are refused outright
+        self._writes: "OrderedDict[int, int]" = OrderedDict()
+        self._max_writes = max(1024, 4 * max_profiles)
+        self._forgotten = 0
+        self._version = 0
+        self._stats = {"hits": 0, "misses": 0, "appends": 0, "invalidations": 0, "evictions": 0}
+
+    def version(self) -> int:
+        return self._version
+
+    def get(self, profile_id: int) -> Optional[Tuple[Any, List[Any], Any]]:
+        """(columns, rows appended since, result or None) for a cached profile."""
+        with self._lock:
+            entry = self._profiles.get(profile_id)
+            if entry is None:
+                self._stats["misses"] += 1
+                return None
+            self._profiles.move_to_end(profile_id)
+            self._stats["hits"] += 1
+            return entry["columns"], list(entry["pending"]), entry["result"]
+
+    def put(self, profile_id: int, columns: Any, result: Any, version: int) -> None:
+        """Cache freshly loaded columns unless the profile was written since `version`."""
+        if self.max_profiles <= 0:
+            return
+        with self._lock:
+            if version < self._forgotten or self._writes.get(profile_id, 0) > version:
+                return
+            self._profiles[profile_id] = {"columns": columns, "pending": [], "result": result}
+            self._profiles.move_to_end(profile_id)
+            while len(self._profiles) > self.max_profiles:
+                self._profiles.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    def fold(self, profile_id: int, columns: Any, merged: Any, folded: int, result: Any) -> None:
+        """Replace `columns` with `merged` (them plus the first `folded` appended rows) and its result."""
+        with self._lock:
+            entry = self._profiles.get(profile_id)
+            if entry is None or entry["columns"] is not columns:
+                return
+            entry["columns"] = merged
+            del entry["pending"][:folded]
+            entry["result"] = None if entry["pending"] else result
+
+    def append(self, profile_id: int, row: Any) -> None:
+        """Record a newly inserted log row; call after its transaction commits."""
+        with self._lock:
+            self._written(profile_id)
+            entry = self._profiles.get(profile_id)
+            if entry is not None:
+                entry["pending"].append(row)
+                entry["result"] = None
+                self._stats["appends"] += 1
+
+    def invalidate(self, profile_id: int) -> None:
+        with self._lock:
+            self._written(profile_id)
+            self._stats["invalidations"] += 1
+            self._profiles.pop(profile_id, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._version += 1
+            self._forgotten = self._version
+            self._profiles.clear()
+            self._writes.clear()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {**self._stats, "profiles": len(self._profiles)}
+
+    # Callers hold self._lock
+    def _written(self, profile_id: int) -> None:
+        self._version += 1
+        self._writes[profile_id] = self._version
+        self._writes.move_to_end(profile_id)
+        if len(self._writes) > self._max_writes:
+            self._forgotten = self._writes.popitem(last=False)[1]
+
+
+def _env_flag(name: str, default: str) -> bool:
+    return os.getenv(name, default).strip().lower() in ("1", "true", "yes", "on")
+
+
+def cache_from_env() -> Optional[LLMResponseCache]:
+    if not _env_flag("LLM_CACHE_ENABLED", "1"):
+        return None
+
+    ttl = float(os.getenv("LLM_CACHE_TTL_SECONDS", "3600"))
+    disk = None
+    if _env_flag("LLM_CACHE_PERSIST", "0"):
+        path = os.getenv("LLM_CACHE_DB_PATH", DEFAULT_DISK_PATH)
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        disk = SQLiteTier(path, ttl_seconds=float(os.getenv("LLM_CACHE_DISK_TTL_SECONDS", "86400")))
+
+    return LLMResponseCache(
+        max_entries=int(os.getenv("LLM_CACHE_MAX_ENTRIES", "1024")),
+        max_bytes=int(os.getenv("LLM_CACHE_MAX_BYTES", str(16 * 1024 * 1024))),
+        ttl_seconds=ttl,
+        disk=disk,
+    )
@@ -0,0 +1,133 @@
+import os
+from typing import Any, Callable, Dict, List, Tuple
+from sqlalchemy import event, inspect, text
+from sqlalchemy.engine import Connection, Engine
+
+
+def _env_int(name: str, default: int) -> int:
+    return int(os.getenv(name, str(default)))
+
+
+def sqlite_pragmas() -> Dict[str, Any]:
+    """Per-connection pragmas. WAL lets readers run alongside the single writer."""
+    return {
+        "journal_mode": os.getenv("SQLITE_JOURNAL_MODE", "WAL"),
+        "synchronous": os.getenv("SQLITE_SYNCHRONOUS", "NORMAL"),
+        "busy_timeout": _env_int("SQLITE_BUSY_TIMEOUT_MS", 5000),
+        "cache_size": -_env_int("SQLITE_CACHE_KB", 65536),   # negative = KiB
+        "mmap_size": _env_int("SQLITE_MMAP_BYTES", 256 * 1024 * 1024),
+        "temp_store": "MEMORY",
+    }
+
+
+def sqlite_connect_args() -> Dict[str, Any]:
+    return {
+        "check_same_thread": False,
+        "timeout": _env_int("SQLITE_BUSY_TIMEOUT_MS", 5000) / 1000,
+        # sqlite3's per-connection prepared statement cache
+        "cached_statements": _env_int("SQLITE_STATEMENT_CACHE", 256),
+    }
+
+
+def pool_options() -> Dict[str, Any]:
+    return {
+        "pool_size": _env_int("DB_POOL_SIZE", 8),
+        "max_overflow": _env_int("DB_POOL_MAX_OVERFLOW", 8),
+        "pool_timeout": _env_int("DB_POOL_TIMEOUT_SECONDS", 30),
+    }
+
+
+def install_sqlite_pragmas(engine: Engine) -> None:
+    """Apply sqlite_pragmas() on every new DBAPI connection (sync or aiosqlite)."""
+    pragmas = sqlite_pragmas()
+
+    @event.listens_for(engine, "connect")
+    def _on_connect(dbapi_conn, _record):
+        cur = dbapi_conn.cursor()
+        for name, value in pragmas.items():
+            cur.execute(f"PRAGMA {name}={value}")
+        cur.close()
+
+
+# ---- schema migrations; each backend decides where the version number lives ----
+
+def _dedupe_profile_names(conn: Connection) -> None:
+    # Older databases could hold several rows per name; fold them into the oldest
+    dupes = conn.execute(text(
+        "SELECT name, MIN(id) FROM profile GROUP BY name HAVING COUNT(*) > 1"
+    )).all()
+    for name, keep in dupes:
+        params = {"name": name, "keep": keep}
+        others = "SELECT id FROM profile WHERE name = :name AND id != :keep"
+        conn.execute(text(f"UPDATE plan SET profile_id = :keep WHERE profile_id IN ({others})"), params)
+        conn.execute(text(f"UPDATE log SET profile_id = :keep WHERE profile_id IN ({others})"), params)
+        conn.execute(text("DELETE FROM profile WHERE name = :name AND id != :keep"), params)
+    if dupes:
+        conn.execute(text("DELETE FROM logweek"))  # rebuilt by init_db
+
+
+def _v1_indexes(conn: Connection) -> None:
+    _dedupe_profile_names(conn)
+    conn.execute(text("DROP INDEX IF EXISTS ix_profile_name"))
+    conn.execute(text("CREATE UNIQUE INDEX IF NOT EXISTS ix_profile_name ON profile (name)"))
+    conn.execute(text("DROP INDEX IF EXISTS ix_log_profile_id"))
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_log_profile_date ON log (profile_id, date)"))
+
+
+def _v2_plan_index(conn: Connection) -> None:
+    # Latest-plan lookups are "profile_id = ? ORDER BY created_at DESC"
+    conn.execute(text("DROP INDEX IF EXISTS ix_plan_profile_id"))
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_plan_profile_created ON plan (profile_id, created_at)"))
+
+
+def _add_column(conn: Connection, table: str, column: str, ddl: str) -> None:
+    # create_all already adds the column on fresh databases
+    if column not in {c["name"] for c in inspect(conn).get_columns(table)}:
+        conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}"))
+
+
+def _v3_plan_content(conn: Connection) -> None:
+    # The plancontent table itself comes from create_all
+    _add_column(conn, "plan", "content_key", "VARCHAR")
+
+
+def _v4_review(conn: Connection) -> None:
+    # The review table comes from create_all; nothing to alter
+    pass
+
+
+def _v5_idempotency(conn: Connection) -> None:
+    # The idempotentresponse table comes from create_all; nothing to alter
+    pass
+
+
+def _v6_plan_profile(conn: Connection) -> None:
+    # Existing plans keep NULL and are served with the current profile
+    _add_column(conn, "plan", "profile_json", "JSONB" if conn.dialect.name == "postgresql" else "TEXT")
+
+
+MIGRATIONS: List[Tuple[int, Callable[[Connection], None]]] = [
+    (1, _v1_indexes),
+    (2, _v2_plan_index),
+    (3, _v3_plan_content),
+    (4, _v4_review),
+    (5, _v5_idempotency),
+    (6, _v6_plan_profile),
+]
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+def migrate(
+    engine: Engine,
+    get_version: Callable[[Connection], int],
+    set_version: Callable[[Connection, int], None],
+) -> int:
+    """Bring an existing database up to SCHEMA_VERSION; returns the version found."""
+    with engine.begin() as conn:
+        found = get_version(conn)
+        for version, step in MIGRATIONS:
+            if version > found:
+                step(conn)
+        if found < SCHEMA_VERSION:
+            set_version(conn, SCHEMA_VERSION)
+    return found
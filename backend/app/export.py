@@ -0,0 +1,253 @@
+"""Bulk export of logs, plans and profiles as NDJSON, CSV or Parquet.
+
+GET /export/{table} and this CLI share aexport(): rows come from
+storage.aexport_rows through a server-side cursor in fixed-size chunks, and
+each chunk is encoded and handed on before the next one is read, so memory
+stays flat whatever the table size. Exports read in short transactions (on
+DB_READ_URL when set) and never block /log writers.
+
+    python -m backend.app.export logs --format csv --since 2026-01-01 -o logs.csv
+    python -m backend.app.export plans --after-id 120000 > plans.ndjson
+
+Rows are in id order. For incremental pulls pass the previous run's last_id
+(printed on stderr) as --after-id. Ids only find new rows: logs replaced by
+/logs/bulk and profiles updated by /plan keep their ids, so pick those up with
+--since (logs, plans) or a full export. Parquet needs pyarrow.
+"""
+import argparse
+import asyncio
+import csv
+import io
+import os
+import sys
+import time
+from datetime import date
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, List, Literal, Optional, Tuple, get_args
+
+from dotenv import load_dotenv
+
+load_dotenv(Path(__file__).resolve().parents[1] / ".env")
+
+from .serialization import Fragment, dumps
+from .storage import aexport_rows, init_db
+
+ExportTable = Literal["logs", "plans", "profiles"]
+ExportFormat = Literal["ndjson", "csv", "parquet"]
+
+# Output columns per table; "json" columns hold encoded JSON (nested in NDJSON, text elsewhere)
+COLUMNS: Dict[str, Tuple[Tuple[str, str], ...]] = {
+    "logs": (("id", "int64"), ("profile_id", "int64"), ("date", "string"), ("workout_done", "bool"),
+             ("steps", "int64"), ("weight_kg", "float64"), ("notes", "string")),
+    "plans": (("id", "int64"), ("profile_id", "int64"), ("created_at", "string"), ("content_key", "string"),
+              ("plan", "json"), ("warnings", "json")),
+    "profiles": (("id", "int64"), ("name", "string"), ("data", "json")),
+}
+MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv; charset=utf-8",
+               "parquet": "application/vnd.apache.parquet"}
+
+EXPORT_CHUNK_ROWS = int(os.getenv("EXPORT_CHUNK_ROWS", "1000"))
+# Rows buffered per Parquet row group (the only thing a Parquet export holds in memory)
+EXPORT_PARQUET_ROW_GROUP = int(os.getenv("EXPORT_PARQUET_ROW_GROUP", "65536"))
+
+
+def check_export(table: str, fmt: str, since: Optional[str]) -> Optional[str]:
+    """Validate export arguments; returns `since` as YYYY-MM-DD. Raises ValueError."""
+    if table not in COLUMNS:
+        raise ValueError(f"table must be one of {', '.join(COLUMNS)}")
+    if fmt not in MEDIA_TYPES:
+        raise ValueError(f"format must be one of {', '.join(MEDIA_TYPES)}")
+    if since is None:
+        return None
+    if table == "profiles":
+        raise ValueError("profiles have no date to filter on; use after_id")
+    try:
+        return date.fromisoformat(since).isoformat()
+    except ValueError:
+        raise ValueError("since must be a YYYY-MM-DD date")
+
+
+def parquet_available() -> bool:
+    try:
+        import pyarrow.parquet  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def _text(value: Any) -> Any:
+    return value.decode("utf-8") if isinstance(value, bytes) else value
+
+
+class _NDJSONEncoder:
+    def __init__(self, table: str):
+        self.names = [n for n, _ in COLUMNS[table]]
+        self.json = [t == "json" for _, t in COLUMNS[table]]
+
+    def write(self, rows: List[Any]) -> bytes:
+        names, json = self.names, self.json
+        # Stored JSON is spliced in as is, never parsed
+        return b"".join(
+            dumps({n: Fragment(v) if j and v is not None else v for n, j, v in zip(names, json, row)}) + b"\n"
+            for row in rows
+        )
+
+    def close(self) -> bytes:
+        return b""
+
+
+class _CSVEncoder:
+    def __init__(self, table: str):
+        self.header: Optional[List[str]] = [n for n, _ in COLUMNS[table]]
+        self.buf = io.StringIO()
+        self.writer = csv.writer(self.buf, lineterminator="\n")
+
+    def write(self, rows: List[Any]) -> bytes:
+        if self.header is not None:
+            self.writer.writerow(self.header)
+            self.header = None
+        self.writer.writerows([_text(v) for v in row] for row in rows)
+        out = self.buf.getvalue().encode("utf-8")
+        self.buf.seek(0)
+        self.buf.truncate()
+        return out
+
+    def close(self) -> bytes:
+        return self.write([])
+
+
+class _Sink:
+    """Write-only file object for ParquetWriter; drain() hands over what was written since."""
+
+    def __init__(self):
+        self.buf = bytearray()
+        self.pos = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        self.buf += data
+        self.pos += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self.pos
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self.closed = True
+
+    def drain(self) -> bytes:
+        out = bytes(self.buf)
+        self.buf.clear()
+        return out
+
+
+class _ParquetEncoder:
+    def __init__(self, table: str):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        self.pa = pa
+        types = {"int64": pa.int64(), "bool": pa.bool_(), "float64": pa.float64(), "string": pa.string(),
+                 "json": pa.string()}
+        self.schema = pa.schema([(n, types[t]) for n, t in COLUMNS[table]])
+        self.sink = _Sink()
+        self.writer = pq.ParquetWriter(self.sink, self.schema)
+        self.pending: List[Any] = []
+        self.pending_rows = 0
+
+    def write(self, rows: List[Any]) -> bytes:
+        if rows:
+            # Encoded JSON goes in as bytes; string columns take UTF-8 as is
+            self.pending.append(self.pa.record_batch(
+                [self.pa.array(col, f.type) for f, col in zip(self.schema, zip(*rows))], schema=self.schema,
+            ))
+            self.pending_rows += len(rows)
+        if self.pending_rows >= EXPORT_PARQUET_ROW_GROUP:
+            self._flush()
+        return self.sink.drain()
+
+    def close(self) -> bytes:
+        self._flush()
+        self.writer.close()
+        return self.sink.drain()
+
+    def _flush(self) -> None:
+        if self.pending:
+            self.writer.write_table(self.pa.Table.from_batches(self.pending), row_group_size=self.pending_rows)
+            self.pending, self.pending_rows = [], 0
+
+
+ENCODERS = {"ndjson": _NDJSONEncoder, "csv": _CSVEncoder, "parquet": _ParquetEncoder}
+
+
+async def aexport(
+    table: str, fmt: str = "ndjson", after_id: int = 0, since: Optional[str] = None,
+    chunk: int = EXPORT_CHUNK_ROWS, counts: Optional[Dict[str, int]] = None,
+) -> AsyncIterator[bytes]:
+    """Encoded export of `table` (arguments as check_export returns them), chunk by chunk.
+
+    `counts`, if given, is kept up to date with the rows written and the last id.
+    """
+    encoder = ENCODERS[fmt](table)
+    counts = {} if counts is None else counts
+    counts.update(rows=0, last_id=after_id)
+    async for rows in aexport_rows(table, after_id, since, chunk):
+        data = encoder.write(rows)
+        counts["rows"] += len(rows)
+        counts["last_id"] = rows[-1][0]
+        if data:
+            yield data
+    tail = encoder.close()
+    if tail:
+        yield tail
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    ap.add_argument("table", choices=get_args(ExportTable))
+    ap.add_argument("--format", choices=get_args(ExportFormat), default="ndjson")
+    ap.add_argument("--after-id", type=int, default=0, help="only rows with a larger id (a previous run's last_id)")
+    ap.add_argument("--since", help="only logs dated, or plans created, on or after YYYY-MM-DD")
+    ap.add_argument("--chunk", type=int, default=EXPORT_CHUNK_ROWS, help="rows read and encoded at a time")
+    ap.add_argument("-o", "--output", help="file to write; default stdout")
+    args = ap.parse_args(argv)
+    try:
+        since = check_export(args.table, args.format, args.since)
+    except ValueError as e:
+        ap.error(str(e))
+    if args.format == "parquet" and not parquet_available():
+        ap.error("Parquet export needs pyarrow (pip install pyarrow)")
+
+    init_db()
+    # Written next to the target and renamed at the end, so a failed run leaves no partial file
+    part = f"{args.output}.part" if args.output else None
+    out = open(part, "wb") if part else sys.stdout.buffer
+    counts: Dict[str, int] = {}
+
+    async def run() -> None:
+        async for data in aexport(args.table, args.format, args.after_id, since, args.chunk, counts):
+            out.write(data)
+
+    start = time.perf_counter()
+    try:
+        asyncio.run(run())
+    except BaseException:
+        if part:
+            out.close()
+            os.unlink(part)
+        raise
+    if part:
+        out.close()
+        os.replace(part, args.output)
+    else:
+        out.flush()
+    print(f"table={args.table} rows={counts['rows']} last_id={counts['last_id']}",
+          f"seconds={time.perf_counter() - start:.1f}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
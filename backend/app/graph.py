@@ -1,13 +1,20 @@
-from typing import TypedDict, Dict, List, Any
-from langgraph.graph import StateGraph, END
-from .llm import generate_text
+import functools
+import hashlib
+from typing import TypedDict, Dict, List, Any, Tuple
+from .llm import agenerate_text, generate_text, real_text
+from .plan_templates import TEMPLATES
+from .resilience import LLMUnavailable
+from .serialization import dumps
+from .telemetry import LLM_RESILIENCE, traced
 
 class State(TypedDict, total=False):
     profile: Dict[str, Any]
     plan: Dict[str, Any]
     warnings: List[str]
     logs: List[Dict[str, Any]]
+    stats: Dict[str, Any]
     review: Dict[str, Any]
+    review_error: str
 
 def intake_normalizer(state: State) -> State:
     state.setdefault("warnings", [])
@@ -29,70 +36,94 @@ def safety_check(state: State) -> State:
     state["warnings"] = warnings
     return state
 
-def plan_workouts(state: State) -> State:
+# Everything the plan graph reads from a profile; `name` deliberately isn't here
+PLAN_INPUT_FIELDS = ("goal", "level", "days_per_week", "session_minutes", "equipment", "weight_kg", "preferences")
+
+def profile_fingerprint(profile: Dict[str, Any]) -> str:
+    """Key for plan content: the safety-checked plan inputs, warnings and template version.
+
+    Profiles that differ only in name share a fingerprint and therefore a plan.
+    """
+    state = safety_check(intake_normalizer({"profile": dict(profile)}))
     p = state["profile"]
-    days = p["days_per_week"]
-    duration = p["session_minutes"]
-    equipment = p["equipment"]
-    goal = p["goal"]
-    level = p["level"]
-
-    workouts = []
-    for d in range(1, days + 1):
-        workouts.append({
-            "day": d,
-            "title": _session_title(goal, d),
-            "duration_minutes": duration,
-            "session": _template_session(goal, equipment, level),
-        })
+    canonical = [TEMPLATES.digest, [p.get(k) for k in PLAN_INPUT_FIELDS], state["warnings"]]
+    return hashlib.sha256(dumps(canonical, sort_keys=True)).hexdigest()
 
+def review_key(logs: List[Dict[str, Any]], stats: Dict[str, Any]) -> str:
+    """Key for a stored review: the logs and weekly aggregates the review graph reads."""
+    return hashlib.sha256(dumps([logs, stats], sort_keys=True)).hexdigest()
+
+def plan_workouts(state: State) -> State:
+    p = state["profile"]
+    workouts = TEMPLATES.workouts(
+        p["goal"], p["equipment"], p["level"], p["days_per_week"], p["session_minutes"]
+    )
     state["plan"] = {"workouts": workouts}
     return state
 
 def plan_nutrition(state: State) -> State:
-    p = state["profile"]
-    weight = p.get("weight_kg")
-
-    protein = None
-    if weight:
-        protein = int(round(1.6 * weight))
-
-    state["plan"]["nutrition"] = {
-        "protein_g_per_day": protein,
-        "plate_method": [
-            "1/2 plate: vegetables/salad",
-            "1/4 plate: protein",
-            "1/4 plate: carbs",
-            "Add healthy fats in small amounts"
-        ],
-        "notes": "Not medical advice. Focus on consistency: protein + fiber + sleep + steps."
-    }
+    state["plan"]["nutrition"] = TEMPLATES.nutrition(state["profile"].get("weight_kg"))
     return state
 
-def plan_explanation_llm(state: State) -> State:
+def _present(v: Any) -> bool:
+    return v is not None and v != "" and v != [] and v != {}
+
+def _fields(d: Dict[str, Any]) -> str:
+    """`key: value` pairs joined with '; ', empty values dropped."""
+    return "; ".join(f"{k}: {v}" for k, v in d.items() if _present(v))
+
+def compact_plan(plan: Dict[str, Any]) -> str:
+    """The plan with each distinct session written once, followed by the days that use it."""
+    groups: Dict[Tuple, List[Dict[str, Any]]] = {}
+    for w in plan.get("workouts", []):
+        s = w["session"]
+        groups.setdefault((w["duration_minutes"], s["warmup"], tuple(s["main"]), s["cooldown"]), []).append(w)
+
+    lines = []
+    for (minutes, warmup, main, cooldown), workouts in groups.items():
+        titles: Dict[str, List[str]] = {}
+        for w in workouts:
+            titles.setdefault(w["title"], []).append(str(w["day"]))
+        days = ", ".join(f"{'/'.join(d)} {title}" for title, d in titles.items())
+        lines.append(f"Days {days} ({minutes} min): warmup {warmup}; main: {'; '.join(main)}; cooldown {cooldown}")
+
+    n = plan.get("nutrition") or {}
+    lines.append("Nutrition: " + _fields({
+        "protein_g_per_day": n.get("protein_g_per_day"),
+        "plate": ", ".join(n.get("plate_method", [])),
+        "notes": n.get("notes"),
+    }))
+    return "\n".join(lines)
+
+LOG_COLUMNS = ("date", "workout_done", "steps", "weight_kg", "notes")
+
+def _cell(v: Any) -> str:
+    if isinstance(v, bool):
+        return "y" if v else "n"
+    return "" if v is None else " ".join(str(v).replace("|", "/").split())
+
+def compact_logs(logs: List[Dict[str, Any]]) -> str:
+    """Logs as a date-ordered `|` table; columns empty on every row are left out."""
+    rows = sorted(logs, key=lambda l: l.get("date") or "")
+    cols = [c for c in LOG_COLUMNS if any(_present(l.get(c)) for l in rows)]
+    return "\n".join(["|".join(cols)] + ["|".join(_cell(l.get(c)) for c in cols) for l in rows])
+
+def plan_explanation_prompt(state: State) -> Tuple[str, str]:
     p = state["profile"]
-    plan = state["plan"]
-    prefs = p.get("preferences", {})
     warnings = state.get("warnings", [])
 
     system = (
         "You are a practical fitness coach. Be concise and encouraging. "
         "No medical advice. Do not invent user details."
     )
-    user = f"""
-User profile:
-- goal: {p['goal']}
-- level: {p['level']}
-- days_per_week: {p['days_per_week']}
-- session_minutes: {p['session_minutes']}
-- equipment: {p['equipment']}
-- weight_kg: {p.get('weight_kg')}
-- preferences: {prefs}
-
-Safety warnings: {warnings}
-
+    profile = {k: p.get(k) for k in PLAN_INPUT_FIELDS}
+    profile["preferences"] = _fields(p.get("preferences") or {})
+    header = ["User: " + _fields(profile)]
+    if warnings:
+        header.append("Safety warnings: " + " ".join(warnings))
+    user = "\n".join(header) + f"""
 Plan:
-{plan}
+{compact_plan(state["plan"])}
 
 Write:
 1) 5 bullet points explaining why this plan fits this user.
@@ -101,14 +132,65 @@ Write:
 
 Keep it realistic.
 """
-    plan["explanation"] = generate_text(system, user)
-    state["plan"] = plan
+    return system, user
+
+GOAL_TEXT = {
+    "lose_fat": "fat loss",
+    "build_muscle": "muscle gain",
+    "improve_stamina": "better stamina",
+}
+
+def plan_explanation_fallback(state: State) -> str:
+    """Deterministic explanation built from the plan, for when the LLM is unavailable."""
+    LLM_RESILIENCE.inc(("fallback",))
+    p = state["profile"]
+    plan = state.get("plan", {})
+    workouts = plan.get("workouts", [])
+    titles = ", ".join(dict.fromkeys(w["title"].lower() for w in workouts)) or "full body sessions"
+    protein = plan.get("nutrition", {}).get("protein_g_per_day")
+    lines = [
+        f"- {len(workouts)} sessions a week of {p['session_minutes']} minutes fit the schedule you gave.",
+        f"- The sessions ({titles}) are built for {GOAL_TEXT.get(p['goal'], p['goal'])} at a {p['level']} level.",
+        f"- Every exercise works with your equipment ({p['equipment']}).",
+        f"- Aim for about {protein} g of protein a day to support recovery." if protein
+        else "- Build meals around protein and vegetables to support recovery.",
+        "- Progress slowly: add a rep or a little load only when every set feels controlled.",
+    ]
+    lines += [f"- Note: {w}" for w in state.get("warnings", [])]
+    lines.append("- Missed a session? Do the next one on the list rather than doubling up.")
+    return "\n".join(lines)
+
+def _with_fallback_explanation(state: State, error: Exception) -> State:
+    state["plan"]["explanation"] = plan_explanation_fallback(state)
+    # explanation_error keeps the stored content from counting as explained
+    state["plan"]["explanation_error"] = str(error)
+    return state
+
+def plan_explanation_llm(state: State) -> State:
+    try:
+        state["plan"]["explanation"] = real_text(generate_text(*plan_explanation_prompt(state)))
+    except LLMUnavailable as e:
+        return _with_fallback_explanation(state, e)
+    return state
+
+async def aplan_explanation_llm(state: State) -> State:
+    try:
+        state["plan"]["explanation"] = real_text(await agenerate_text(*plan_explanation_prompt(state)))
+    except LLMUnavailable as e:
+        return _with_fallback_explanation(state, e)
     return state
 
 def weekly_review_rules(state: State) -> State:
-    logs = state.get("logs", [])
+    # Prefer the precomputed weekly aggregates; fall back to scanning raw logs
+    stats = state.get("stats")
+    if stats is not None:
+        total, done = stats["total"], stats["done"]
+    else:
+        logs = state.get("logs", [])
+        total = len(logs)
+        done = sum(1 for l in logs if l.get("workout_done"))
 
-    if not logs:
+    if not total:
         state["review"] = {
             "adherence": 0.0,
             "summary": "No logs yet. Log a few days to get feedback.",
@@ -116,8 +198,6 @@ def weekly_review_rules(state: State) -> State:
         }
         return state
 
-    total = len(logs)
-    done = sum(1 for l in logs if l.get("workout_done"))
     adherence = done / max(1, total)
 
     if adherence >= 0.85:
@@ -137,7 +217,7 @@ def weekly_review_rules(state: State) -> State:
     }
     return state
 
-def weekly_review_llm(state: State) -> State:
+def weekly_review_prompt(state: State) -> Tuple[str, str]:
     logs = state.get("logs", [])
     review = state.get("review", {})
 
@@ -146,12 +226,10 @@ def weekly_review_llm(state: State) -> State:
         "Be specific, non-judgmental, and actionable. No medical advice. "
         "Don't invent facts not present in logs/review."
     )
-    user = f"""
-Deterministic review:
-{review}
+    table = f"Logs (workout_done y/n):\n{compact_logs(logs[-14:])}" if logs else "Logs: none"
+    user = f"""Deterministic review: {_fields(review)}
 
-Logs:
-{logs[-14:]}
+{table}
 
 Write:
 - 3 observations based only on logs
@@ -159,61 +237,96 @@ Write:
 - 3 small changes for next week
 - a 1–2 sentence motivational closer
 """
-    state["review"]["coach_notes"] = generate_text(system, user)
+    return system, user
+
+def weekly_review_fallback(state: State) -> str:
+    """Deterministic coach notes from the rule-based review, for when the LLM is unavailable."""
+    LLM_RESILIENCE.inc(("fallback",))
+    review = state.get("review", {})
+    logs = state.get("logs", [])
+    done = sum(1 for l in logs if l.get("workout_done"))
+    steps = [l["steps"] for l in logs if l.get("steps")]
+    lines = [f"- {review.get('summary', '')}"]
+    if logs:
+        lines.append(f"- {done} of your last {len(logs)} logged days included a workout.")
+    if steps:
+        lines.append(f"- Average steps on logged days: {sum(steps) // len(steps)}.")
+    lines.append(f"- Next week: {review.get('next_week_adjustment', '')}")
+    lines.append("- Small, repeatable weeks add up. Keep logging so the next review can be more specific.")
+    return "\n".join(lines)
+
+def weekly_review_llm(state: State) -> State:
+    try:
+        state["review"]["coach_notes"] = real_text(generate_text(*weekly_review_prompt(state)))
+    except LLMUnavailable as e:
+        state["review"]["coach_notes"] = weekly_review_fallback(state)
+        state["review_error"] = str(e)
     return state
 
-def _session_title(goal: str, day: int) -> str:
-    if goal == "improve_stamina":
-        return "Cardio + mobility"
-    return "Full body strength" if day % 2 == 1 else "Strength + conditioning"
-
-def _template_session(goal: str, equipment: str, level: str) -> Dict[str, Any]:
-    if goal == "improve_stamina":
-        return {
-            "warmup": "5 min easy cardio",
-            "main": ["20–30 min steady cardio (zone 2)", "5–10 min mobility"],
-            "cooldown": "5 min walk + breathing"
-        }
+async def aweekly_review_llm(state: State) -> State:
+    try:
+        state["review"]["coach_notes"] = real_text(await agenerate_text(*weekly_review_prompt(state)))
+    except LLMUnavailable as e:
+        state["review"]["coach_notes"] = weekly_review_fallback(state)
+        state["review_error"] = str(e)
+    return state
 
-    if equipment == "bodyweight":
-        base = ["Squats", "Push-ups", "Glute bridge", "Plank"]
-    elif equipment == "dumbbells":
-        base = ["Goblet squat", "Dumbbell press", "One-arm row", "RDL", "Plank"]
-    else:
-        base = ["Leg press or squat", "Bench press", "Lat pulldown/row", "RDL", "Core"]
-
-    sets = "2–3 sets" if level == "beginner" else "3–4 sets"
-    reps = "8–12 reps"
-    return {
-        "warmup": "5–8 min mobility + light cardio",
-        "main": [f"{ex}: {sets} x {reps}" for ex in base],
-        "cooldown": "5 min stretch"
-    }
+def _node(graph: str, fn, afn=None):
+    """Node wrapped for per-node timing (telemetry.traced); afn adds an async implementation."""
+    if afn is None:
+        return traced(graph, fn.__name__)(fn)
+    from langchain_core.runnables import RunnableLambda
+    # Sync + async implementations so the graph supports both invoke and ainvoke
+    return RunnableLambda(traced(graph, fn.__name__)(fn), afunc=traced(graph, fn.__name__)(afn))
+
+# langgraph (and langchain_core) are imported when a graph is first built, not
+# with this module: the rules, prompts and fingerprints above don't need them.
 
-def build_plan_graph():
+def build_plan_graph(with_llm: bool = True):
+    from langgraph.graph import StateGraph, END
     g = StateGraph(State)
-    g.add_node("intake_normalizer", intake_normalizer)
-    g.add_node("safety_check", safety_check)
-    g.add_node("plan_workouts", plan_workouts)
-    g.add_node("plan_nutrition", plan_nutrition)
-    g.add_node("plan_explanation_llm", plan_explanation_llm)
+    g.add_node("intake_normalizer", _node("plan_graph", intake_normalizer))
+    g.add_node("safety_check", _node("plan_graph", safety_check))
+    g.add_node("plan_workouts", _node("plan_graph", plan_workouts))
+    g.add_node("plan_nutrition", _node("plan_graph", plan_nutrition))
 
     g.set_entry_point("intake_normalizer")
     g.add_edge("intake_normalizer", "safety_check")
     g.add_edge("safety_check", "plan_workouts")
     g.add_edge("plan_workouts", "plan_nutrition")
-    g.add_edge("plan_nutrition", "plan_explanation_llm")
-    g.add_edge("plan_explanation_llm", END)
+
+    if with_llm:
+        g.add_node("plan_explanation_llm", _node("plan_graph", plan_explanation_llm, aplan_explanation_llm))
+        g.add_edge("plan_nutrition", "plan_explanation_llm")
+        g.add_edge("plan_explanation_llm", END)
+    else:
+        g.add_edge("plan_nutrition", END)
 
     return g.compile()
 
-def build_review_graph():
+def build_review_graph(with_llm: bool = True):
+    from langgraph.graph import StateGraph, END
     g = StateGraph(State)
-    g.add_node("weekly_review_rules", weekly_review_rules)
-    g.add_node("weekly_review_llm", weekly_review_llm)
-
+    g.add_node("weekly_review_rules", _node("review_graph", weekly_review_rules))
     g.set_entry_point("weekly_review_rules")
-    g.add_edge("weekly_review_rules", "weekly_review_llm")
-    g.add_edge("weekly_review_llm", END)
+
+    if with_llm:
+        g.add_node("weekly_review_llm", _node("review_graph", weekly_review_llm, aweekly_review_llm))
+        g.add_edge("weekly_review_rules", "weekly_review_llm")
+        g.add_edge("weekly_review_llm", END)
+    else:
+        g.add_edge("weekly_review_rules", END)
 
     return g.compile()
+
+@functools.lru_cache(maxsize=None)
+def _compiled(build, with_llm: bool):
+    return build(with_llm)
+
+def get_plan_graph(with_llm: bool = True):
+    """build_plan_graph, compiled once per process on first use."""
+    return _compiled(build_plan_graph, with_llm)
+
+def get_review_graph(with_llm: bool = True):
+    """build_review_graph, compiled once per process on first use."""
+    return _compiled(build_review_graph, with_llm)
@@ -0,0 +1,129 @@
+import asyncio
+import logging
+import random
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Job:
+    key: Hashable
+    payload: Any
+    targets: List[Any] = field(default_factory=list)
+    attempts: int = 0
+
+
+class JobQueue:
+    """Interface for background jobs; swap in an out-of-process queue by subclassing."""
+
+    async def start(self) -> None: ...
+    async def stop(self) -> None: ...
+
+    def submit(self, key: Hashable, payload: Any, target: Any) -> bool:
+        raise NotImplementedError
+
+    def stats(self) -> Dict[str, int]:
+        raise NotImplementedError
+
+
+class InProcessJobQueue(JobQueue):
+    """asyncio worker pool with retries and dedupe of identical pending jobs.
+
+    Submitting a key that is already queued or running attaches the new target
+    to the existing job instead of enqueuing a second one. `handler` computes
+    the result from the payload; `on_success` then applies it to every target.
+    """
+
+    def __init__(
+        self,
+        handler: Callable[[Any], Awaitable[Any]],
+        on_success: Callable[[Job, Any], Awaitable[None]],
+        on_failure: Optional[Callable[[Job, BaseException], Awaitable[None]]] = None,
+        workers: int = 4,
+        max_attempts: int = 3,
+        backoff_seconds: float = 1.0,
+    ):
+        self.handler = handler
+        self.on_success = on_success
+        self.on_failure = on_failure
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.backoff_seconds = backoff_seconds
+        self._queue: Optional["asyncio.Queue[Job]"] = None
+        self._tasks: List["asyncio.Task[None]"] = []
+        self._jobs: Dict[Hashable, Job] = {}
+        self._running = 0
+        self._stats = {"submitted": 0, "deduped": 0, "completed": 0, "retried": 0, "failed": 0}
+
+    async def start(self) -> None:
+        self._queue = asyncio.Queue()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self) -> None:
+        for t in self._tasks:
+            t.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def submit(self, key: Hashable, payload: Any, target: Any) -> bool:
+        if self._queue is None:
+            raise RuntimeError("Job queue is not started.")
+        self._stats["submitted"] += 1
+        job = self._jobs.get(key)
+        if job is not None:
+            job.targets.append(target)
+            self._stats["deduped"] += 1
+            return False
+
+        job = self._jobs[key] = Job(key=key, payload=payload, targets=[target])
+        self._queue.put_nowait(job)
+        return True
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            **self._stats,
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "running": self._running,
+            "workers": self.workers,
+        }
+
+    async def _worker(self) -> None:
+        while True:
+            job = await self._queue.get()
+            self._running += 1
+            try:
+                await self._run(job)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Background job %r failed in its callback", job.key)
+            finally:
+                self._running -= 1
+                self._queue.task_done()
+
+    async def _run(self, job: Job) -> None:
+        while True:
+            job.attempts += 1
+            try:
+                result = await self.handler(job.payload)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                if job.attempts < self.max_attempts:
+                    self._stats["retried"] += 1
+                    delay = self.backoff_seconds * 2 ** (job.attempts - 1)
+                    await asyncio.sleep(delay * random.uniform(0.5, 1.5))
+                    continue
+                # Detach before the callback so late submitters start a fresh job
+                self._jobs.pop(job.key, None)
+                self._stats["failed"] += 1
+                if self.on_failure is not None:
+                    await self.on_failure(job, e)
+                return
+
+            self._jobs.pop(job.key, None)
+            self._stats["completed"] += 1
+            await self.on_success(job, result)
+            return
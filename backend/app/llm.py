@@ -1,20 +1,304 @@
+import asyncio
 import os
-from groq import Groq
+import threading
+import time
+import weakref
+from contextlib import AsyncExitStack
+from typing import Any, AsyncIterator, Dict, List, Optional
+from .cache import ResponseCache, cache_from_env, prompt_key
+from .providers import Provider, Router, _Lazy, router_from_env
+from .ratelimit import estimate_tokens, gate_from_env
+from .resilience import GateTimeout, LLMUnavailable, resilience_from_env
+from .singleflight import AsyncSingleFlight
+from .telemetry import annotate, record_llm_usage, traced
 
-def _client() -> Groq:
-    key = os.getenv("GROQ_API_KEY")
-    if not key:
-        raise RuntimeError("GROQ_API_KEY is missing. Put it in backend/.env or env vars.")
-    return Groq(api_key=key)
+_UNSET = object()
+_cache = _UNSET
 
-def generate_text(system: str, user: str) -> str:
+def get_cache() -> Optional[ResponseCache]:
+    global _cache
+    if _cache is _UNSET:
+        _cache = cache_from_env()
+    return _cache
+
+def set_cache(cache: Optional[ResponseCache]) -> None:
+    """Swap the response cache (None disables caching)."""
+    global _cache
+    _cache = cache
+
+def cache_stats() -> Dict[str, int]:
+    cache = get_cache()
+    return cache.stats() if cache is not None else {}
+
+# Providers (Groq, OpenAI-compatible local servers, the offline stub) come from
+# LLM_PROVIDERS; each call goes to the best-scoring one and falls through the rest.
+_router_lock = threading.Lock()
+_router: Optional[Router] = None
+
+def get_router() -> Router:
+    global _router
+    if _router is None:
+        with _router_lock:
+            if _router is None:
+                _router = router_from_env()
+    return _router
+
+def set_router(router: Optional[Router]) -> None:
+    """Swap the provider router (None rebuilds it from the environment on next use)."""
+    global _router
+    _router = router
+
+def set_client(client: Any, async_client: Any = None) -> None:
+    """Send every completion to one client with the chat.completions surface (e.g. a
+    local fake for benchmarks); set_client(None) restores the configured providers."""
+    if client is None:
+        set_router(None)
+        return
+    clients = _Lazy(lambda: client, lambda: async_client or client)
     model = os.getenv("GROQ_MODEL", "llama-3.1-8b-instant")
-    resp = _client().chat.completions.create(
-        model=model,
-        messages=[
-            {"role": "system", "content": system},
-            {"role": "user", "content": user},
-        ],
-        temperature=0.3,
-    )
-    return resp.choices[0].message.content.strip()
+    set_router(Router([Provider("override", model, clients, gate_from_env(), resilience_from_env())]))
+
+def router_stats() -> Dict[str, Any]:
+    return get_router().stats()
+
+def _usage_tokens(resp: Any) -> Optional[int]:
+    usage = getattr(resp, "usage", None)
+    return getattr(usage, "total_tokens", None)
+
+def _messages(system: str, user: str) -> List[Dict[str, str]]:
+    return [
+        {"role": "system", "content": system},
+        {"role": "user", "content": user},
+    ]
+
+def _estimate(system: str, user: str) -> int:
+    # Prompt size plus the completion budget we expect to be charged for
+    return estimate_tokens(system) + estimate_tokens(user) + int(os.getenv("LLM_EXPECTED_COMPLETION_TOKENS", "400"))
+
+# A reply is cached under the model that wrote it, so a fallback provider's text
+# is never served as the primary's. Lookups try models in the order they'd be called.
+def _key(provider: Provider, system: str, user: str, temperature: float) -> str:
+    return prompt_key(provider.model, system, user, temperature)
+
+def _cache_keys(providers: List[Provider], system: str, user: str, temperature: float) -> List[str]:
+    return list(dict.fromkeys(_key(p, system, user, temperature) for p in providers if p.cacheable))
+
+def _cached(providers: List[Provider], system: str, user: str, temperature: float) -> Optional[str]:
+    cache = get_cache()
+    if cache is None:
+        return None
+    for key in _cache_keys(providers, system, user, temperature):
+        hit = cache.get(key)
+        if hit is not None:
+            return hit
+    return None
+
+def _store(provider: Provider, system: str, user: str, temperature: float, text: str) -> None:
+    cache = get_cache()
+    if cache is not None and provider.cacheable:
+        cache.set(_key(provider, system, user, temperature), text)
+
+# The async paths keep the SQLite tier's reads and commits off the event loop
+async def _acached(providers: List[Provider], system: str, user: str, temperature: float) -> Optional[str]:
+    cache = get_cache()
+    if cache is None:
+        return None
+    for key in _cache_keys(providers, system, user, temperature):
+        hit = await cache.aget(key)
+        if hit is not None:
+            return hit
+    return None
+
+async def _astore(provider: Provider, system: str, user: str, temperature: float, text: str) -> None:
+    cache = get_cache()
+    if cache is not None and provider.cacheable:
+        await cache.aset(_key(provider, system, user, temperature), text)
+
+# Identical prompts in flight at the same time (e.g. a batch of near-identical
+# profiles) share a single provider call.
+_flights: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, AsyncSingleFlight]" = weakref.WeakKeyDictionary()
+
+def _flight() -> AsyncSingleFlight:
+    loop = asyncio.get_running_loop()
+    flight = _flights.get(loop)
+    if flight is None:
+        flight = _flights[loop] = AsyncSingleFlight()
+    return flight
+
+class PlaceholderText(str):
+    """Text from a last-resort provider (the offline stub): a stand-in, never real content."""
+    error = ""
+
+def _placeholder(provider: Provider, text: str) -> str:
+    if not provider.last_resort:
+        return text
+    out = PlaceholderText(text)
+    out.error = f"no LLM provider answered; {provider.name!r} is a last-resort placeholder"
+    return out
+
+def real_text(text: str) -> str:
+    """`text`, or LLMUnavailable if it came from a last-resort provider.
+
+    Plans and reviews use this so stub output takes the outage path (template
+    fallback plus *_error) instead of being stored as a real explanation.
+    """
+    if isinstance(text, PlaceholderText):
+        raise LLMUnavailable(text.error)
+    return text
+
+def _text(provider: Provider, resp: Any) -> str:
+    annotate("llm.provider", provider.name)
+    record_llm_usage(getattr(resp, "usage", None))
+    return _placeholder(provider, resp.choices[0].message.content.strip())
+
+# One gate slot per call, taken before the deadline starts: time queued locally
+# (bounded by the gate's own max wait) never times out an attempt or trips the breaker.
+def _complete(provider: Provider, system: str, user: str, temperature: float) -> Any:
+    gate, tokens = provider.gate, _estimate(system, user)
+
+    def attempt(timeout: float) -> Any:
+        return provider.clients.sync().chat.completions.create(
+            model=provider.model,
+            messages=_messages(system, user),
+            temperature=temperature,
+            timeout=timeout,
+        )
+
+    with gate.slot(tokens):
+        resp = provider.resilience.call(attempt)
+    gate.settle(tokens, _usage_tokens(resp))
+    return resp
+
+@traced("llm")
+def generate_text(system: str, user: str, temperature: float = 0.3) -> str:
+    providers = get_router().ranked()
+    hit = _cached(providers, system, user, temperature)
+    annotate("llm.cache_hit", hit is not None)
+    if hit is not None:
+        return hit
+
+    last: Optional[LLMUnavailable] = None
+    for provider in providers:
+        start = time.monotonic()
+        try:
+            resp = _complete(provider, system, user, temperature)
+        except GateTimeout as e:
+            last = e  # saturated locally, not unhealthy: try the next provider without a mark
+            continue
+        except LLMUnavailable as e:
+            provider.record(False, time.monotonic() - start)
+            last = e
+            continue
+        provider.record(True, time.monotonic() - start)
+        text = _text(provider, resp)
+        _store(provider, system, user, temperature, text)
+        return text
+    # Every provider gave up; callers fall back to template text
+    raise last
+
+@traced("llm")
+async def agenerate_text(system: str, user: str, temperature: float = 0.3) -> str:
+    providers = get_router().ranked()
+    hit = await _acached(providers, system, user, temperature)
+    annotate("llm.cache_hit", hit is not None)
+    if hit is not None:
+        return hit
+    # Keyed like the cache, by the provider that would answer first
+    key = _key(providers[0], system, user, temperature)
+    return await _flight().do(key, lambda: _aroute(providers, system, user, temperature))
+
+async def _acomplete(provider: Provider, system: str, user: str, temperature: float) -> Any:
+    gate, tokens = provider.gate, _estimate(system, user)
+
+    async def attempt(timeout: float) -> Any:
+        # Retries and a hedged duplicate run within the call's slot
+        return await provider.clients.aio().chat.completions.create(
+            model=provider.model,
+            messages=_messages(system, user),
+            temperature=temperature,
+            timeout=timeout,
+        )
+
+    async with gate.aslot(tokens):
+        resp = await provider.resilience.acall(attempt)
+    gate.settle(tokens, _usage_tokens(resp))
+    return resp
+
+async def _aroute(providers: List[Provider], system: str, user: str, temperature: float) -> str:
+    last: Optional[LLMUnavailable] = None
+    for provider in providers:
+        start = time.monotonic()
+        try:
+            resp = await _acomplete(provider, system, user, temperature)
+        except GateTimeout as e:
+            last = e  # saturated locally, not unhealthy: try the next provider without a mark
+            continue
+        except LLMUnavailable as e:
+            provider.record(False, time.monotonic() - start)
+            last = e
+            continue
+        provider.record(True, time.monotonic() - start)
+        text = _text(provider, resp)
+        await _astore(provider, system, user, temperature, text)
+        return text
+    raise last
+
+def _stream_usage(chunk: Any) -> Any:
+    # Groq reports usage on the final stream chunk under x_groq
+    return getattr(getattr(chunk, "x_groq", None), "usage", None) or getattr(chunk, "usage", None)
+
+@traced("llm")
+async def astream_text(system: str, user: str, temperature: float = 0.3) -> AsyncIterator[str]:
+    """Yield completion text as the provider streams it.
+
+    A cached response is yielded as a single chunk; a completed stream is
+    cached like a regular agenerate_text result. Providers are tried in
+    router order until one opens a stream.
+    """
+    providers = get_router().ranked()
+    hit = await _acached(providers, system, user, temperature)
+    if hit is not None:
+        yield hit
+        return
+
+    tokens = _estimate(system, user)
+    last: Optional[LLMUnavailable] = None
+    for provider in providers:
+        parts: List[str] = []
+        usage = None
+        async with AsyncExitStack() as stack:
+            try:
+                await stack.enter_async_context(provider.gate.aslot(tokens))
+            except GateTimeout as e:
+                last = e
+                continue
+            start = time.monotonic()
+            try:
+                # Retries and the deadline cover opening the stream; a stream can't be hedged
+                stream = await provider.resilience.acall(
+                    lambda timeout: provider.clients.aio().chat.completions.create(
+                        model=provider.model,
+                        messages=_messages(system, user),
+                        temperature=temperature,
+                        stream=True,
+                        timeout=timeout,
+                    ),
+                    hedge=False,
+                )
+            except LLMUnavailable as e:
+                # Only failures feed the router here; time-to-open isn't comparable to full completions
+                provider.record(False, time.monotonic() - start)
+                last = e
+                continue
+            annotate("llm.provider", provider.name)
+            async for chunk in stream:
+                usage = _stream_usage(chunk) or usage
+                delta = chunk.choices[0].delta.content if chunk.choices else None
+                if delta:
+                    parts.append(delta)
+                    yield _placeholder(provider, delta)
+        provider.gate.settle(tokens, getattr(usage, "total_tokens", None))
+        record_llm_usage(usage)
+        await _astore(provider, system, user, temperature, "".join(parts).strip())
+        return
+    raise last
@@ -1,4 +1,10 @@
-from fastapi import FastAPI
+import asyncio
+import hashlib
+import os
+from typing import Any, Dict, List, Literal, Optional
+from fastapi import FastAPI, Header, HTTPException, Query, Request
+from pydantic import TypeAdapter, ValidationError
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from dotenv import load_dotenv
 from pathlib import Path
 
@@ -7,71 +13,526 @@ ENV_PATH = Path(__file__).resolve().parents[1] / ".env"   # backend/.env
 load_dotenv(ENV_PATH)
 
 #load_dotenv("backend/.env", override=True)
-from .schemas import ProfileIn, PlanOut, LogIn, ReviewOut
-from .graph import build_plan_graph, build_review_graph
-from .storage import init_db, upsert_profile, save_plan, add_log, get_logs
+from .schemas import (
+    ProfileIn, PlanOut, LogIn, ReviewOut, ExplanationOut, BulkLogIn, BulkLogOut, BulkLogRowOut, ProgressOut,
+)
+from .graph import (
+    get_plan_graph, get_review_graph, plan_explanation_prompt, weekly_review_prompt, profile_fingerprint,
+    plan_explanation_fallback, weekly_review_fallback, review_key,
+)
+from .storage import (
+    init_db, aclose_db, aupsert_profile, asave_plan, asave_plan_ref, asave_plans_batch, aget_plan_content,
+    aadd_log, aget_logs, aget_log_stats, aget_review, asave_reviews, REVIEW_LOG_LIMIT,
+    aget_idempotent, asave_idempotent, purge_idempotent, aget_profile_id, progress_cache,
+    aget_plan, aget_latest_plan, aupdate_plans, abulk_upsert_logs, plan_cache,
+)
+from .llm import agenerate_text, astream_text, cache_stats, real_text, router_stats
+from .resilience import LLMUnavailable
+from .jobs import InProcessJobQueue
+from .serialization import Fragment, JSONBytesResponse, dumps, loads
+from .singleflight import AsyncSharedStream, AsyncSingleFlight
+from .export import EXPORT_CHUNK_ROWS, MEDIA_TYPES, ExportFormat, ExportTable, aexport, check_export, parquet_available
+from .telemetry import MetricsMiddleware, render_prometheus
 
-app = FastAPI(title="Fitness Coach Agent (LangGraph + LLM)")
+app = FastAPI(title="Fitness Coach Agent (LangGraph + LLM)", default_response_class=JSONBytesResponse)
+app.add_middleware(MetricsMiddleware)
 
-plan_graph = build_plan_graph()
-review_graph = build_review_graph()
+# Graphs are compiled on first use (get_plan_graph / get_review_graph); the
+# rule-only variants serve the streaming endpoints, which stream the LLM step
+# themselves. WARM_GRAPHS=1 compiles them during startup instead.
+WARM_GRAPHS = os.getenv("WARM_GRAPHS", "0") == "1"
+
+PLAN_BATCH_MAX = int(os.getenv("PLAN_BATCH_MAX", "5000"))
+PLAN_BATCH_CONCURRENCY = int(os.getenv("PLAN_BATCH_CONCURRENCY", "16"))
+BULK_LOG_MAX = int(os.getenv("BULK_LOG_MAX", "100000"))
+
+# "inline" waits for the LLM explanation; "background" returns the rule-based
+# plan immediately and fills the explanation in via explanation_jobs.
+ExplainMode = Literal["inline", "background"]
+PLAN_EXPLAIN_MODE = os.getenv("PLAN_EXPLAIN_MODE", "inline")
+
+async def _explain(prompt):
+    # Stub output fails the job rather than being stored as the explanation
+    return real_text(await agenerate_text(*prompt))
+
+async def _explanation_ready(job, text: str):
+    await aupdate_plans(job.targets, {"explanation": text, "explanation_error": None})
+
+async def _explanation_failed(job, err: BaseException):
+    await aupdate_plans(job.targets, {"explanation_error": str(err)})
+
+# Jobs are keyed on the prompt, so identical pending explanations run once
+explanation_jobs = InProcessJobQueue(
+    _explain,
+    _explanation_ready,
+    _explanation_failed,
+    workers=int(os.getenv("EXPLAIN_WORKERS", "4")),
+    max_attempts=int(os.getenv("EXPLAIN_MAX_ATTEMPTS", "3")),
+)
+
+# Concurrent identical /plan and /review requests (double submits, client
+# retries) share one graph run; the streaming variants share one event stream.
+request_flight = AsyncSingleFlight()
+stream_flight = AsyncSharedStream()
+
+def _request_hash(*parts) -> str:
+    return hashlib.sha256(dumps(parts, sort_keys=True)).hexdigest()
+
+async def _idempotent(route: str, key: Optional[str], request_hash: str, compute) -> JSONBytesResponse:
+    """Run `compute` (returning JSON bytes) once per Idempotency-Key and replay its body on retries."""
+    if key is None:
+        return JSONBytesResponse(await compute())
+    if not 0 < len(key) <= 255:
+        raise HTTPException(status_code=400, detail="Idempotency-Key must be 1-255 characters.")
+
+    async def once() -> bytes:
+        stored = await aget_idempotent(route, key)
+        if stored is not None:
+            if stored[0] != request_hash:
+                raise HTTPException(status_code=422, detail="Idempotency-Key was already used for a different request.")
+            return stored[1]
+        body = await compute()
+        await asave_idempotent(route, key, request_hash, body)
+        return body
+
+    return JSONBytesResponse(await request_flight.do(("idempotency", route, key), once))
+
+def _default_profile(name: str) -> dict:
+    return {
+        "name": name,
+        "goal": "lose_fat",
+        "level": "beginner",
+        "days_per_week": 3,
+        "session_minutes": 45,
+        "equipment": "bodyweight",
+        "weight_kg": None,
+        "preferences": {}
+    }
 
 @app.on_event("startup")
-def _startup():
+async def _startup():
     init_db()
+    purge_idempotent()
+    if WARM_GRAPHS:
+        for with_llm in (True, False):
+            get_plan_graph(with_llm)
+            get_review_graph(with_llm)
+    await explanation_jobs.start()
+
+@app.on_event("shutdown")
+async def _shutdown():
+    await explanation_jobs.stop()
+    await aclose_db()
 
 @app.get("/")
 def root():
     return {"status": "ok", "docs": "/docs"}
 
+@app.get("/cache/stats")
+def llm_cache_stats():
+    return cache_stats()
+
+@app.get("/llm/stats")
+def llm_stats():
+    return {"cache": cache_stats(), "providers": router_stats()}
+
+@app.get("/jobs/stats")
+def jobs_stats():
+    return {
+        "explanations": explanation_jobs.stats(),
+        "requests": {"in_flight": request_flight.in_flight(), "coalesced": request_flight.coalesced},
+        "streams": {"in_flight": stream_flight.in_flight(), "coalesced": stream_flight.coalesced},
+    }
+
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    # Prometheus text exposition format
+    return PlainTextResponse(render_prometheus(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+@app.get("/plans/cache/stats")
+def plans_cache_stats():
+    return plan_cache.stats()
+
+@app.get("/progress/cache/stats")
+def progress_cache_stats():
+    return progress_cache.stats()
+
 @app.post("/plan", response_model=PlanOut)
-def create_plan(profile: ProfileIn):
+async def create_plan(
+    profile: ProfileIn,
+    explain: Optional[ExplainMode] = None,
+    idempotency_key: Optional[str] = Header(default=None),
+):
+    mode = explain or PLAN_EXPLAIN_MODE
     profile_dict = profile.model_dump()
-    profile_id = upsert_profile(profile.name, profile_dict)
+    request_hash = _request_hash(mode, profile_dict)
+    # The same profile submitted again while the first is still running gets its result
+    compute = lambda: request_flight.do(("plan", request_hash), lambda: _create_plan(profile, profile_dict, mode))
+    return await _idempotent("/plan", idempotency_key, request_hash, compute)
+
+async def _create_plan(profile: ProfileIn, profile_dict: Dict[str, Any], mode: str) -> bytes:
+    # Each document is encoded once; the same bytes go to the DB and the response
+    profile_json = dumps(profile_dict)
+    profile_id = await aupsert_profile(profile.name, profile_json)
+
+    # Same plan inputs planned recently (by anyone): reuse that content as is
+    fingerprint = profile_fingerprint(profile_dict)
+    content = await aget_plan_content(fingerprint)
+    if content is not None and (content["explained"] or mode == "background"):
+        plan_json, warnings_json = content["plan_json"], content["warnings_json"]
+        plan_id = await asave_plan_ref(profile_id, fingerprint, profile_json)
+        if not content["explained"]:
+            # Attaches to the pending job when there is one; retries a failed one
+            out = await get_plan_graph(with_llm=False).ainvoke({"profile": profile_dict})
+            prompt = plan_explanation_prompt(out)
+            explanation_jobs.submit(prompt, prompt, plan_id)
+    else:
+        graph = get_plan_graph(with_llm=mode != "background")
+        out = await graph.ainvoke({"profile": profile_dict})
+        plan_json = dumps(out.get("plan", {}))
+        warnings_json = dumps(out.get("warnings", []))
+
+        plan_id = await asave_plan(profile_id, plan_json, warnings_json, fingerprint, profile_json)
+        if mode == "background":
+            prompt = plan_explanation_prompt(out)
+            explanation_jobs.submit(prompt, prompt, plan_id)
+    return dumps({
+        "profile": Fragment(profile_json),
+        "plan": Fragment(plan_json),
+        "warnings": Fragment(warnings_json),
+        "plan_id": plan_id,
+    })
+
+@app.get("/plan/{plan_id}/explanation", response_model=ExplanationOut)
+async def get_plan_explanation(plan_id: int):
+    rec = await aget_plan(plan_id)
+    if rec is None:
+        raise HTTPException(status_code=404, detail="Plan not found.")
+
+    plan = rec["plan"]
+    if "explanation" in plan:
+        return ExplanationOut(plan_id=plan_id, status="ready", explanation=plan["explanation"])
+    if "explanation_error" in plan:
+        return ExplanationOut(plan_id=plan_id, status="failed", error=plan["explanation_error"])
+    return ExplanationOut(plan_id=plan_id, status="pending")
+
+def _plan_out(rec: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "profile": rec["profile"],
+        "plan": rec["plan"],
+        "warnings": rec["warnings"],
+        "plan_id": rec["id"],
+        "created_at": rec["created_at"],
+    }
+
+@app.get("/plans/{profile_name}/latest", response_model=PlanOut)
+async def get_latest_plan(profile_name: str):
+    rec = await aget_latest_plan(profile_name)
+    if rec is None:
+        raise HTTPException(status_code=404, detail="No saved plan for this profile.")
+    return JSONBytesResponse(dumps(_plan_out(rec)))
+
+@app.get("/plans/{plan_id}", response_model=PlanOut)
+async def get_saved_plan(plan_id: int):
+    rec = await aget_plan(plan_id)
+    if rec is None:
+        raise HTTPException(status_code=404, detail="Plan not found.")
+    return JSONBytesResponse(dumps(_plan_out(rec)))
+
+def _ndjson(obj) -> bytes:
+    return dumps(obj) + b"\n"
+
+async def _plan_batch_stream(profiles: List[ProfileIn]):
+    sem = asyncio.Semaphore(PLAN_BATCH_CONCURRENCY)
+
+    async def run(i: int, profile: ProfileIn):
+        async with sem:
+            try:
+                return i, await get_plan_graph().ainvoke({"profile": profile.model_dump()}), None
+            except Exception as e:
+                return i, None, e
+
+    tasks = [asyncio.create_task(run(i, p)) for i, p in enumerate(profiles)]
+    finished = []
+    try:
+        # Identical explanation prompts are coalesced inside agenerate_text
+        for next_done in asyncio.as_completed(tasks):
+            i, out, err = await next_done
+            profile = profiles[i]
+            if err is not None:
+                yield _ndjson({"index": i, "name": profile.name, "error": str(err)})
+                continue
+
+            # Encoded once for both the stream and the batch insert
+            docs = (dumps(profile), dumps(out.get("plan", {})), dumps(out.get("warnings", [])),
+                    profile_fingerprint(profile.model_dump()))
+            finished.append((i, profile.name, docs))
+            yield _ndjson({
+                "index": i,
+                "profile": Fragment(docs[0]),
+                "plan": Fragment(docs[1]),
+                "warnings": Fragment(docs[2]),
+                "plan_id": None,
+            })
+
+        ids = await asave_plans_batch([(name, *docs) for _, name, docs in finished])
+        yield _ndjson({
+            "done": True,
+            "saved": len(finished),
+            "failed": len(profiles) - len(finished),
+            "plan_ids": {str(i): plan_id for (i, _, _), (_, plan_id) in zip(finished, ids)},
+        })
+    finally:
+        for t in tasks:
+            t.cancel()
+
+@app.post("/plans/batch")
+async def create_plans_batch(profiles: List[ProfileIn]):
+    if len(profiles) > PLAN_BATCH_MAX:
+        raise HTTPException(status_code=413, detail=f"At most {PLAN_BATCH_MAX} profiles per batch.")
+    return StreamingResponse(_plan_batch_stream(profiles), media_type="application/x-ndjson")
 
-    out = plan_graph.invoke({"profile": profile_dict})
+_SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+def _sse(event: str, data) -> bytes:
+    return b"event: " + event.encode() + b"\ndata: " + dumps(data) + b"\n\n"
+
+async def _plan_event_stream(profile: ProfileIn):
+    submitted = profile.model_dump()
+    profile_id = await aupsert_profile(profile.name, submitted)
+
+    # The graph caps the profile in place; fingerprint and snapshot what was submitted
+    out = await get_plan_graph(with_llm=False).ainvoke({"profile": dict(submitted)})
     plan = out.get("plan", {})
     warnings = out.get("warnings", [])
+    yield _sse("plan", {"profile": profile, "plan": plan, "warnings": warnings, "plan_id": None})
 
-    save_plan(profile_id, plan, warnings)
-    return PlanOut(profile=profile, plan=plan, warnings=warnings)
+    parts = []
+    tokens = astream_text(*plan_explanation_prompt(out))
+    try:
+        async for token in tokens:
+            # A last-resort stub stream is replaced by the template before anything is sent
+            parts.append(real_text(token))
+            yield _sse("token", token)
+    except LLMUnavailable as e:
+        if parts:
+            yield _sse("error", str(e))
+            return
+        # Nothing streamed yet: send the template explanation instead
+        parts.append(plan_explanation_fallback(out))
+        plan["explanation_error"] = str(e)
+        yield _sse("token", parts[0])
+    except Exception as e:
+        yield _sse("error", str(e))
+        return
+    finally:
+        await tokens.aclose()
+
+    plan["explanation"] = "".join(parts).strip()
+    await asave_plan(profile_id, plan, warnings, profile_fingerprint(submitted), submitted)
+    yield _sse("done", {"explanation": plan["explanation"]})
+
+@app.post("/plan/stream")
+async def create_plan_stream(profile: ProfileIn):
+    key = ("plan", _request_hash(profile.model_dump()))
+    events = stream_flight.stream(key, lambda: _plan_event_stream(profile))
+    return StreamingResponse(events, media_type="text/event-stream", headers=_SSE_HEADERS)
 
 @app.post("/log")
-def log_day(profile_name: str, log: LogIn):
-    profile_id = upsert_profile(profile_name, {
-        "name": profile_name,
-        "goal": "lose_fat",
-        "level": "beginner",
-        "days_per_week": 3,
-        "session_minutes": 45,
-        "equipment": "bodyweight",
-        "weight_kg": None,
-        "preferences": {}
-    })
+async def log_day(profile_name: str, log: LogIn, idempotency_key: Optional[str] = Header(default=None)):
+    async def add() -> bytes:
+        profile_id = await aupsert_profile(profile_name, _default_profile(profile_name))
+        await aadd_log(profile_id, log.model_dump())
+        return dumps({"status": "ok"})
 
-    add_log(profile_id, log.model_dump())
-    return {"status": "ok"}
+    # A retried log with the same key is stored once
+    return await _idempotent("/log", idempotency_key, _request_hash(profile_name, log.model_dump()), add)
 
-@app.get("/review", response_model=ReviewOut)
-def weekly_review(profile_name: str):
-    profile_id = upsert_profile(profile_name, {
-        "name": profile_name,
-        "goal": "lose_fat",
-        "level": "beginner",
-        "days_per_week": 3,
-        "session_minutes": 45,
-        "equipment": "bodyweight",
-        "weight_kg": None,
-        "preferences": {}
-    })
+_bulk_log_rows = TypeAdapter(List[BulkLogIn])
+
+async def _read_bulk_body(request: Request) -> List[Any]:
+    """Rows from a JSON array ({"logs": [...]} also accepted) or an NDJSON stream.
+
+    Unparseable NDJSON lines come back as ValueError placeholders.
+    """
+    ctype = request.headers.get("content-type", "")
+    if "ndjson" not in ctype and "jsonlines" not in ctype:
+        data = loads(await request.body() or b"[]")
+        return data.get("logs", []) if isinstance(data, dict) else data
+
+    rows: List[Any] = []
+    buf = b""
+    async for chunk in request.stream():
+        buf += chunk
+        *lines, buf = buf.split(b"\n")
+        for line in lines:
+            if line.strip():
+                try:
+                    rows.append(loads(line))
+                except ValueError as e:
+                    rows.append(e)
+        if len(rows) > BULK_LOG_MAX:
+            break
+    if buf.strip():
+        try:
+            rows.append(loads(buf))
+        except ValueError as e:
+            rows.append(e)
+    return rows
+
+def _validate_bulk_rows(raw: List[Any]) -> Dict[int, Any]:
+    """Validate all rows in one pass; returns index -> BulkLogIn or error string."""
+    errors: Dict[int, Any] = {i: f"invalid JSON: {r}" for i, r in enumerate(raw) if isinstance(r, ValueError)}
+    candidates = [i for i in range(len(raw)) if i not in errors]
+    try:
+        parsed = _bulk_log_rows.validate_python([raw[i] for i in candidates])
+    except ValidationError as e:
+        for err in e.errors():
+            i = candidates[err["loc"][0]]
+            where = ".".join(str(x) for x in err["loc"][1:])
+            errors.setdefault(i, f"{where}: {err['msg']}" if where else err["msg"])
+        # Second pass only over the rows that passed
+        candidates = [i for i in candidates if i not in errors]
+        parsed = _bulk_log_rows.validate_python([raw[i] for i in candidates])
+    return {**errors, **dict(zip(candidates, parsed))}
+
+@app.post("/logs/bulk", response_model=BulkLogOut)
+async def bulk_logs(request: Request, profile_name: Optional[str] = None):
+    try:
+        raw = await _read_bulk_body(request)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid JSON body: {e}")
+    if not isinstance(raw, list):
+        raise HTTPException(status_code=400, detail="Expected a JSON array of logs.")
+    if len(raw) > BULK_LOG_MAX:
+        raise HTTPException(status_code=413, detail=f"At most {BULK_LOG_MAX} logs per request.")
 
-    logs = get_logs(profile_id)   # <-- FIXED
-    out = review_graph.invoke({"logs": logs})
+    checked = _validate_bulk_rows(raw)
+    result = BulkLogOut()
+    valid_idx, valid_rows = [], []
+    for i in range(len(raw)):
+        row = checked[i]
+        if isinstance(row, BulkLogIn):
+            name = row.profile_name or profile_name
+            if not name:
+                row = "profile_name is required (per row or as a query parameter)"
+        if isinstance(row, str):
+            result.rows.append(BulkLogRowOut(index=i, status="invalid", error=row))
+            continue
+        valid_idx.append(i)
+        valid_rows.append((name, row.model_dump(exclude={"profile_name"})))
+
+    statuses = await abulk_upsert_logs(valid_rows, _default_profile) if valid_rows else []
+    result.rows.extend(BulkLogRowOut(index=i, status=st) for i, st in zip(valid_idx, statuses))
+    result.rows.sort(key=lambda r: r.index)
+    for r in result.rows:
+        setattr(result, r.status, getattr(result, r.status) + 1)
+    return result
+
+@app.get("/progress", response_model=ProgressOut)
+async def get_progress(profile_name: str, days: int = Query(default=90, ge=0, le=36600)):
+    # Metrics cover the whole history; `days` only trims the daily series.
+    # NumPy loads with the first /progress request, not at startup.
+    from .progress import aget_progress, compute, columns, progress_response
+
+    profile_id = await aget_profile_id(profile_name)
+    result = await aget_progress(profile_id) if profile_id is not None else compute(columns([]))
+    return JSONBytesResponse(dumps(progress_response(profile_name, result, days)))
+
+@app.get("/export/{table}")
+async def export_table(
+    table: ExportTable,
+    fmt: ExportFormat = Query(default="ndjson", alias="format"),
+    after_id: int = Query(default=0, ge=0),
+    since: Optional[str] = None,
+    chunk: int = Query(default=EXPORT_CHUNK_ROWS, ge=1, le=100000),
+):
+    # Streams in id order; pass the last id received as after_id to continue or pull increments
+    try:
+        since = check_export(table, fmt, since)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if fmt == "parquet" and not parquet_available():
+        raise HTTPException(status_code=501, detail="Parquet export needs pyarrow on the server.")
+    return StreamingResponse(
+        aexport(table, fmt, after_id, since, chunk),
+        media_type=MEDIA_TYPES[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{table}.{fmt}"'},
+    )
 
+async def _review_inputs(profile_name: str):
+    profile_id = await aupsert_profile(profile_name, _default_profile(profile_name))
+    # The LLM only sees the last 14 logs; adherence comes from the weekly aggregates
+    logs = await aget_logs(profile_id, limit=REVIEW_LOG_LIMIT)
+    stats = await aget_log_stats(profile_id)
+    key = review_key(logs, stats)
+    # Precomputed by review_batch (or saved by an earlier request) for these same inputs
+    return profile_id, logs, stats, key, await aget_review(profile_id, key)
+
+@app.get("/review", response_model=ReviewOut)
+async def weekly_review(profile_name: str):
+    profile_id, logs, stats, key, stored = await _review_inputs(profile_name)
+    if stored is not None:
+        return ReviewOut(**stored)
+    # Keyed on the review inputs, so a log written meanwhile starts a new run
+    return await request_flight.do(
+        ("review", profile_id, key), lambda: _live_review(profile_id, logs, stats, key)
+    )
+
+async def _live_review(profile_id: int, logs, stats, key: str) -> ReviewOut:
+    out = await get_review_graph().ainvoke({"logs": logs, "stats": stats})
     r = out["review"]
-    return ReviewOut(
+    review = ReviewOut(
         adherence=r["adherence"],
         summary=r["summary"],
         next_week_adjustment=r["next_week_adjustment"],
         coach_notes=r.get("coach_notes", "")
     )
+    if not out.get("review_error"):
+        await asave_reviews([(profile_id, key, review.model_dump())])
+    return review
+
+async def _review_event_stream(profile_name: str):
+    profile_id, logs, stats, key, stored = await _review_inputs(profile_name)
+    if stored is not None:
+        stored = ReviewOut(**stored)
+        yield _sse("review", stored.model_copy(update={"coach_notes": ""}).model_dump(mode="json"))
+        yield _sse("token", stored.coach_notes)
+        yield _sse("done", {"coach_notes": stored.coach_notes})
+        return
+
+    live = lambda: _live_review_events(profile_id, logs, stats, key)
+    async for event in stream_flight.stream(("review", profile_id, key), live):
+        yield event
+
+async def _live_review_events(profile_id: int, logs, stats, key: str):
+    out = await get_review_graph(with_llm=False).ainvoke({"logs": logs, "stats": stats})
+    yield _sse("review", ReviewOut(**out["review"]).model_dump(mode="json"))
+
+    parts = []
+    tokens = astream_text(*weekly_review_prompt(out))
+    try:
+        async for token in tokens:
+            parts.append(real_text(token))
+            yield _sse("token", token)
+    except LLMUnavailable as e:
+        if parts:
+            yield _sse("error", str(e))
+            return
+        parts.append(weekly_review_fallback(out))
+        yield _sse("token", parts[0])
+        yield _sse("done", {"coach_notes": parts[0]})
+        return
+    except Exception as e:
+        yield _sse("error", str(e))
+        return
+    finally:
+        await tokens.aclose()
+
+    notes = "".join(parts).strip()
+    await asave_reviews([(profile_id, key, {**out["review"], "coach_notes": notes})])
+    yield _sse("done", {"coach_notes": notes})
+
+@app.get("/review/stream")
+async def weekly_review_stream(profile_name: str):
+    return StreamingResponse(_review_event_stream(profile_name), media_type="text/event-stream", headers=_SSE_HEADERS)
@@ -0,0 +1,145 @@
+import hashlib
+import json
+import os
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+DEFAULT_PATH = Path(__file__).resolve().parent / "data" / "plan_templates.json"
+MAX_DAYS = 7
+
+
+class FrozenDict(dict):
+    """A dict that refuses mutation.
+
+    It is still a real dict, so json.dumps, Pydantic and repr treat it exactly
+    like the per-request dicts we used to build, without copying.
+    """
+
+    def _readonly(self, *args, **kwargs):
+        raise TypeError("plan templates are shared and read-only")
+
+    __setitem__ = __delitem__ = __ior__ = _readonly
+    clear = pop = popitem = setdefault = update = _readonly
+
+    def __reduce__(self):
+        return FrozenDict, (dict(self),)
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+
+class FrozenList(list):
+    def _readonly(self, *args, **kwargs):
+        raise TypeError("plan templates are shared and read-only")
+
+    __setitem__ = __delitem__ = __iadd__ = __imul__ = _readonly
+    append = extend = insert = pop = remove = clear = sort = reverse = _readonly
+
+    def __reduce__(self):
+        return FrozenList, (list(self),)
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+
+def freeze(obj: Any) -> Any:
+    if isinstance(obj, (FrozenDict, FrozenList)):
+        return obj
+    if isinstance(obj, dict):
+        return FrozenDict((k, freeze(v)) for k, v in obj.items())
+    if isinstance(obj, (list, tuple)):
+        return FrozenList(freeze(v) for v in obj)
+    return obj
+
+
+def _pick(table: Dict[str, Any], key: str) -> Any:
+    return table[key] if key in table else table["default"]
+
+
+def _build_session(spec: Dict[str, Any], equipment: str, level: str, sets: Dict[str, str], reps: str) -> Dict[str, Any]:
+    if "main" in spec:
+        main = list(spec["main"])
+    else:
+        scheme = _pick(sets, level)
+        main = [f"{ex}: {scheme} x {reps}" for ex in _pick(spec["exercises"], equipment)]
+    return {"warmup": spec["warmup"], "main": main, "cooldown": spec["cooldown"]}
+
+
+class PlanTemplates:
+    """Every (goal, equipment, level) session and per-day title, built once."""
+
+    def __init__(self, data: Dict[str, Any]):
+        # Changes whenever the template data does (part of the plan fingerprint)
+        self.digest = hashlib.sha256(json.dumps(data, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+        goals = [g for g in data["goals"] if g != "default"]
+        equipment = list(data["equipment"]) + ["default"]
+        levels = list(data["levels"]) + ["default"]
+
+        self._sessions: Dict[Tuple[str, str, str], FrozenDict] = {}
+        self._titles: Dict[str, Tuple[str, ...]] = {}
+        for goal in goals + ["default"]:
+            spec = data["goals"][goal]
+            for eq in equipment:
+                for lvl in levels:
+                    self._sessions[(goal, eq, lvl)] = freeze(_build_session(
+                        data["sessions"][spec["session"]], eq, lvl, data["sets"], data["reps"]
+                    ))
+            titles = spec["titles"]
+            self._titles[goal] = tuple(titles[(d - 1) % len(titles)] for d in range(1, MAX_DAYS + 1))
+
+        nutrition = data["nutrition"]
+        self.protein_g_per_kg = float(nutrition["protein_g_per_kg"])
+        self.plate_method = freeze(nutrition["plate_method"])
+        self.nutrition_notes = nutrition["notes"]
+        self.workouts = lru_cache(maxsize=4096)(self._workouts)
+
+    def session(self, goal: str, equipment: str, level: str) -> FrozenDict:
+        found = self._sessions.get((goal, equipment, level))
+        if found is not None:
+            return found
+        goal = goal if goal in self._titles else "default"
+        equipment = equipment if (goal, equipment, "default") in self._sessions else "default"
+        level = level if (goal, equipment, level) in self._sessions else "default"
+        return self._sessions[(goal, equipment, level)]
+
+    def title(self, goal: str, day: int) -> str:
+        titles = self._titles.get(goal) or self._titles["default"]
+        return titles[(day - 1) % len(titles)]
+
+    def _workouts(self, goal: str, equipment: str, level: str, days: int, duration: int) -> FrozenList:
+        session = self.session(goal, equipment, level)
+        return freeze([
+            {
+                "day": d,
+                "title": self.title(goal, d),
+                "duration_minutes": duration,
+                "session": session,
+            }
+            for d in range(1, days + 1)
+        ])
+
+    def nutrition(self, weight_kg: Optional[float]) -> Dict[str, Any]:
+        protein = None
+        if weight_kg:
+            protein = int(round(self.protein_g_per_kg * weight_kg))
+        return {
+            "protein_g_per_day": protein,
+            "plate_method": self.plate_method,
+            "notes": self.nutrition_notes,
+        }
+
+
+def load_templates(path: Optional[str] = None) -> PlanTemplates:
+    path = path or os.getenv("PLAN_TEMPLATES_PATH") or DEFAULT_PATH
+    with open(path, encoding="utf-8") as f:
+        return PlanTemplates(json.load(f))
+
+
+TEMPLATES = load_templates()
@@ -0,0 +1,272 @@
+"""Progress analytics over a profile's whole log history, in vectorized NumPy passes.
+
+A profile's logs are read once into columns (LogColumns) and cached in
+storage.progress_cache together with the computed metrics; add_log appends its
+row to the cache, and the next request folds the new rows in and recomputes
+without touching the database.
+
+Metrics are computed on a dense daily grid from the first to the last logged
+day. Days without a log and null steps/weights count as missing, never as
+zero. When a day has several logs the newest (highest id) wins; dates that
+don't parse as YYYY-MM-DD, or fall outside 1900-2099, are ignored.
+"""
+from datetime import date as _date, timedelta
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .schemas import ProgressOut
+from .storage import aget_log_rows, progress_cache
+
+ROLLING_WINDOWS = (7, 28)
+# Weight trend windows in days, counted back from the last weigh-in; 0 = all history
+TREND_WINDOWS = {"28d": 28, "90d": 90, "all": 0}
+
+_MIN_DAY = np.datetime64("1900-01-01")
+_MAX_DAY = np.datetime64("2100-01-01")
+
+
+class LogColumns(NamedTuple):
+    id: np.ndarray      # int64
+    day: np.ndarray     # datetime64[D]; NaT where the date didn't parse
+    done: np.ndarray    # bool
+    steps: np.ndarray   # float64; NaN when null
+    weight: np.ndarray  # float64; NaN when null
+
+
+def _days(dates: Sequence[Any]) -> np.ndarray:
+    """Parse YYYY-MM-DD strings (anything after the 10th character ignored) in one pass; NaT otherwise."""
+    # Fixed-width code points, one row of 10 per date; short strings are zero-padded
+    c = np.array(dates, dtype="U10").view(np.uint32).reshape(len(dates), 10).astype(np.int64) - ord("0")
+    digits = np.delete(c, (4, 7), axis=1)
+    ok = ((digits >= 0) & (digits <= 9)).all(axis=1) & (c[:, 4] == ord("-") - ord("0")) & (c[:, 7] == c[:, 4])
+    year = c[:, 0] * 1000 + c[:, 1] * 100 + c[:, 2] * 10 + c[:, 3]
+    month, day = c[:, 5] * 10 + c[:, 6], c[:, 8] * 10 + c[:, 9]
+    ok &= (month >= 1) & (month <= 12) & (day >= 1)
+    months = ((year - 1970) * 12 + month - 1).astype("datetime64[M]")
+    first = months.astype("datetime64[D]")
+    ok &= day <= ((months + 1).astype("datetime64[D]") - first).astype(np.int64)
+    out = first + (day - 1)
+    out[~ok] = np.datetime64("NaT")
+    return out
+
+
+def columns(rows: Sequence[Tuple[Any, ...]]) -> LogColumns:
+    """Columns from (id, date, workout_done, steps, weight_kg) rows (storage.aget_log_rows)."""
+    if not len(rows):
+        return LogColumns(np.empty(0, np.int64), np.empty(0, "datetime64[D]"), np.empty(0, bool),
+                          np.empty(0), np.empty(0))
+    ids, dates, done, steps, weight = zip(*rows)
+    # None becomes NaN in the float columns
+    return LogColumns(np.array(ids, np.int64), _days(dates), np.array(done, bool),
+                      np.array(steps, float), np.array(weight, float))
+
+
+def concat(a: LogColumns, b: LogColumns) -> LogColumns:
+    return LogColumns(*(np.concatenate(pair) for pair in zip(a, b)))
+
+
+def _rolling_mean(x: np.ndarray, window: int) -> np.ndarray:
+    """Trailing `window`-day mean of the non-NaN values; NaN where the window has none."""
+    seen = ~np.isnan(x)
+    sums = np.concatenate(([0.0], np.cumsum(np.where(seen, x, 0.0))))
+    counts = np.concatenate(([0], np.cumsum(seen)))
+    hi = np.arange(1, len(x) + 1)
+    lo = np.maximum(hi - window, 0)
+    n = counts[hi] - counts[lo]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(n > 0, (sums[hi] - sums[lo]) / n, np.nan)
+
+
+def _runs(mask: np.ndarray) -> Tuple[int, int]:
+    """(longest run of True, run of True ending at the last element)."""
+    edges = np.diff(np.concatenate(([0], mask.astype(np.int8), [0])))
+    starts, ends = np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+    if not len(starts):
+        return 0, 0
+    lengths = ends - starts
+    return int(lengths.max()), int(lengths[-1]) if ends[-1] == len(mask) else 0
+
+
+def _slope_per_week(x: np.ndarray, y: np.ndarray) -> Optional[float]:
+    """Least-squares slope of y over x (days), per week; None without two distinct days."""
+    if len(y) < 2:
+        return None
+    dx = x - x.mean()
+    var = float(dx @ dx)
+    return float(dx @ (y - y.mean()) / var * 7) if var else None
+
+
+def _iso_weeks(mondays: np.ndarray) -> List[str]:
+    # The ISO year is the year of the week's Thursday; so is the week number
+    thursdays = mondays + 3
+    years = thursdays.astype("datetime64[Y]")
+    numbers = (thursdays - years.astype("datetime64[D]")).astype(np.int64) // 7 + 1
+    return [f"{y:04d}-W{n:02d}" for y, n in zip((years.astype(np.int64) + 1970).tolist(), numbers.tolist())]
+
+
+def _ratio(num: np.ndarray, den: np.ndarray) -> np.ndarray:
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(den > 0, num / den, np.nan)
+
+
+def compute(cols: LogColumns) -> Dict[str, Any]:
+    """Every metric over the whole history; daily series cover first..last logged day."""
+    ok = ~np.isnat(cols.day) & (cols.day >= _MIN_DAY) & (cols.day < _MAX_DAY)
+    order = np.lexsort((cols.id[ok], cols.day[ok]))  # by day, then id
+    day, done, steps, weight = (c[ok][order] for c in (cols.day, cols.done, cols.steps, cols.weight))
+    # Newest log of each day: the last of each run of equal days
+    newest = np.concatenate((day[1:] != day[:-1], [True])) if len(day) else np.empty(0, bool)
+    day, done, steps, weight = day[newest], done[newest], steps[newest], weight[newest]
+    if not len(day):
+        return {"first_date": None, "last_date": None}
+
+    start = day[0]
+    n = int((day[-1] - start).astype(np.int64)) + 1
+    at = (day - start).astype(np.int64)
+    logged = np.zeros(n, bool)
+    logged[at] = True
+    done_d = np.zeros(n, bool)
+    done_d[at] = done
+    steps_d = np.full(n, np.nan)
+    steps_d[at] = steps
+    weight_d = np.full(n, np.nan)
+    weight_d[at] = weight
+
+    # Monday-based week index: day 0 of datetime64 (1970-01-01) is a Thursday
+    epoch_days = start.astype(np.int64) + np.arange(n)
+    week = (epoch_days + 3) // 7
+    week -= week[0]
+    n_weeks = int(week[-1]) + 1
+    first_monday = start - np.timedelta64(int((start.astype(np.int64) + 3) % 7), "D")
+
+    week_logged = np.bincount(week, weights=logged, minlength=n_weeks)
+    week_done = np.bincount(week, weights=done_d, minlength=n_weeks)
+    has_steps = ~np.isnan(steps_d)
+    week_steps = _ratio(np.bincount(week, weights=np.where(has_steps, steps_d, 0.0), minlength=n_weeks),
+                        np.bincount(week, weights=has_steps, minlength=n_weeks))
+    # Each week's weight is its last weigh-in
+    weighed = np.flatnonzero(~np.isnan(weight_d))
+    week_weight = np.full(n_weeks, np.nan)
+    if len(weighed):
+        w = week[weighed]
+        last = np.concatenate((w[1:] != w[:-1], [True]))
+        week_weight[w[last]] = weight_d[weighed[last]]
+
+    weigh_days, weigh_kg = at[~np.isnan(weight)], weight[~np.isnan(weight)]
+    trend = {}
+    for name, span in TREND_WINDOWS.items():
+        keep = weigh_days > weigh_days[-1] - span if span and len(weigh_days) else slice(None)
+        trend[name] = _slope_per_week(weigh_days[keep].astype(float), weigh_kg[keep])
+
+    workout_longest, workout_trailing = _runs(done_d)
+    logging_longest, logging_trailing = _runs(logged)
+    return {
+        "first_date": str(day[0]),
+        "last_date": str(day[-1]),
+        "logged_days": len(day),
+        "workouts": int(done.sum()),
+        "adherence": float(done.mean()),
+        "streaks": {"workout": (workout_longest, workout_trailing), "logging": (logging_longest, logging_trailing)},
+        "weight": {
+            "first_kg": float(weigh_kg[0]) if len(weigh_kg) else None,
+            "latest_kg": float(weigh_kg[-1]) if len(weigh_kg) else None,
+            "latest_date": str(start + weigh_days[-1]) if len(weigh_days) else None,
+            "trend": trend,
+        },
+        "daily": {
+            "date": np.arange(start, day[-1] + 1),
+            "logged": logged,
+            "workout_done": done_d,
+            "steps": steps_d,
+            **{f"steps_avg_{w}d": _rolling_mean(steps_d, w) for w in ROLLING_WINDOWS},
+            "weight_kg": weight_d,
+            "weight_avg_7d": _rolling_mean(weight_d, 7),
+        },
+        "weekly": {
+            "week": _iso_weeks(first_monday + 7 * np.arange(n_weeks)),
+            "logged_days": week_logged.astype(np.int64),
+            "workouts": week_done.astype(np.int64),
+            "adherence": _ratio(week_done, week_logged),
+            "avg_steps": week_steps,
+            "weight_kg": week_weight,
+        },
+    }
+
+
+async def aget_progress(profile_id: int) -> Dict[str, Any]:
+    """compute() for a profile, from progress_cache when it can be."""
+    cached = progress_cache.get(profile_id)
+    if cached is None:
+        version = progress_cache.version()
+        cols = columns(await aget_log_rows(profile_id))
+        result = compute(cols)
+        progress_cache.put(profile_id, cols, result, version)
+        return result
+    cols, pending, result = cached
+    if result is None:
+        merged = concat(cols, columns(pending)) if pending else cols
+        result = compute(merged)
+        progress_cache.fold(profile_id, cols, merged, len(pending), result)
+    return result
+
+
+def _json_floats(a: np.ndarray, digits: int) -> List[Optional[float]]:
+    return [None if v != v else v for v in np.round(a, digits).tolist()]
+
+
+def _json_ints(a: np.ndarray) -> List[Optional[int]]:
+    return [None if v != v else int(v) for v in a.tolist()]
+
+
+def progress_response(profile_name: str, result: Dict[str, Any], days: int,
+                      today: Optional[_date] = None) -> Dict[str, Any]:
+    """ProgressOut-shaped dict: the last `days` of the daily series and every week.
+
+    A streak only counts as current if it reaches yesterday or today.
+    """
+    if result["first_date"] is None:
+        return ProgressOut(profile_name=profile_name).model_dump()
+    today = today or _date.today()
+    live = _date.fromisoformat(result["last_date"]) >= today - timedelta(days=1)
+    streaks = {f"{k}_streak": {"current": trailing if live else 0, "longest": longest}
+               for k, (longest, trailing) in result["streaks"].items()}
+    weight = result["weight"]
+    first, latest = weight["first_kg"], weight["latest_kg"]
+
+    d = result["daily"]
+    tail = slice(max(0, len(d["date"]) - days), None) if days else slice(0, 0)
+    w = result["weekly"]
+    return {
+        "profile_name": profile_name,
+        "first_date": result["first_date"],
+        "last_date": result["last_date"],
+        "logged_days": result["logged_days"],
+        "workouts": result["workouts"],
+        "adherence": round(result["adherence"], 3),
+        **streaks,
+        "weight": {
+            "first_kg": first,
+            "latest_kg": latest,
+            "latest_date": weight["latest_date"],
+            "change_kg": round(latest - first, 2) if latest is not None else None,
+            **{f"trend_kg_per_week_{k}": None if v is None else round(v, 3) for k, v in weight["trend"].items()},
+        },
+        "daily": {
+            "date": np.datetime_as_string(d["date"][tail]).tolist(),
+            "logged": d["logged"][tail].tolist(),
+            "workout_done": d["workout_done"][tail].tolist(),
+            "steps": _json_ints(d["steps"][tail]),
+            **{f"steps_avg_{n}d": _json_floats(d[f"steps_avg_{n}d"][tail], 1) for n in ROLLING_WINDOWS},
+            "weight_kg": _json_floats(d["weight_kg"][tail], 2),
+            "weight_avg_7d": _json_floats(d["weight_avg_7d"][tail], 2),
+        },
+        "weekly": {
+            "week": w["week"],
+            "logged_days": w["logged_days"].tolist(),
+            "workouts": w["workouts"].tolist(),
+            "adherence": _json_floats(w["adherence"], 3),
+            "avg_steps": _json_floats(w["avg_steps"], 1),
+            "weight_kg": _json_floats(w["weight_kg"], 2),
+        },
+    }
@@ -0,0 +1,373 @@
+import asyncio
+import os
+import threading
+import time
+import weakref
+from collections import deque
+from types import SimpleNamespace
+from typing import TYPE_CHECKING, Any, AsyncIterator, Callable, Dict, Iterator, List, Optional
+
+if TYPE_CHECKING:
+    import httpx
+
+from .ratelimit import LLMGate, estimate_tokens
+from .resilience import Resilience, resilience_from_env
+from .serialization import dumps, loads
+
+# ---- clients: everything exposes the Groq/OpenAI `chat.completions.create` surface ----
+
+# httpx is imported by the client factories below, so processes that never
+# call a provider (CLIs, rule-only requests) don't pay for it at startup
+
+def _pool_limits() -> "httpx.Limits":
+    import httpx
+    return httpx.Limits(
+        max_connections=int(os.getenv("LLM_POOL_MAX_CONNECTIONS", "32")),
+        max_keepalive_connections=int(os.getenv("LLM_POOL_MAX_KEEPALIVE", "16")),
+        keepalive_expiry=float(os.getenv("LLM_POOL_KEEPALIVE_SECONDS", "60")),
+    )
+
+def _http_timeout() -> "httpx.Timeout":
+    import httpx
+    return httpx.Timeout(float(os.getenv("LLM_HTTP_TIMEOUT_SECONDS", "60")), connect=5.0)
+
+
+class _Lazy:
+    """One sync client per process and one async client per event loop, built on first use,
+    so requests reuse keep-alive connections."""
+
+    def __init__(self, make_sync: Callable[[], Any], make_async: Callable[[], Any]):
+        self._make_sync, self._make_async = make_sync, make_async
+        self._lock = threading.Lock()
+        self._sync: Any = None
+        self._async: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Any]" = weakref.WeakKeyDictionary()
+
+    def sync(self) -> Any:
+        if self._sync is None:
+            with self._lock:
+                if self._sync is None:
+                    self._sync = self._make_sync()
+        return self._sync
+
+    def aio(self) -> Any:
+        loop = asyncio.get_running_loop()
+        client = self._async.get(loop)
+        if client is None:
+            client = self._async[loop] = self._make_async()
+        return client
+
+
+def _groq_clients(api_key: Optional[str]) -> _Lazy:
+    import httpx
+    from groq import AsyncGroq, Groq
+
+    def key() -> str:
+        if not api_key:
+            raise RuntimeError("GROQ_API_KEY is missing. Put it in backend/.env or env vars.")
+        return api_key
+
+    # Retries belong to resilience.Resilience; the SDK's own would multiply them
+    return _Lazy(
+        lambda: Groq(api_key=key(), max_retries=0,
+                     http_client=httpx.Client(limits=_pool_limits(), timeout=_http_timeout())),
+        lambda: AsyncGroq(api_key=key(), max_retries=0,
+                          http_client=httpx.AsyncClient(limits=_pool_limits(), timeout=_http_timeout())),
+    )
+
+
+class ProviderHTTPError(RuntimeError):
+    def __init__(self, status_code: int, body: str):
+        super().__init__(f"HTTP {status_code}: {body[:200]}")
+        self.status_code = status_code
+
+
+def _ns(obj: Any) -> Any:
+    # JSON -> attribute access, so responses look like the SDK's models
+    if isinstance(obj, dict):
+        return SimpleNamespace(**{k: _ns(v) for k, v in obj.items()})
+    if isinstance(obj, list):
+        return [_ns(v) for v in obj]
+    return obj
+
+
+class OpenAICompatible:
+    """Client for an OpenAI-compatible /chat/completions server (llama.cpp, vLLM, Ollama, ...)."""
+
+    def __init__(self, base_url: str, api_key: str = "", is_async: bool = False):
+        import httpx
+        headers = {"Authorization": f"Bearer {api_key}"} if api_key else {}
+        cls = httpx.AsyncClient if is_async else httpx.Client
+        self._http = cls(base_url=base_url.rstrip("/"), headers=headers, limits=_pool_limits(), timeout=_http_timeout())
+        self._async = is_async
+        self.chat = SimpleNamespace(completions=self)
+
+    @staticmethod
+    def _body(model: str, messages: List[Dict[str, str]], temperature: float, stream: bool) -> bytes:
+        body: Dict[str, Any] = {"model": model, "messages": messages, "temperature": temperature, "stream": stream}
+        if stream:
+            body["stream_options"] = {"include_usage": True}
+        return dumps(body)
+
+    @staticmethod
+    def _chunk(line: str) -> Optional[Any]:
+        if not line.startswith("data:"):
+            return None
+        data = line[5:].strip()
+        return None if data in ("", "[DONE]") else _ns(loads(data))
+
+    def create(self, model: str, messages: List[Dict[str, str]], temperature: float = 0.3,
+               stream: bool = False, timeout: Optional[float] = None, **_: Any) -> Any:
+        body = self._body(model, messages, temperature, stream)
+        if self._async:
+            return self._acreate(body, stream, timeout)
+        if stream:
+            return self._stream(body, timeout)
+        r = self._http.post("/chat/completions", content=body, timeout=timeout,
+                            headers={"content-type": "application/json"})
+        if r.status_code >= 400:
+            raise ProviderHTTPError(r.status_code, r.text)
+        return _ns(r.json())
+
+    def _stream(self, body: bytes, timeout: Optional[float]) -> Iterator[Any]:
+        with self._http.stream("POST", "/chat/completions", content=body, timeout=timeout,
+                               headers={"content-type": "application/json"}) as r:
+            if r.status_code >= 400:
+                raise ProviderHTTPError(r.status_code, r.read().decode(errors="replace"))
+            for line in r.iter_lines():
+                chunk = self._chunk(line)
+                if chunk is not None:
+                    yield chunk
+
+    async def _acreate(self, body: bytes, stream: bool, timeout: Optional[float]) -> Any:
+        req = self._http.build_request("POST", "/chat/completions", content=body, timeout=timeout,
+                                       headers={"content-type": "application/json"})
+        r = await self._http.send(req, stream=stream)
+        if r.status_code >= 400:
+            text = (await r.aread()).decode(errors="replace")
+            await r.aclose()
+            raise ProviderHTTPError(r.status_code, text)
+        if not stream:
+            return _ns(loads(r.content))
+        return self._astream(r)
+
+    async def _astream(self, r: "httpx.Response") -> AsyncIterator[Any]:
+        try:
+            async for line in r.aiter_lines():
+                chunk = self._chunk(line)
+                if chunk is not None:
+                    yield chunk
+        finally:
+            await r.aclose()
+
+
+class StubCompletions:
+    """Offline provider: a deterministic reply built from the prompt, no network."""
+
+    def __init__(self, is_async: bool = False, latency_seconds: float = 0.0):
+        self._async, self.latency_seconds = is_async, latency_seconds
+        self.chat = SimpleNamespace(completions=self)
+
+    @staticmethod
+    def _reply(model: str, messages: List[Dict[str, str]]) -> Any:
+        prompt = messages[-1]["content"]
+        first = next((l.strip() for l in prompt.splitlines() if l.strip()), "")
+        text = f"[offline stub {model}] Based on: {first[:160]}"
+        usage = SimpleNamespace(prompt_tokens=sum(estimate_tokens(m["content"]) for m in messages),
+                                completion_tokens=estimate_tokens(text))
+        usage.total_tokens = usage.prompt_tokens + usage.completion_tokens
+        return text, usage
+
+    def create(self, model: str, messages: List[Dict[str, str]], temperature: float = 0.3,
+               stream: bool = False, **_: Any) -> Any:
+        if self._async:
+            return self._acreate(model, messages, stream)
+        time.sleep(self.latency_seconds)
+        text, usage = self._reply(model, messages)
+        return iter(self._chunks(text, usage)) if stream else self._response(text, usage)
+
+    @staticmethod
+    def _response(text: str, usage: Any) -> Any:
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(role="assistant", content=text))],
+                               usage=usage)
+
+    @staticmethod
+    def _chunks(text: str, usage: Any) -> List[Any]:
+        chunks = [SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=w + " "))], usage=None)
+                  for w in text.split(" ")]
+        return chunks + [SimpleNamespace(choices=[], usage=usage)]
+
+    async def _acreate(self, model: str, messages: List[Dict[str, str]], stream: bool) -> Any:
+        await asyncio.sleep(self.latency_seconds)
+        text, usage = self._reply(model, messages)
+        if not stream:
+            return self._response(text, usage)
+
+        async def chunks():
+            for chunk in self._chunks(text, usage):
+                yield chunk
+        return chunks()
+
+
+# ---- providers and routing ----
+
+class Provider:
+    """A chat-completions backend with its own concurrency/rate limits, resilience
+    policy and a rolling window of call outcomes for the router."""
+
+    def __init__(
+        self,
+        name: str,
+        model: str,
+        clients: _Lazy,
+        gate: LLMGate,
+        resilience: Resilience,
+        cost: float = 0.0,
+        cacheable: bool = True,
+        last_resort: bool = False,
+        window: int = 50,
+        window_seconds: float = 300.0,
+    ):
+        self.name, self.model, self.clients = name, model, clients
+        self.gate, self.resilience = gate, resilience
+        self.cost, self.cacheable, self.last_resort = cost, cacheable, last_resort
+        self.window_seconds = window_seconds
+        self._lock = threading.Lock()
+        # (ok, seconds, recorded at) per routed call
+        self._window: "deque[tuple]" = deque(maxlen=window)
+        self.calls = self.failures = 0
+
+    def record(self, ok: bool, seconds: float) -> None:
+        with self._lock:
+            self._window.append((ok, seconds, time.monotonic()))
+            self.calls += 1
+            self.failures += not ok
+
+    def _recent(self) -> List[tuple]:
+        # Old samples expire so a provider that failed a while ago gets tried again
+        cutoff = time.monotonic() - self.window_seconds
+        with self._lock:
+            return [(ok, s) for ok, s, at in self._window if at >= cutoff]
+
+    def latency(self) -> Optional[float]:
+        xs = sorted(s for ok, s in self._recent() if ok)
+        return xs[len(xs) // 2] if xs else None
+
+    def error_rate(self) -> float:
+        recent = self._recent()
+        return sum(1 for ok, _ in recent if not ok) / len(recent) if recent else 0.0
+
+    def available(self) -> bool:
+        return self.resilience.breaker.state != "open"
+
+    def stats(self) -> Dict[str, Any]:
+        latency = self.latency()
+        return {
+            "model": self.model,
+            "calls": self.calls,
+            "failures": self.failures,
+            "p50_ms": round(latency * 1e3, 1) if latency is not None else None,
+            "error_rate": round(self.error_rate(), 3),
+            "cost": self.cost,
+            "limiter": self.gate.stats(),
+            "resilience": self.resilience.stats(),
+        }
+
+
+class Router:
+    """Orders providers for each call: lowest expected cost first, where
+
+        score = p50 latency * (1 + 4 * error rate) * (1 + queued / max concurrency)
+                + cost_weight * cost
+
+    Providers with an open breaker are skipped; ones without recent samples score
+    only their cost so they get tried, and ones whose recent calls all failed go
+    last. Last-resort providers (the stub) always come after the rest. Callers
+    fall through the list until one succeeds.
+    """
+
+    def __init__(self, providers: List[Provider], cost_weight: float = 0.0):
+        if not providers:
+            raise ValueError("Router needs at least one provider")
+        self.providers = providers
+        self.cost_weight = cost_weight
+
+    def _score(self, p: Provider) -> float:
+        latency = p.latency()
+        if latency is None:
+            return float("inf") if p.error_rate() else self.cost_weight * p.cost
+        gate = p.gate.stats()
+        load = 1 + gate["queue_depth"] / max(1, gate["max_concurrency"])
+        return latency * (1 + 4 * p.error_rate()) * load + self.cost_weight * p.cost
+
+    def ranked(self) -> List[Provider]:
+        ready = [p for p in self.providers if p.available()]
+        # All breakers open: keep config order so the call fails fast as CircuitOpen
+        if not ready:
+            return list(self.providers)
+        order = {id(p): i for i, p in enumerate(self.providers)}
+        return sorted(ready, key=lambda p: (p.last_resort, self._score(p), order[id(p)]))
+
+    def stats(self) -> Dict[str, Any]:
+        out = {}
+        for p in self.providers:
+            score = self._score(p)
+            out[p.name] = {**p.stats(), "score": round(score, 4) if score != float("inf") else None,
+                           "last_resort": p.last_resort}
+        return out
+
+
+KINDS = ("groq", "openai", "stub")
+
+def _env(name: str, key: str, default: Optional[str] = None) -> Optional[str]:
+    return os.getenv(f"LLM_{name.upper()}_{key}", default)
+
+def provider_from_env(name: str) -> Provider:
+    """Provider `name` from LLM_<NAME>_* variables.
+
+    KIND is groq, openai (any OpenAI-compatible server at BASE_URL) or stub, and
+    defaults to the name itself. The groq provider also reads GROQ_API_KEY,
+    GROQ_MODEL and the global LLM_MAX_CONCURRENCY/LLM_RPM/LLM_TPM.
+    """
+    kind = (_env(name, "KIND") or name).lower()
+    if kind not in KINDS:
+        raise ValueError(f"LLM provider {name!r}: unknown kind {kind!r} (expected one of {', '.join(KINDS)})")
+
+    if kind == "groq":
+        model = _env(name, "MODEL") or os.getenv("GROQ_MODEL", "llama-3.1-8b-instant")
+        clients = _groq_clients(_env(name, "API_KEY") or os.getenv("GROQ_API_KEY"))
+        limits = (os.getenv("LLM_MAX_CONCURRENCY", "8"), os.getenv("LLM_RPM", "30"), os.getenv("LLM_TPM", "6000"))
+    elif kind == "openai":
+        base_url = _env(name, "BASE_URL", "http://127.0.0.1:8080/v1")
+        key = _env(name, "API_KEY", "")
+        model = _env(name, "MODEL", "local")
+        clients = _Lazy(lambda: OpenAICompatible(base_url, key), lambda: OpenAICompatible(base_url, key, is_async=True))
+        # Local servers usually have no quota, just a small number of slots
+        limits = ("2", "0", "0")
+    else:
+        model = _env(name, "MODEL", "stub")
+        latency = float(_env(name, "LATENCY_MS", "0")) / 1e3
+        clients = _Lazy(lambda: StubCompletions(latency_seconds=latency),
+                        lambda: StubCompletions(is_async=True, latency_seconds=latency))
+        limits = ("64", "0", "0")
+
+    gate = LLMGate(
+        max_concurrency=int(_env(name, "MAX_CONCURRENCY", limits[0])),
+        requests_per_minute=float(_env(name, "RPM", limits[1])),
+        tokens_per_minute=float(_env(name, "TPM", limits[2])),
+        max_wait_seconds=float(os.getenv("LLM_GATE_MAX_WAIT_SECONDS", "60")),
+    )
+    resilience = resilience_from_env()
+    if _env(name, "DEADLINE_SECONDS"):
+        resilience.deadline_seconds = float(_env(name, "DEADLINE_SECONDS"))
+    return Provider(
+        name, model, clients, gate, resilience,
+        cost=float(_env(name, "COST", "0")),
+        # Stub text is a placeholder: never preferred, never cached
+        cacheable=kind != "stub",
+        last_resort=kind == "stub",
+        window_seconds=float(os.getenv("LLM_ROUTER_WINDOW_SECONDS", "300")),
+    )
+
+def router_from_env() -> Router:
+    names = [n.strip() for n in os.getenv("LLM_PROVIDERS", "groq").split(",") if n.strip()]
+    return Router([provider_from_env(n) for n in names], cost_weight=float(os.getenv("LLM_ROUTER_COST_WEIGHT", "0")))
@@ -0,0 +1,243 @@
+import asyncio
+import os
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, Dict, Optional
+
+from .resilience import GateTimeout
+
+
+class TokenBucket:
+    """Reservation-style token bucket.
+
+    `reserve` always succeeds and returns how long the caller must wait before
+    using the tokens, so the same bucket serves threads and coroutines.
+    """
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.rate = self.capacity / 60.0
+        self._level = self.capacity
+        self._stamp = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, amount: float = 1.0) -> float:
+        amount = min(float(amount), self.capacity)
+        with self._lock:
+            now = time.monotonic()
+            self._level = min(self.capacity, self._level + (now - self._stamp) * self.rate)
+            self._stamp = now
+            self._level -= amount
+            return 0.0 if self._level >= 0 else -self._level / self.rate
+
+    def adjust(self, delta: float) -> None:
+        # Positive delta returns unused tokens, negative charges extra usage
+        with self._lock:
+            self._level = min(self.capacity, self._level + delta)
+
+
+class Permits:
+    """Counting semaphore shared by threads and coroutines on any event loop.
+
+    Waiters of both kinds queue in one FIFO and release() hands the permit
+    straight to the oldest, so sync and async callers share a single limit.
+    """
+
+    def __init__(self, value: int):
+        self._free = value
+        self._lock = threading.Lock()
+        # threading.Event for threads, (loop, future) for coroutines
+        self._waiters: "deque[Any]" = deque()
+
+    def acquire(self, timeout: Optional[float] = None) -> bool:
+        with self._lock:
+            if self._free > 0 and not self._waiters:
+                self._free -= 1
+                return True
+            waiter = threading.Event()
+            self._waiters.append(waiter)
+        if waiter.wait(timeout):
+            return True
+        return self._withdraw(waiter)
+
+    async def aacquire(self, timeout: Optional[float] = None) -> bool:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if self._free > 0 and not self._waiters:
+                self._free -= 1
+                return True
+            waiter = (loop, loop.create_future())
+            self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter[1]), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return self._withdraw(waiter)
+        except BaseException:
+            if self._withdraw(waiter):
+                self.release()
+            raise
+
+    def release(self) -> None:
+        while True:
+            with self._lock:
+                if not self._waiters:
+                    self._free += 1
+                    return
+                waiter = self._waiters.popleft()
+            if isinstance(waiter, threading.Event):
+                waiter.set()
+                return
+            loop, fut = waiter
+            try:
+                loop.call_soon_threadsafe(fut.set_result, True)
+                return
+            except RuntimeError:
+                continue  # that waiter's loop is closed; hand the permit to the next one
+
+    def _withdraw(self, waiter: Any) -> bool:
+        """Leave the queue after a timeout; True if the permit was handed over meanwhile."""
+        with self._lock:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+                return False
+        return True
+
+
+def estimate_tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+class LLMGate:
+    """Caps in-flight LLM calls and paces them to the provider's RPM/TPM limits.
+
+    `max_concurrency` bounds sync (slot) and async (aslot) calls together.
+    Waiting for a slot plus pacing is capped at `max_wait_seconds`, after which
+    GateTimeout is raised and nothing is charged to the RPM/TPM budgets.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = 8,
+        requests_per_minute: float = 0,
+        tokens_per_minute: float = 0,
+        max_wait_seconds: float = 60.0,
+    ):
+        self.max_concurrency = max_concurrency
+        self.max_wait_seconds = max_wait_seconds
+        self._permits = Permits(max_concurrency)
+        self._rpm = TokenBucket(requests_per_minute) if requests_per_minute > 0 else None
+        self._tpm = TokenBucket(tokens_per_minute) if tokens_per_minute > 0 else None
+        self._lock = threading.Lock()
+        self._waiting = 0
+        self._in_flight = 0
+        self._stats = {"acquired": 0, "waited": 0, "timeouts": 0, "wait_seconds_total": 0.0, "wait_seconds_max": 0.0}
+
+    def _pacing_delay(self, tokens: int, limit: float) -> float:
+        """Reserve budget for one call; GateTimeout if it isn't available within `limit` seconds."""
+        delay = 0.0
+        if self._rpm is not None:
+            delay = max(delay, self._rpm.reserve(1))
+        if self._tpm is not None:
+            delay = max(delay, self._tpm.reserve(tokens))
+        if delay > limit:
+            if self._rpm is not None:
+                self._rpm.adjust(1)
+            if self._tpm is not None:
+                self._tpm.adjust(tokens)
+            self._timed_out()
+        return delay
+
+    def _timed_out(self) -> None:
+        with self._lock:
+            self._stats["timeouts"] += 1
+        raise GateTimeout(f"no LLM slot within {self.max_wait_seconds:g}s")
+
+    @contextmanager
+    def _queued(self):
+        started = time.monotonic()
+        with self._lock:
+            self._waiting += 1
+        try:
+            yield
+        finally:
+            waited = time.monotonic() - started
+            with self._lock:
+                self._waiting -= 1
+                self._stats["wait_seconds_total"] += waited
+                self._stats["wait_seconds_max"] = max(self._stats["wait_seconds_max"], waited)
+                if waited > 0.001:
+                    self._stats["waited"] += 1
+
+    @contextmanager
+    def _running(self):
+        with self._lock:
+            self._in_flight += 1
+            self._stats["acquired"] += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+
+    def settle(self, estimated_tokens: int, actual_tokens: Optional[int]) -> None:
+        if self._tpm is not None and actual_tokens is not None:
+            self._tpm.adjust(estimated_tokens - actual_tokens)
+
+    @contextmanager
+    def slot(self, tokens: int = 1):
+        deadline = time.monotonic() + self.max_wait_seconds
+        with self._queued():
+            if not self._permits.acquire(self.max_wait_seconds):
+                self._timed_out()
+            try:
+                delay = self._pacing_delay(tokens, deadline - time.monotonic())
+                if delay > 0:
+                    time.sleep(delay)
+            except BaseException:
+                self._permits.release()
+                raise
+        try:
+            with self._running():
+                yield
+        finally:
+            self._permits.release()
+
+    @asynccontextmanager
+    async def aslot(self, tokens: int = 1):
+        deadline = time.monotonic() + self.max_wait_seconds
+        with self._queued():
+            if not await self._permits.aacquire(self.max_wait_seconds):
+                self._timed_out()
+            try:
+                delay = self._pacing_delay(tokens, deadline - time.monotonic())
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            except BaseException:
+                self._permits.release()
+                raise
+        try:
+            with self._running():
+                yield
+        finally:
+            self._permits.release()
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            return {
+                **self._stats,
+                "queue_depth": self._waiting,
+                "in_flight": self._in_flight,
+                "max_concurrency": self.max_concurrency,
+            }
+
+
+def gate_from_env() -> LLMGate:
+    return LLMGate(
+        max_concurrency=int(os.getenv("LLM_MAX_CONCURRENCY", "8")),
+        requests_per_minute=float(os.getenv("LLM_RPM", "30")),
+        tokens_per_minute=float(os.getenv("LLM_TPM", "6000")),
+        max_wait_seconds=float(os.getenv("LLM_GATE_MAX_WAIT_SECONDS", "60")),
+    )
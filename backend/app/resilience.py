@@ -0,0 +1,274 @@
+import asyncio
+import os
+import random
+import sys
+import threading
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict, Optional, TypeVar
+
+from .telemetry import LLM_RESILIENCE
+
+T = TypeVar("T")
+
+
+class LLMUnavailable(RuntimeError):
+    """The provider call gave up: failed, timed out or short-circuited by the breaker."""
+
+
+class DeadlineExceeded(LLMUnavailable):
+    pass
+
+
+class CircuitOpen(LLMUnavailable):
+    pass
+
+
+class GateTimeout(LLMUnavailable):
+    """Waited longer than the gate allows for a local slot or RPM/TPM budget; the
+    provider was never called, so this says nothing about its health."""
+
+
+def retryable(e: BaseException) -> bool:
+    """Transient provider failures: timeouts, connection errors, 429 and 5xx."""
+    if isinstance(e, TimeoutError):
+        return True
+    # Only look at httpx if a client already loaded it; otherwise no httpx error can exist
+    httpx = sys.modules.get("httpx")
+    if httpx is not None and isinstance(e, httpx.TransportError):
+        return True
+    # groq.APIConnectionError/APITimeoutError and APIStatusError subclasses, without importing groq here
+    if type(e).__name__ in ("APIConnectionError", "APITimeoutError"):
+        return True
+    status = getattr(e, "status_code", None)
+    return isinstance(status, int) and (status == 429 or status >= 500)
+
+
+class CircuitBreaker:
+    """Opens after `failures` consecutive failed attempts; after `reset_seconds` one
+    probe call is let through (half-open) and its outcome closes or re-opens it."""
+
+    def __init__(self, failures: int = 5, reset_seconds: float = 30.0):
+        self.failures = failures
+        self.reset_seconds = reset_seconds
+        self._lock = threading.Lock()
+        self._consecutive = 0
+        self._opened_at: Optional[float] = None
+        self._probing = False
+        self.trips = 0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            return "half_open" if time.monotonic() - self._opened_at >= self.reset_seconds else "open"
+
+    def allow(self) -> None:
+        if self.failures <= 0:
+            return
+        with self._lock:
+            if self._opened_at is None:
+                return
+            if time.monotonic() - self._opened_at >= self.reset_seconds and not self._probing:
+                self._probing = True
+                return
+        LLM_RESILIENCE.inc(("short_circuit",))
+        raise CircuitOpen("LLM circuit breaker is open")
+
+    def success(self) -> None:
+        with self._lock:
+            self._consecutive = 0
+            self._opened_at = None
+            self._probing = False
+
+    def abandon(self) -> None:
+        # A cancelled probe says nothing about the provider; let the next call probe
+        with self._lock:
+            self._probing = False
+
+    def failure(self) -> None:
+        if self.failures <= 0:
+            return
+        with self._lock:
+            self._consecutive += 1
+            if self._probing or (self._opened_at is None and self._consecutive >= self.failures):
+                self._opened_at = time.monotonic()
+                self._probing = False
+                self.trips += 1
+                LLM_RESILIENCE.inc(("breaker_open",))
+
+    def stats(self) -> Dict[str, Any]:
+        state = self.state
+        with self._lock:
+            return {"state": state, "consecutive_failures": self._consecutive, "trips": self.trips}
+
+
+class Resilience:
+    """Deadline, jittered exponential retries, optional hedging and a circuit
+    breaker around one provider call.
+
+    `attempt(timeout)` performs a single call and should pass `timeout` on to the
+    HTTP client. Hedging (async only) starts a duplicate attempt once the first
+    has run longer than the `hedge_percentile` of recent successful attempts.
+    Every way of giving up raises LLMUnavailable.
+    """
+
+    def __init__(
+        self,
+        deadline_seconds: float = 20.0,
+        max_retries: int = 2,
+        backoff_base_seconds: float = 0.25,
+        backoff_max_seconds: float = 4.0,
+        hedge_percentile: float = 0.0,
+        hedge_min_samples: int = 20,
+        breaker: Optional[CircuitBreaker] = None,
+    ):
+        self.deadline_seconds = deadline_seconds
+        self.max_retries = max_retries
+        self.backoff_base_seconds = backoff_base_seconds
+        self.backoff_max_seconds = backoff_max_seconds
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_samples = hedge_min_samples
+        self.breaker = breaker or CircuitBreaker()
+        self._latencies: "deque[float]" = deque(maxlen=256)
+        self._lock = threading.Lock()
+
+    def _backoff(self, n: int) -> float:
+        # "Full jitter": uniform over the exponential window
+        return random.uniform(0, min(self.backoff_max_seconds, self.backoff_base_seconds * 2 ** n))
+
+    def _observe(self, seconds: float) -> None:
+        with self._lock:
+            self._latencies.append(seconds)
+
+    def hedge_delay(self) -> Optional[float]:
+        if self.hedge_percentile <= 0:
+            return None
+        with self._lock:
+            if len(self._latencies) < self.hedge_min_samples:
+                return None
+            xs = sorted(self._latencies)
+        return xs[min(len(xs) - 1, int(len(xs) * self.hedge_percentile / 100))]
+
+    def _give_up(self, last: Optional[BaseException], deadline: float) -> LLMUnavailable:
+        if time.monotonic() >= deadline or isinstance(last, TimeoutError):
+            LLM_RESILIENCE.inc(("deadline",))
+            return DeadlineExceeded(f"LLM call exceeded its {self.deadline_seconds:g}s deadline")
+        return LLMUnavailable(f"LLM call failed: {last!r}")
+
+    def _failed(self, e: BaseException, n: int, deadline: float) -> Optional[float]:
+        """Record a failed attempt; returns the backoff before the next one, or None to stop."""
+        if not retryable(e):
+            # The provider answered (e.g. a 400); that's not an outage
+            self.breaker.success()
+            return None
+        self.breaker.failure()
+        if n >= self.max_retries or self.breaker.state == "open":
+            return None
+        pause = self._backoff(n)
+        if time.monotonic() + pause >= deadline:
+            return None
+        LLM_RESILIENCE.inc(("retry",))
+        return pause
+
+    def call(self, attempt: Callable[[float], T]) -> T:
+        deadline = time.monotonic() + self.deadline_seconds
+        last: Optional[BaseException] = None
+        for n in range(self.max_retries + 1):
+            self.breaker.allow()
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            start = time.monotonic()
+            try:
+                result = attempt(remaining)
+            except Exception as e:
+                last = e
+                pause = self._failed(e, n, deadline)
+                if pause is None:
+                    break
+                time.sleep(pause)
+                continue
+            self._observe(time.monotonic() - start)
+            self.breaker.success()
+            return result
+        raise self._give_up(last, deadline) from last
+
+    async def acall(self, attempt: Callable[[float], Awaitable[T]], hedge: bool = True) -> T:
+        deadline = time.monotonic() + self.deadline_seconds
+        last: Optional[BaseException] = None
+        for n in range(self.max_retries + 1):
+            self.breaker.allow()
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                result = await asyncio.wait_for(self._ahedged(attempt, remaining, hedge), remaining)
+            except asyncio.CancelledError:
+                self.breaker.abandon()
+                raise
+            except Exception as e:
+                last = e
+                pause = self._failed(e, n, deadline)
+                if pause is None:
+                    break
+                await asyncio.sleep(pause)
+                continue
+            self.breaker.success()
+            return result
+        raise self._give_up(last, deadline) from last
+
+    async def _timed(self, attempt: Callable[[float], Awaitable[T]], timeout: float) -> T:
+        start = time.monotonic()
+        result = await attempt(timeout)
+        self._observe(time.monotonic() - start)
+        return result
+
+    async def _ahedged(self, attempt: Callable[[float], Awaitable[T]], remaining: float, hedge: bool) -> T:
+        delay = self.hedge_delay() if hedge else None
+        if delay is None or delay >= remaining:
+            return await self._timed(attempt, remaining)
+
+        pending = {asyncio.ensure_future(self._timed(attempt, remaining))}
+        try:
+            done, pending = await asyncio.wait(pending, timeout=delay)
+            if not done:
+                LLM_RESILIENCE.inc(("hedge",))
+                pending.add(asyncio.ensure_future(self._timed(attempt, remaining - delay)))
+            error: Optional[BaseException] = None
+            while True:
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    error = task.exception()
+                if not pending:
+                    raise error
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            # The losing duplicate (or both, on cancellation) is abandoned
+            for task in pending:
+                task.cancel()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "breaker": self.breaker.stats(),
+            "deadline_seconds": self.deadline_seconds,
+            "max_retries": self.max_retries,
+            "hedge_after_seconds": self.hedge_delay(),
+        }
+
+
+def resilience_from_env() -> Resilience:
+    return Resilience(
+        deadline_seconds=float(os.getenv("LLM_DEADLINE_SECONDS", "20")),
+        max_retries=int(os.getenv("LLM_MAX_RETRIES", "2")),
+        backoff_base_seconds=float(os.getenv("LLM_RETRY_BASE_SECONDS", "0.25")),
+        backoff_max_seconds=float(os.getenv("LLM_RETRY_MAX_SECONDS", "4")),
+        hedge_percentile=float(os.getenv("LLM_HEDGE_PERCENTILE", "0")),
+        hedge_min_samples=int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20")),
+        breaker=CircuitBreaker(
+            failures=int(os.getenv("LLM_BREAKER_FAILURES", "5")),
+            reset_seconds=float(os.getenv("LLM_BREAKER_RESET_SECONDS", "30")),
+        ),
+    )
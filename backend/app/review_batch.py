@@ -0,0 +1,93 @@
+"""Precompute weekly reviews for every profile that logged recently.
+
+Run nightly (e.g. from cron) so Monday's /review requests are served from the
+review table instead of queueing on the LLM:
+
+    python -m backend.app.review_batch [--days 7] [--chunk 200] [--concurrency 8]
+
+Profiles are paged in id order; for each chunk the recent logs and weekly
+aggregates are read in bulk, profiles whose stored review still matches their
+inputs are skipped, and the rest run through the review graph with at most
+`--concurrency` in flight (the LLM router's limits apply on top). A review
+that fell back to template notes is not stored, so /review retries it live.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from dotenv import load_dotenv
+
+load_dotenv(Path(__file__).resolve().parents[1] / ".env")
+
+from .graph import get_review_graph, review_key
+from .storage import aactive_profile_ids, aget_review_inputs, asave_reviews, init_db
+
+
+async def _review(
+    graph, sem: asyncio.Semaphore, pid: int, logs: List[Dict[str, Any]], stats: Dict[str, Any], key: str,
+) -> Tuple[int, str, Optional[Dict[str, Any]], str]:
+    async with sem:
+        try:
+            out = await graph.ainvoke({"logs": logs, "stats": stats})
+        except Exception as e:
+            return pid, key, None, f"{type(e).__name__}: {e}"
+    return pid, key, out["review"], out.get("review_error", "")
+
+
+async def run(since: str, chunk: int = 200, concurrency: int = 8, force: bool = False) -> Dict[str, int]:
+    graph = get_review_graph()
+    sem = asyncio.Semaphore(concurrency)
+    counts = {"profiles": 0, "unchanged": 0, "saved": 0, "fallback": 0, "failed": 0}
+    after = 0
+    while True:
+        ids = await aactive_profile_ids(since, after_id=after, limit=chunk)
+        if not ids:
+            break
+        after = ids[-1]
+        counts["profiles"] += len(ids)
+
+        todo = []
+        for pid, (logs, stats, stored) in (await aget_review_inputs(ids)).items():
+            key = review_key(logs, stats)
+            if key == stored and not force:
+                counts["unchanged"] += 1
+                continue
+            todo.append(_review(graph, sem, pid, logs, stats, key))
+
+        saved = []
+        for pid, key, review, error in await asyncio.gather(*todo):
+            if review is None:
+                counts["failed"] += 1
+                print(f"profile {pid}: {error}", file=sys.stderr)
+            elif error:
+                counts["fallback"] += 1
+            else:
+                saved.append((pid, key, review))
+        await asave_reviews(saved)
+        counts["saved"] += len(saved)
+    return counts
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    ap.add_argument("--days", type=int, default=7, help="profiles with a log in the last N days")
+    ap.add_argument("--chunk", type=int, default=200, help="profiles read and saved per batch")
+    ap.add_argument("--concurrency", type=int, default=int(os.getenv("REVIEW_BATCH_CONCURRENCY", "8")))
+    ap.add_argument("--force", action="store_true", help="regenerate reviews whose inputs are unchanged")
+    args = ap.parse_args(argv)
+
+    init_db()
+    since = (date.today() - timedelta(days=args.days)).isoformat()
+    start = time.perf_counter()
+    counts = asyncio.run(run(since, args.chunk, args.concurrency, args.force))
+    print(" ".join(f"{k}={v}" for k, v in counts.items()), f"seconds={time.perf_counter() - start:.1f}")
+    return 1 if counts["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
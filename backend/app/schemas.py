@@ -1,4 +1,5 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, field_validator
+from datetime import date as _date
 from typing import Literal, Optional, List, Dict
 
 Goal = Literal["lose_fat", "build_muscle", "improve_stamina"]
@@ -14,10 +15,40 @@ class ProfileIn(BaseModel):
     weight_kg: Optional[float] = Field(default=None, ge=30, le=250)
     preferences: Dict[str, str] = Field(default_factory=dict)
 
+class SessionOut(BaseModel):
+    warmup: str
+    main: List[str]
+    cooldown: str
+
+class WorkoutOut(BaseModel):
+    day: int
+    title: str
+    duration_minutes: int
+    session: SessionOut
+
+class NutritionOut(BaseModel):
+    protein_g_per_day: Optional[int] = None
+    plate_method: List[str] = Field(default_factory=list)
+    notes: str = ""
+
+class PlanBody(BaseModel):
+    workouts: List[WorkoutOut]
+    nutrition: NutritionOut
+    explanation: Optional[str] = None
+    explanation_error: Optional[str] = None
+
 class PlanOut(BaseModel):
     profile: ProfileIn
-    plan: Dict
+    plan: PlanBody
     warnings: List[str] = Field(default_factory=list)
+    plan_id: Optional[int] = None
+    created_at: Optional[str] = None
+
+class ExplanationOut(BaseModel):
+    plan_id: int
+    status: Literal["pending", "ready", "failed"]
+    explanation: str = ""
+    error: str = ""
 
 class LogIn(BaseModel):
     date: str  # YYYY-MM-DD
@@ -26,8 +57,76 @@ class LogIn(BaseModel):
     weight_kg: Optional[float] = Field(default=None, ge=30, le=250)
     notes: Optional[str] = ""
 
+class BulkLogIn(LogIn):
+    profile_name: Optional[str] = Field(default=None, min_length=1)
+
+    @field_validator("date")
+    @classmethod
+    def _iso_date(cls, v: str) -> str:
+        # Bulk rows are upserted on (profile, date), so the date must be canonical
+        return _date.fromisoformat(v).isoformat()
+
+class BulkLogRowOut(BaseModel):
+    index: int
+    status: Literal["inserted", "updated", "superseded", "invalid"]
+    error: str = ""
+
+class BulkLogOut(BaseModel):
+    inserted: int = 0
+    updated: int = 0
+    superseded: int = 0
+    invalid: int = 0
+    rows: List[BulkLogRowOut] = Field(default_factory=list)
+
 class ReviewOut(BaseModel):
     adherence: float
     summary: str
     next_week_adjustment: str
     coach_notes: str = ""
+
+class StreakOut(BaseModel):
+    current: int = 0  # 0 unless the run reaches yesterday or today
+    longest: int = 0
+
+class WeightProgressOut(BaseModel):
+    first_kg: Optional[float] = None
+    latest_kg: Optional[float] = None
+    latest_date: Optional[str] = None
+    change_kg: Optional[float] = None
+    # Least-squares slope over the weigh-ins of the last 28 / 90 days, and of all of them
+    trend_kg_per_week_28d: Optional[float] = None
+    trend_kg_per_week_90d: Optional[float] = None
+    trend_kg_per_week_all: Optional[float] = None
+
+class DailyProgressOut(BaseModel):
+    """One entry per calendar day, oldest first; null where nothing was logged."""
+    date: List[str] = Field(default_factory=list)
+    logged: List[bool] = Field(default_factory=list)
+    workout_done: List[bool] = Field(default_factory=list)
+    steps: List[Optional[int]] = Field(default_factory=list)
+    steps_avg_7d: List[Optional[float]] = Field(default_factory=list)
+    steps_avg_28d: List[Optional[float]] = Field(default_factory=list)
+    weight_kg: List[Optional[float]] = Field(default_factory=list)
+    weight_avg_7d: List[Optional[float]] = Field(default_factory=list)
+
+class WeeklyProgressOut(BaseModel):
+    """One entry per ISO week of the whole history, oldest first."""
+    week: List[str] = Field(default_factory=list)
+    logged_days: List[int] = Field(default_factory=list)
+    workouts: List[int] = Field(default_factory=list)
+    adherence: List[Optional[float]] = Field(default_factory=list)
+    avg_steps: List[Optional[float]] = Field(default_factory=list)
+    weight_kg: List[Optional[float]] = Field(default_factory=list)
+
+class ProgressOut(BaseModel):
+    profile_name: str
+    first_date: Optional[str] = None
+    last_date: Optional[str] = None
+    logged_days: int = 0
+    workouts: int = 0
+    adherence: Optional[float] = None
+    workout_streak: StreakOut = Field(default_factory=StreakOut)
+    logging_streak: StreakOut = Field(default_factory=StreakOut)
+    weight: WeightProgressOut = Field(default_factory=WeightProgressOut)
+    daily: DailyProgressOut = Field(default_factory=DailyProgressOut)
+    weekly: WeeklyProgressOut = Field(default_factory=WeeklyProgressOut)
@@ -0,0 +1,43 @@
+from typing import Any, Union
+import orjson
+from fastapi.responses import ORJSONResponse
+from pydantic import BaseModel
+
+JSONBytes = Union[bytes, bytearray, memoryview]
+# A JSON-compatible object, or the bytes dumps() already produced for it
+JSONValue = Any
+
+# Pre-encoded JSON spliced verbatim into a larger document by dumps()
+Fragment = orjson.Fragment
+
+
+def _default(obj: Any) -> Any:
+    if isinstance(obj, BaseModel):
+        return obj.model_dump(mode="json")
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+
+def dumps(obj: Any, sort_keys: bool = False) -> bytes:
+    """Compact UTF-8 JSON. Pydantic models and Fragments may appear anywhere in `obj`."""
+    option = orjson.OPT_NON_STR_KEYS | (orjson.OPT_SORT_KEYS if sort_keys else 0)
+    return orjson.dumps(obj, default=_default, option=option)
+
+
+def loads(data: Union[str, JSONBytes]) -> Any:
+    return orjson.loads(data)
+
+
+def encoded(obj: Any) -> bytes:
+    """`obj` as JSON bytes, passing already-encoded bytes through untouched."""
+    if isinstance(obj, (bytes, bytearray, memoryview)):
+        return bytes(obj)
+    return dumps(obj)
+
+
+class JSONBytesResponse(ORJSONResponse):
+    """ORJSONResponse that also accepts a body that is already encoded."""
+
+    def render(self, content: Any) -> bytes:
+        if isinstance(content, (bytes, bytearray, memoryview)):
+            return bytes(content)
+        return dumps(content)
@@ -0,0 +1,122 @@
+import asyncio
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Hashable, List, Optional
+
+
+class _Call:
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task: "asyncio.Task[Any]"):
+        self.task = task
+        self.waiters = 0
+
+
+class AsyncSingleFlight:
+    """Coalesces concurrent calls with the same key into one execution.
+
+    The first caller starts `fn` as a task; every caller, the first included,
+    awaits that task's result (or exception). A caller being cancelled (e.g. a
+    client disconnecting) leaves the call running for the others; it is only
+    cancelled once nobody is waiting. Nothing is kept once the call finishes.
+    """
+
+    def __init__(self):
+        self._calls: Dict[Hashable, _Call] = {}
+        self.coalesced = 0
+
+    def in_flight(self) -> int:
+        return len(self._calls)
+
+    def _finished(self, key: Hashable, call: _Call) -> None:
+        if self._calls.get(key) is call:
+            del self._calls[key]
+        # Retrieve the exception even when nobody waited on it
+        call.task.cancelled() or call.task.exception()
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        call = self._calls.get(key)
+        if call is None:
+            call = self._calls[key] = _Call(asyncio.ensure_future(fn()))
+            call.task.add_done_callback(lambda _, key=key, call=call: self._finished(key, call))
+        else:
+            self.coalesced += 1
+        call.waiters += 1
+        try:
+            # shield: one waiter being cancelled must not cancel the shared call
+            return await asyncio.shield(call.task)
+        finally:
+            call.waiters -= 1
+            if not call.waiters and not call.task.done():
+                # Nobody left to answer; a later caller starts afresh
+                if self._calls.get(key) is call:
+                    del self._calls[key]
+                call.task.cancel()
+
+
+class _Broadcast:
+    def __init__(self):
+        self.items: List[Any] = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.changed = asyncio.Condition()
+        self.waiters = 0
+        self.task: Optional["asyncio.Task[None]"] = None
+
+
+class AsyncSharedStream:
+    """Coalesces concurrent identical streams (e.g. SSE responses).
+
+    The first caller's iterator is drained once by a background task; every
+    caller replays the items produced so far and then follows along live. As
+    with AsyncSingleFlight the producer is cancelled once every consumer has
+    gone, and nothing is kept after it finishes.
+    """
+
+    def __init__(self):
+        self._streams: Dict[Hashable, _Broadcast] = {}
+        self.coalesced = 0
+
+    def in_flight(self) -> int:
+        return len(self._streams)
+
+    async def _produce(self, key: Hashable, b: _Broadcast, source: AsyncIterator[Any]) -> None:
+        try:
+            async for item in source:
+                async with b.changed:
+                    b.items.append(item)
+                    b.changed.notify_all()
+        except BaseException as e:
+            b.error = e
+        finally:
+            if self._streams.get(key) is b:
+                del self._streams[key]
+            async with b.changed:
+                b.done = True
+                b.changed.notify_all()
+
+    async def stream(self, key: Hashable, make: Callable[[], AsyncIterator[Any]]) -> AsyncIterator[Any]:
+        b = self._streams.get(key)
+        if b is None:
+            b = self._streams[key] = _Broadcast()
+            b.task = asyncio.ensure_future(self._produce(key, b, make()))
+        else:
+            self.coalesced += 1
+        b.waiters += 1
+        sent = 0
+        try:
+            while True:
+                async with b.changed:
+                    await b.changed.wait_for(lambda: len(b.items) > sent or b.done)
+                    items, done = b.items[sent:], b.done
+                for item in items:
+                    yield item
+                sent += len(items)
+                if done and sent == len(b.items):
+                    if b.error is not None and not isinstance(b.error, asyncio.CancelledError):
+                        raise b.error
+                    return
+        finally:
+            b.waiters -= 1
+            if not b.waiters and not b.done:
+                if self._streams.get(key) is b:
+                    del self._streams[key]
+                b.task.cancel()
@@ -1,86 +1,846 @@
-﻿from typing import Optional, List, Dict, Any
-from sqlmodel import SQLModel, Field, create_engine, Session, select
-import json
+﻿from typing import Optional, List, Dict, Any, Tuple, Callable, AsyncIterator
+from sqlmodel import SQLModel, Field, Session, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlalchemy import Index, bindparam, case, func, or_, type_coerce, update
+from datetime import date as _date, datetime, timedelta, timezone
+import os
+from .backends import JSONText, StorageBackend, backend_from_env
+from .serialization import JSONValue, encoded, loads
+from .cache import PlanCache, ProgressCache
+from .telemetry import traced
 
-DB_URL = "sqlite:///./fitness_agent.db"
-engine = create_engine(DB_URL, echo=False)
+# DB_URL picks the backend (SQLite by default, or postgresql://...);
+# DB_READ_URL optionally routes log reads to a replica.
+db: StorageBackend = backend_from_env()
+
+def configure_backend(backend: StorageBackend) -> None:
+    global db
+    db = backend
+    plan_cache.clear()
+    progress_cache.clear()
+
+# Decoded plans for the GET /plans endpoints; writers below invalidate per profile.
+# Per process only: run a single worker, or set PLAN_CACHE_MAX_PROFILES=0.
+plan_cache = PlanCache(max_profiles=int(os.getenv("PLAN_CACHE_MAX_PROFILES", "1024")))
+# Log columns and computed progress for GET /progress; add_log appends, bulk upserts invalidate.
+# Per process only, like plan_cache (PROGRESS_CACHE_MAX_PROFILES=0 disables it).
+progress_cache = ProgressCache(max_profiles=int(os.getenv("PROGRESS_CACHE_MAX_PROFILES", "256")))
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat(timespec="microseconds")
 
 class Profile(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
-    name: str = Field(index=True)
-    data_json: str
+    name: str = Field(index=True, unique=True)
+    data_json: bytes = Field(sa_type=JSONText)
 
 class Plan(SQLModel, table=True):
+    # Hot path is "profile_id = ? ORDER BY created_at DESC"
+    __table_args__ = (Index("ix_plan_profile_created", "profile_id", "created_at"),)
     id: Optional[int] = Field(default=None, primary_key=True)
-    profile_id: int = Field(index=True)
-    created_at: str = Field(default="")
-    plan_json: str
-    warnings_json: str
+    profile_id: int
+    created_at: str = Field(default_factory=_now)  # ISO-8601 UTC; "" on rows older than v2
+    # Set for plans stored in PlanContent; plan_json/warnings_json then hold JSON null
+    content_key: Optional[str] = None
+    plan_json: bytes = Field(sa_type=JSONText)
+    warnings_json: bytes = Field(sa_type=JSONText)
+    # The profile as it was when the plan was made; NULL on rows older than v6
+    profile_json: Optional[bytes] = Field(default=None, sa_type=JSONText)
+
+class PlanContent(SQLModel, table=True):
+    """Plan output stored once per profile fingerprint (graph.profile_fingerprint)."""
+    fingerprint: str = Field(primary_key=True)
+    created_at: str = Field(default_factory=_now)
+    explained: bool = False
+    plan_json: bytes = Field(sa_type=JSONText)
+    warnings_json: bytes = Field(sa_type=JSONText)
+
+# Placeholder for Plan columns whose content lives in PlanContent
+NULL_JSON = b"null"
+# Stored content older than this is recomputed instead of reused
+PLAN_CONTENT_TTL_SECONDS = float(os.getenv("PLAN_CONTENT_TTL_SECONDS", str(7 * 86400)))
 
 class Log(SQLModel, table=True):
+    # Hot path is "profile_id = ? ORDER BY date"
+    __table_args__ = (Index("ix_log_profile_date", "profile_id", "date"),)
     id: Optional[int] = Field(default=None, primary_key=True)
-    profile_id: int = Field(index=True)
+    profile_id: int
     date: str = Field(index=True)
     workout_done: bool = False
     steps: Optional[int] = None
     weight_kg: Optional[float] = None
     notes: Optional[str] = ""
 
+class LogWeek(SQLModel, table=True):
+    """Per-profile, per-ISO-week log totals, maintained by add_log."""
+    profile_id: int = Field(primary_key=True)
+    week: str = Field(primary_key=True)  # e.g. "2026-W07"
+    done_count: int = 0
+    total_count: int = 0
+    steps_sum: int = 0
+    steps_count: int = 0
+    last_weight_kg: Optional[float] = None
+    last_weight_date: Optional[str] = None
+
+class IdempotentResponse(SQLModel, table=True):
+    """Response body stored per (route, Idempotency-Key) so client retries are replayed."""
+    route: str = Field(primary_key=True)
+    key: str = Field(primary_key=True)
+    request_hash: str
+    created_at: str = Field(default_factory=_now, index=True)
+    body_json: bytes = Field(sa_type=JSONText)
+
+IDEMPOTENCY_TTL_SECONDS = float(os.getenv("IDEMPOTENCY_TTL_SECONDS", "86400"))
+
+# How many of the most recent weekly buckets a review looks at (~60 daily logs)
+REVIEW_WINDOW_WEEKS = 8
+# How many recent logs the review LLM sees
+REVIEW_LOG_LIMIT = 14
+
+class Review(SQLModel, table=True):
+    """Latest weekly review per profile, precomputed by review_batch or saved by /review.
+
+    input_key is graph.review_key of the logs and stats it was generated from,
+    so a review is only served while those inputs are unchanged.
+    """
+    profile_id: int = Field(primary_key=True)
+    input_key: str
+    created_at: str = Field(default_factory=_now)
+    review_json: bytes = Field(sa_type=JSONText)
+
+@traced("storage")
 def init_db() -> None:
-    SQLModel.metadata.create_all(engine)
-
-def upsert_profile(name: str, data: Dict[str, Any]) -> int:
-    with Session(engine) as s:
-        existing = s.exec(select(Profile).where(Profile.name == name)).first()
-        if existing:
-            existing.data_json = json.dumps(data, ensure_ascii=False)
-            s.add(existing)
-            s.commit()
-            return existing.id
-
-        p = Profile(name=name, data_json=json.dumps(data, ensure_ascii=False))
-        s.add(p)
-        s.commit()
-        s.refresh(p)
-        return p.id
-
-def save_plan(profile_id: int, plan: Dict[str, Any], warnings: List[str]) -> int:
-    with Session(engine) as s:
-        rec = Plan(
-            profile_id=profile_id,
-            plan_json=json.dumps(plan, ensure_ascii=False),
-            warnings_json=json.dumps(warnings, ensure_ascii=False),
+    db.init_schema(SQLModel.metadata)
+    with Session(db.engine) as s:
+        needs_backfill = (
+            s.exec(select(LogWeek.profile_id).limit(1)).first() is None
+            and s.exec(select(Log.id).limit(1)).first() is not None
         )
+    if needs_backfill:
+        rebuild_log_weeks()
+
+async def aclose_db() -> None:
+    """Close every pooled connection, sync and async (app shutdown)."""
+    await db.adispose()
+
+def _iso_week(day: str) -> str:
+    try:
+        year, week, _ = _date.fromisoformat(day).isocalendar()
+    except (TypeError, ValueError):
+        return "0000-W00"
+    return f"{year:04d}-W{week:02d}"
+
+def _log_week_delta(profile_id: int, log: Dict[str, Any], sign: int = 1) -> Dict[str, Any]:
+    """LogWeek contribution of one log; sign=-1 removes a log's counts (not its weight)."""
+    steps = log.get("steps")
+    weight = log.get("weight_kg") if sign > 0 else None
+    day = log.get("date")
+    return {
+        "profile_id": profile_id,
+        "week": _iso_week(day),
+        "done_count": sign if log.get("workout_done") else 0,
+        "total_count": sign,
+        "steps_sum": sign * (steps or 0),
+        "steps_count": 0 if steps is None else sign,
+        "last_weight_kg": weight,
+        "last_weight_date": None if weight is None else day,
+    }
+
+def _merge_week_delta(acc: Dict[Tuple[int, str], Dict[str, Any]], delta: Dict[str, Any]) -> None:
+    key = (delta["profile_id"], delta["week"])
+    cur = acc.get(key)
+    if cur is None:
+        acc[key] = dict(delta)
+        return
+    for field in ("done_count", "total_count", "steps_sum", "steps_count"):
+        cur[field] += delta[field]
+    if delta["last_weight_date"] is not None and (
+        cur["last_weight_date"] is None or delta["last_weight_date"] >= cur["last_weight_date"]
+    ):
+        cur["last_weight_kg"], cur["last_weight_date"] = delta["last_weight_kg"], delta["last_weight_date"]
+
+def _log_week_upsert():
+    """Additive LogWeek upsert; execute with one or many _log_week_delta rows."""
+    stmt = db.insert(LogWeek)
+    ex = stmt.excluded
+    newer_weight = (ex.last_weight_kg.isnot(None)) & (
+        LogWeek.last_weight_date.is_(None) | (ex.last_weight_date >= LogWeek.last_weight_date)
+    )
+    return stmt.on_conflict_do_update(
+        index_elements=["profile_id", "week"],
+        set_={
+            "done_count": LogWeek.done_count + ex.done_count,
+            "total_count": LogWeek.total_count + ex.total_count,
+            "steps_sum": LogWeek.steps_sum + ex.steps_sum,
+            "steps_count": LogWeek.steps_count + ex.steps_count,
+            "last_weight_kg": case((newer_weight, ex.last_weight_kg), else_=LogWeek.last_weight_kg),
+            "last_weight_date": case((newer_weight, ex.last_weight_date), else_=LogWeek.last_weight_date),
+        },
+    )
+
+@traced("storage")
+def rebuild_log_weeks() -> None:
+    """Recompute LogWeek from the raw logs (one-off backfill for existing databases)."""
+    acc: Dict[Tuple[int, str], Dict[str, Any]] = {}
+    with Session(db.engine) as s:
+        last_id = 0
+        while True:
+            rows = s.exec(
+                select(Log.id, Log.profile_id, Log.date, Log.workout_done, Log.steps, Log.weight_kg)
+                .where(Log.id > last_id).order_by(Log.id).limit(5000)
+            ).all()
+            if not rows:
+                break
+            for r in rows:
+                _merge_week_delta(acc, _log_week_delta(r.profile_id, r._asdict()))
+            last_id = rows[-1].id
+
+        s.exec(LogWeek.__table__.delete())
+        if acc:
+            s.exec(LogWeek.__table__.insert(), params=list(acc.values()))
+        s.commit()
+
+def _log_stats(weeks: List[LogWeek]) -> Dict[str, Any]:
+    # weeks are newest first
+    last_weight = next((w.last_weight_kg for w in weeks if w.last_weight_kg is not None), None)
+    return {
+        "done": sum(w.done_count for w in weeks),
+        "total": sum(w.total_count for w in weeks),
+        "steps_sum": sum(w.steps_sum for w in weeks),
+        "steps_days": sum(w.steps_count for w in weeks),
+        "last_weight_kg": last_weight,
+        "weeks": len(weeks),
+    }
+
+def _log_weeks_query(profile_id: int, weeks: int):
+    return (
+        select(LogWeek)
+        .where(LogWeek.profile_id == profile_id)
+        .order_by(LogWeek.week.desc())
+        .limit(weeks)
+    )
+
+def _recent_logs_query(profile_id: int, limit: int):
+    q = select(Log).where(Log.profile_id == profile_id).order_by(Log.date.desc(), Log.id.desc())
+    return q.limit(limit) if limit else q
+
+def _profile_upsert():
+    """Native INSERT ... ON CONFLICT(name) DO UPDATE; execute with name/data_json params."""
+    stmt = db.insert(Profile)
+    return stmt.on_conflict_do_update(
+        index_elements=["name"], set_={"data_json": stmt.excluded.data_json}
+    )
+
+@traced("storage")
+def upsert_profile(name: str, data: JSONValue) -> int:
+    with Session(db.engine) as s:
+        pid = s.exec(
+            _profile_upsert().returning(Profile.id),
+            params={"name": name, "data_json": encoded(data)},
+        ).scalar_one()
+        s.commit()
+    plan_cache.invalidate(pid)
+    return pid
+
+def _content_upsert():
+    """INSERT ... ON CONFLICT(fingerprint) DO UPDATE; execute with _content_params rows.
+
+    Explained content is never replaced by unexplained content (a template
+    fallback from an LLM outage): every plan sharing the row would show it.
+    """
+    stmt = db.insert(PlanContent)
+    ex = stmt.excluded
+    return stmt.on_conflict_do_update(
+        index_elements=["fingerprint"],
+        set_={
+            "created_at": ex.created_at,
+            "explained": ex.explained,
+            "plan_json": ex.plan_json,
+            "warnings_json": ex.warnings_json,
+        },
+        where=or_(~PlanContent.__table__.c.explained, ex.explained),
+    )
+
+def _explained(plan: Dict[str, Any]) -> bool:
+    # A template fallback (explanation plus explanation_error) still wants the real one
+    return "explanation" in plan and not plan.get("explanation_error")
+
+def _content_params(fingerprint: str, plan: JSONValue, warnings: JSONValue) -> Dict[str, Any]:
+    plan_json = encoded(plan)
+    return {
+        "fingerprint": fingerprint,
+        "created_at": _now(),
+        "explained": _explained(plan if isinstance(plan, dict) else loads(plan_json)),
+        "plan_json": plan_json,
+        "warnings_json": encoded(warnings),
+    }
+
+def _plan_row(
+    profile_id: int, plan: JSONValue, warnings: JSONValue, fingerprint: Optional[str], profile: JSONValue = None,
+) -> Plan:
+    snapshot = encoded(profile) if profile is not None else None
+    if fingerprint is None:
+        return Plan(profile_id=profile_id, plan_json=encoded(plan), warnings_json=encoded(warnings),
+                    profile_json=snapshot)
+    return Plan(profile_id=profile_id, content_key=fingerprint, plan_json=NULL_JSON, warnings_json=NULL_JSON,
+                profile_json=snapshot)
+
+@traced("storage")
+def save_plan(
+    profile_id: int, plan: JSONValue, warnings: JSONValue, fingerprint: Optional[str] = None,
+    profile: JSONValue = None,
+) -> int:
+    """Save a plan, with a snapshot of the `profile` it was made from.
+
+    With a fingerprint its content is (re)written to PlanContent and shared.
+    """
+    with Session(db.engine) as s:
+        if fingerprint is not None:
+            s.exec(_content_upsert(), params=_content_params(fingerprint, plan, warnings))
+        rec = _plan_row(profile_id, plan, warnings, fingerprint, profile)
         s.add(rec)
         s.commit()
         s.refresh(rec)
-        return rec.id
+    plan_cache.invalidate(profile_id)
+    if fingerprint is not None:
+        plan_cache.invalidate_content(fingerprint)
+    return rec.id
 
+@traced("storage")
 def add_log(profile_id: int, log: Dict[str, Any]) -> int:
-    with Session(engine) as s:
+    with Session(db.engine) as s:
         rec = Log(profile_id=profile_id, **log)
         s.add(rec)
+        s.exec(_log_week_upsert(), params=_log_week_delta(profile_id, log))
         s.commit()
         s.refresh(rec)
-        return rec.id
+    progress_cache.append(profile_id, _log_row(rec))
+    return rec.id
 
+@traced("storage")
 def get_logs(profile_id: int, limit: int = 60) -> List[Dict[str, Any]]:
-    with Session(engine) as s:
-        rows = list(
-            s.exec(
-                select(Log)
-                .where(Log.profile_id == profile_id)
-                .order_by(Log.date.asc())
+    with Session(db.read_engine) as s:
+        rows = list(s.exec(_recent_logs_query(profile_id, limit)))
+        return [_log_dict(r) for r in reversed(rows)]
+
+@traced("storage")
+def get_log_stats(profile_id: int, weeks: int = REVIEW_WINDOW_WEEKS) -> Dict[str, Any]:
+    with Session(db.read_engine) as s:
+        return _log_stats(list(s.exec(_log_weeks_query(profile_id, weeks))))
+
+def _log_rows_query(profile_id: int):
+    # Column order is progress.columns()'s row layout
+    return select(Log.id, Log.date, Log.workout_done, Log.steps, Log.weight_kg).where(Log.profile_id == profile_id)
+
+def _log_row(r: Log) -> Tuple[int, str, bool, Optional[int], Optional[float]]:
+    return r.id, r.date, r.workout_done, r.steps, r.weight_kg
+
+def _log_dict(r: Log) -> Dict[str, Any]:
+    return {
+        "date": r.date,
+        "workout_done": r.workout_done,
+        "steps": r.steps,
+        "weight_kg": r.weight_kg,
+        "notes": r.notes,
+    }
+
+# Async variants for the async request path
+
+@traced("storage")
+async def aupsert_profile(name: str, data: JSONValue) -> int:
+    async with AsyncSession(db.async_engine, expire_on_commit=False) as s:
+        pid = (await s.exec(
+            _profile_upsert().returning(Profile.id),
+            params={"name": name, "data_json": encoded(data)},
+        )).scalar_one()
+        await s.commit()
+    plan_cache.invalidate(pid)
+    return pid
+
+@traced("storage")
+async def asave_plan(
+    profile_id: int, plan: JSONValue, warnings: JSONValue, fingerprint: Optional[str] = None,
+    profile: JSONValue = None,
+) -> int:
+    async with AsyncSession(db.async_engine, expire_on_commit=False) as s:
+        if fingerprint is not None:
+            await s.exec(_content_upsert(), params=_content_params(fingerprint, plan, warnings))
+        rec = _plan_row(profile_id, plan, warnings, fingerprint, profile)
+        s.add(rec)
+        await s.commit()
+        await s.refresh(rec)
+    plan_cache.invalidate(profile_id)
+    if fingerprint is not None:
+        plan_cache.invalidate_content(fingerprint)
+    return rec.id
+
+@traced("storage")
+async def asave_plan_ref(profile_id: int, fingerprint: str, profile: JSONValue = None) -> int:
+    """Save a plan that reuses existing PlanContent."""
+    async with AsyncSession(db.async_engine, expire_on_commit=False) as s:
+        rec = _plan_row(profile_id, None, None, fingerprint, profile)
+        s.add(rec)
+        await s.commit()
+        await s.refresh(rec)
+    plan_cache.invalidate(profile_id)
+    return rec.id
+
+@traced("storage")
+async def aget_plan_content(fingerprint: str) -> Optional[Dict[str, Any]]:
+    """Stored content for a fingerprint, unless it is older than PLAN_CONTENT_TTL_SECONDS."""
+    cutoff = (datetime.now(timezone.utc) - timedelta(seconds=PLAN_CONTENT_TTL_SECONDS)).isoformat(
+        timespec="microseconds"
+    )
+    async with AsyncSession(db.async_engine, expire_on_commit=False) as s:
+        row = (await s.exec(
+            select(PlanContent.explained, PlanContent.plan_json, PlanContent.warnings_json)
+            .where(PlanContent.fingerprint == fingerprint, PlanContent.created_at >= cutoff)
+        )).first()
+    return row._asdict() if row is not None else None
+
+@traced("storage")
+async def aadd_log(profile_id: int, log: Dict[str, Any]) -> int:
+    async with AsyncSession(db.async_engine, expire_on_commit=False) as s:
+        rec = Log(profile_id=profile_id, **log)
+        s.add(rec)
+        await s.exec(_log_week_upsert(), params=_log_week_delta(profile_id, log))
+        await s.commit()
+        await s.refresh(rec)
+    progress_cache.append(profile_id, _log_row(rec))
+    return rec.id
+
+@traced("storage")
+async def aget_logs(profile_id: int, limit: int = 60) -> List[Dict[str, Any]]:
+    async with AsyncSession(db.async_read_engine, expire_on_commit=False) as s:
+        rows = list(await s.exec(_recent_logs_query(profile_id, limit)))
+        return [_log_dict(r) for r in reversed(rows)]
+
+@traced("storage")
+async def aget_log_rows(profile_id: int) -> List[Tuple[int, str, bool, Optional[int], Optional[float]]]:
+    """Every log of a profile as (id, date, workout_done, steps, weight_kg), in no particular order."""
+    # Primary, not the replica: the result is cached until the next write, which a lagging read would miss
+    async with AsyncSession(db.async_engine, expire_on_commit=False) as s:
+        return (await s.exec(_log_rows_query(profile_id))).all()
+
+@traced("storage")
+async def aget_profile_id(name: str) -> Optional[int]:
+    async with AsyncSession(db.async_read_engine, expire_on_commit=False) as s:
+        return (await s.exec(select(Profile.id).where(Profile.name == name))).first()
+
+@traced("storage")
+async def aget_log_stats(profile_id: int, weeks: int = REVIEW_WINDOW_WEEKS) -> Dict[str, Any]:
+    async with AsyncSession(db.async_read_engine, expire_on_commit=False) as s:
+        return _log_stats(list(await s.exec(_log_weeks_query(profile_id, weeks))))
+
+async def _aprofile_ids(s: AsyncSession, names: List[str]) -> Dict[str, int]:
+    ids: Dict[str, int] = {}
+    for i in range(0, len(names), 500):
+        found = await s.exec(select(Profile.id, Profile.name).where(Profile.name.in_(names[i:i + 500])))
+        ids.update({name: pid for pid, name in found.all()})
+    return ids
+
+@traced("storage")
+async def asave_plans_batch(
+    items: List[Tuple[str, JSONValue, JSONValue, JSONValue, str]],
+) -> List[Tuple[int, int]]:
+    """Upsert every (name, profile, plan, warnings, fingerprint) and save its plan in one transaction.
+
+    Plan content is written once per distinct fingerprint. Returns
+    (profile_id, plan_id) per item, in input order.
+    """
+    if not items:
+        return []
+    async with AsyncSession(db.async_engine, expire_on_commit=False) as s:
+        latest = {name: data for name, data, _, _, _ in items}
+        await s.exec(_profile_upsert(), params=[
+            {"name": name, "data_json": encoded(data)}
+            for name, data in latest.items()
+        ])
+        ids = await _aprofile_ids(s, list(latest))
+
+        contents = {fp: (plan, warnings) for _, _, plan, warnings, fp in items}
+        await s.exec(_content_upsert(), params=[
+            _content_params(fp, plan, warnings) for fp, (plan, warnings) in contents.items()
+        ])
+        plans = [_plan_row(ids[name], None, None, fp, data) for name, data, _, _, fp in items]
+        s.add_all(plans)
+        await s.flush()
+        await s.commit()
+    for pid in ids.values():
+        plan_cache.invalidate(pid)
+    for fp in contents:
+        plan_cache.invalidate_content(fp)
+    return [(rec.profile_id, rec.id) for rec in plans]
+
+def _plans_query():
+    return (
+        select(Plan, Profile.name, Profile.data_json, PlanContent.plan_json, PlanContent.warnings_json)
+        .join(Profile, Profile.id == Plan.profile_id)
+        .outerjoin(PlanContent, PlanContent.fingerprint == Plan.content_key)
+    )
+
+def _plan_record(row) -> Dict[str, Any]:
+    rec, name, profile_json, content_plan, content_warnings = row
+    shared = rec.content_key is not None and content_plan is not None
+    return {
+        "id": rec.id,
+        "profile_id": rec.profile_id,
+        "profile_name": name,
+        "created_at": rec.created_at,
+        "content_key": rec.content_key,
+        # Plans saved before snapshots existed fall back to the current profile
+        "profile": loads(rec.profile_json if rec.profile_json is not None else profile_json),
+        "plan": loads(content_plan if shared else rec.plan_json),
+        "warnings": loads(content_warnings if shared else rec.warnings_json),
+    }
+
+@traced("storage")
+async def aget_plan(plan_id: int) -> Optional[Dict[str, Any]]:
+    """Plan record by id (with its profile), read through plan_cache. Treat as read-only."""
+    cached = plan_cache.get(plan_id)
+    if cached is not None:
+        return cached
+    version = plan_cache.version()
+    async with AsyncSession(db.async_engine, expire_on_commit=False) as s:
+        row = (await s.exec(_plans_query().where(Plan.id == plan_id))).first()
+    if row is None:
+        return None
+    rec = _plan_record(row)
+    plan_cache.put(rec, version)
+    return rec
+
+@traced("storage")
+async def aget_latest_plan(profile_name: str) -> Optional[Dict[str, Any]]:
+    """Newest plan saved for a profile, read through plan_cache. Treat as read-only."""
+    cached = plan_cache.latest(profile_name)
+    if cached is not None:
+        return cached
+    version = plan_cache.version()
+    async with AsyncSession(db.async_engine, expire_on_commit=False) as s:
+        row = (await s.exec(
+            _plans_query()
+            .where(Profile.name == profile_name)
+            .order_by(Plan.created_at.desc(), Plan.id.desc())
+            .limit(1)
+        )).first()
+    if row is None:
+        return None
+    rec = _plan_record(row)
+    plan_cache.put(rec, version, latest=True)
+    return rec
+
+def _merge_fields(plan_json: bytes, fields: Dict[str, Any]) -> Dict[str, Any]:
+    plan = loads(plan_json)
+    for key, value in fields.items():
+        if value is None:
+            plan.pop(key, None)
+        else:
+            plan[key] = value
+    return plan
+
+@traced("storage")
+async def aupdate_plans(plan_ids: List[int], fields: Dict[str, Any]) -> None:
+    """Merge `fields` into the stored plan JSON of each plan id; a None value removes the key.
+
+    Plans backed by PlanContent update the shared content, once per fingerprint.
+    """
+    async with AsyncSession(db.async_engine, expire_on_commit=False) as s:
+        rows = (await s.exec(select(Plan).where(Plan.id.in_(plan_ids)))).all()
+        keys = {rec.content_key for rec in rows if rec.content_key is not None}
+        for rec in rows:
+            if rec.content_key is None:
+                rec.plan_json = encoded(_merge_fields(rec.plan_json, fields))
+                s.add(rec)
+        if keys:
+            for content in (await s.exec(select(PlanContent).where(PlanContent.fingerprint.in_(keys)))).all():
+                plan = _merge_fields(content.plan_json, fields)
+                if content.explained and not _explained(plan):
+                    continue  # e.g. a failed job for content another request has explained since
+                content.plan_json = encoded(plan)
+                content.explained = _explained(plan)
+                s.add(content)
+        await s.commit()
+    for pid in {rec.profile_id for rec in rows}:
+        plan_cache.invalidate(pid)
+    for key in keys:
+        plan_cache.invalidate_content(key)
+
+def _week_bounds(week: str) -> Tuple[str, str]:
+    year, num = week.split("-W")
+    start = _date.fromisocalendar(int(year), int(num), 1)
+    return start.isoformat(), (start + timedelta(days=6)).isoformat()
+
+async def _arefresh_week_weight(s: AsyncSession, profile_id: int, week: str) -> None:
+    lo, hi = _week_bounds(week)
+    newest = (await s.exec(
+        select(Log.date, Log.weight_kg)
+        .where(Log.profile_id == profile_id, Log.date >= lo, Log.date <= hi, Log.weight_kg.isnot(None))
+        .order_by(Log.date.desc(), Log.id.desc())
+        .limit(1)
+    )).first()
+    await s.exec(
+        update(LogWeek)
+        .where(LogWeek.profile_id == profile_id, LogWeek.week == week)
+        .values(
+            last_weight_kg=newest.weight_kg if newest else None,
+            last_weight_date=newest.date if newest else None,
+        )
+    )
+
+@traced("storage")
+async def abulk_upsert_logs(
+    rows: List[Tuple[str, Dict[str, Any]]],
+    default_profile: Callable[[str], Dict[str, Any]],
+) -> List[str]:
+    """Insert or replace logs keyed on (profile, date) in a single transaction.
+
+    Missing profiles are created from `default_profile(name)`; existing ones are
+    left untouched. Returns "inserted", "updated" or "superseded" (a later row
+    in the same batch had the same profile and date) per input row.
+    """
+    status = ["inserted"] * len(rows)
+    async with AsyncSession(db.async_engine, expire_on_commit=False) as s:
+        names = list({name for name, _ in rows})
+        # Create missing profiles from defaults without touching existing ones
+        await s.exec(
+            db.insert(Profile).on_conflict_do_nothing(index_elements=["name"]),
+            params=[{"name": n, "data_json": encoded(default_profile(n))} for n in names],
+        )
+        ids = await _aprofile_ids(s, names)
+
+        # Last row wins for duplicate (profile, date) pairs within the batch
+        latest: Dict[Tuple[int, str], int] = {}
+        for i, (name, log) in enumerate(rows):
+            key = (ids[name], log["date"])
+            if key in latest:
+                status[latest[key]] = "superseded"
+            latest[key] = i
+
+        by_profile: Dict[int, List[str]] = {}
+        for pid, day in latest:
+            by_profile.setdefault(pid, []).append(day)
+
+        existing: Dict[Tuple[int, str], Any] = {}
+        for pid, days in by_profile.items():
+            for i in range(0, len(days), 500):
+                found = await s.exec(
+                    select(Log.id, Log.date, Log.workout_done, Log.steps, Log.weight_kg)
+                    .where(Log.profile_id == pid, Log.date.in_(days[i:i + 500]))
+                    .order_by(Log.id)
+                )
+                for old in found.all():
+                    existing[(pid, old.date)] = old  # newest row for legacy duplicates
+
+        # LogWeek is patched with per-week deltas: + new rows, - the rows they replace
+        inserts, updates = [], []
+        deltas: Dict[Tuple[int, str], Dict[str, Any]] = {}
+        reweigh = set()
+        for key, i in latest.items():
+            log = rows[i][1]
+            values = {"profile_id": key[0], **log}
+            _merge_week_delta(deltas, _log_week_delta(key[0], log))
+            old = existing.get(key)
+            if old is not None:
+                updates.append({"log_id": old.id, **values})
+                status[i] = "updated"
+                _merge_week_delta(deltas, _log_week_delta(key[0], old._asdict(), sign=-1))
+                if old.weight_kg is not None and log.get("weight_kg") is None:
+                    reweigh.add((key[0], _iso_week(key[1])))
+            else:
+                inserts.append(values)
+
+        if inserts:
+            # Core insert: a plain executemany, no ORM bookkeeping per row
+            await s.exec(Log.__table__.insert(), params=inserts)
+        if updates:
+            t = Log.__table__
+            await s.exec(
+                t.update().where(t.c.id == bindparam("log_id")).values(
+                    {c: bindparam(c) for c in ("profile_id", "date", "workout_done", "steps", "weight_kg", "notes")}
+                ),
+                params=updates,
             )
+
+        if deltas:
+            await s.exec(_log_week_upsert(), params=list(deltas.values()))
+        # A cleared weight may have been the week's latest one
+        for pid, week in reweigh:
+            await _arefresh_week_weight(s, pid, week)
+
+        await s.commit()
+    for pid in by_profile:
+        progress_cache.invalidate(pid)
+    return status
+
+# Precomputed weekly reviews
+
+def _review_upsert():
+    stmt = db.insert(Review)
+    ex = stmt.excluded
+    return stmt.on_conflict_do_update(
+        index_elements=["profile_id"],
+        set_={"input_key": ex.input_key, "created_at": ex.created_at, "review_json": ex.review_json},
+    )
+
+@traced("storage")
+async def aget_review(profile_id: int, input_key: str) -> Optional[Dict[str, Any]]:
+    """The stored review for these inputs, or None if there is none or the logs changed since."""
+    async with AsyncSession(db.async_engine, expire_on_commit=False) as s:
+        row = (await s.exec(
+            select(Review.review_json).where(Review.profile_id == profile_id, Review.input_key == input_key)
+        )).first()
+    return loads(row) if row is not None else None
+
+@traced("storage")
+async def asave_reviews(reviews: List[Tuple[int, str, Dict[str, Any]]]) -> None:
+    """Upsert (profile_id, input_key, review) rows in one transaction."""
+    if not reviews:
+        return
+    async with AsyncSession(db.async_engine, expire_on_commit=False) as s:
+        await s.exec(_review_upsert(), params=[
+            {"profile_id": pid, "input_key": key, "created_at": _now(), "review_json": encoded(review)}
+            for pid, key, review in reviews
+        ])
+        await s.commit()
+
+@traced("storage")
+async def aactive_profile_ids(since: str, after_id: int = 0, limit: int = 500) -> List[int]:
+    """Profiles with a log dated on or after `since`, in id order (keyset-paged by after_id)."""
+    async with AsyncSession(db.async_read_engine, expire_on_commit=False) as s:
+        rows = await s.exec(
+            select(Log.profile_id)
+            .where(Log.date >= since, Log.profile_id > after_id)
+            .distinct()
+            .order_by(Log.profile_id)
+            .limit(limit)
+        )
+        return list(rows.all())
+
+@traced("storage")
+async def aget_review_inputs(
+    profile_ids: List[int], log_limit: int = REVIEW_LOG_LIMIT, weeks: int = REVIEW_WINDOW_WEEKS,
+) -> Dict[int, Tuple[List[Dict[str, Any]], Dict[str, Any], Optional[str]]]:
+    """(logs, stats, stored input_key) per profile, as /review reads them, in three queries."""
+    if not profile_ids:
+        return {}
+    async with AsyncSession(db.async_read_engine, expire_on_commit=False) as s:
+        rank = func.row_number().over(
+            partition_by=Log.profile_id, order_by=(Log.date.desc(), Log.id.desc())
+        ).label("rank")
+        recent = select(Log, rank).where(Log.profile_id.in_(profile_ids)).subquery()
+        c = recent.c
+        logs: Dict[int, List[Dict[str, Any]]] = {pid: [] for pid in profile_ids}
+        for r in (await s.exec(
+            select(c.profile_id, c.date, c.workout_done, c.steps, c.weight_kg, c.notes)
+            .where(c.rank <= log_limit)
+            .order_by(c.profile_id, c.date, c.id)
+        )).all():
+            logs[r.profile_id].append(_log_dict(r))
+
+        buckets: Dict[int, List[LogWeek]] = {pid: [] for pid in profile_ids}
+        for w in (await s.exec(
+            select(LogWeek).where(LogWeek.profile_id.in_(profile_ids))
+            .order_by(LogWeek.profile_id, LogWeek.week.desc())
+        )).all():
+            if len(buckets[w.profile_id]) < weeks:
+                buckets[w.profile_id].append(w)
+
+    async with AsyncSession(db.async_engine, expire_on_commit=False) as s:
+        stored = dict((await s.exec(
+            select(Review.profile_id, Review.input_key).where(Review.profile_id.in_(profile_ids))
+        )).all())
+    return {pid: (logs[pid], _log_stats(buckets[pid]), stored.get(pid)) for pid in profile_ids}
+
+# Idempotency-Key responses
+
+def _idempotency_cutoff() -> str:
+    return (datetime.now(timezone.utc) - timedelta(seconds=IDEMPOTENCY_TTL_SECONDS)).isoformat(
+        timespec="microseconds"
+    )
+
+@traced("storage")
+async def aget_idempotent(route: str, key: str) -> Optional[Tuple[str, bytes]]:
+    """(request_hash, body) stored for this key, unless older than IDEMPOTENCY_TTL_SECONDS."""
+    async with AsyncSession(db.async_engine, expire_on_commit=False) as s:
+        row = (await s.exec(
+            select(IdempotentResponse.request_hash, IdempotentResponse.body_json).where(
+                IdempotentResponse.route == route,
+                IdempotentResponse.key == key,
+                IdempotentResponse.created_at >= _idempotency_cutoff(),
+            )
+        )).first()
+    return (row.request_hash, row.body_json) if row is not None else None
+
+@traced("storage")
+async def asave_idempotent(route: str, key: str, request_hash: str, body: bytes) -> None:
+    stmt = db.insert(IdempotentResponse)
+    ex = stmt.excluded
+    async with AsyncSession(db.async_engine, expire_on_commit=False) as s:
+        # An expired row for the same key is replaced
+        await s.exec(
+            stmt.on_conflict_do_update(
+                index_elements=["route", "key"],
+                set_={"request_hash": ex.request_hash, "created_at": ex.created_at, "body_json": ex.body_json},
+            ),
+            params={"route": route, "key": key, "request_hash": request_hash,
+                    "created_at": _now(), "body_json": body},
         )
-        rows = rows[-limit:] if limit else rows
-        return [
-            {
-                "date": r.date,
-                "workout_done": r.workout_done,
-                "steps": r.steps,
-                "weight_kg": r.weight_kg,
-                "notes": r.notes,
-            }
-            for r in rows
-        ]
+        await s.commit()
+
+@traced("storage")
+def purge_idempotent() -> int:
+    """Delete expired Idempotency-Key responses (run at startup)."""
+    with Session(db.engine) as s:
+        t = IdempotentResponse.__table__
+        n = s.exec(t.delete().where(t.c.created_at < _idempotency_cutoff())).rowcount
+        s.commit()
+    return n
+
+# Bulk export (export.py)
+
+# Rows read per cursor before it and its read transaction are reopened
+EXPORT_WINDOW_ROWS = int(os.getenv("EXPORT_WINDOW_ROWS", "50000"))
+
+def _export_query(table: str, since: Optional[str]):
+    """(query, id column) for an export table; `since` is a YYYY-MM-DD lower bound."""
+    if table == "logs":
+        q = select(Log.id, Log.profile_id, Log.date, Log.workout_done, Log.steps, Log.weight_kg, Log.notes)
+        return (q.where(Log.date >= since) if since else q), Log.id
+    if table == "plans":
+        # Same precedence as _plan_record: stored content when the plan refers to it
+        shared = Plan.content_key.isnot(None) & PlanContent.plan_json.isnot(None)
+        q = select(
+            Plan.id, Plan.profile_id, Plan.created_at, Plan.content_key,
+            type_coerce(case((shared, PlanContent.plan_json), else_=Plan.plan_json), JSONText).label("plan"),
+            type_coerce(case((shared, PlanContent.warnings_json), else_=Plan.warnings_json), JSONText).label("warnings"),
+        ).outerjoin(PlanContent, PlanContent.fingerprint == Plan.content_key)
+        return (q.where(Plan.created_at >= since) if since else q), Plan.id
+    if table == "profiles":
+        return select(Profile.id, Profile.name, Profile.data_json), Profile.id
+    raise ValueError(f"unknown export table {table!r}")
+
+@traced("storage")
+async def aexport_rows(
+    table: str, after_id: int = 0, since: Optional[str] = None, chunk: int = 1000,
+) -> AsyncIterator[List[Any]]:
+    """Rows of `table` with id > after_id in id order, `chunk` rows at a time.
+
+    Rows come through a server-side cursor, so only one chunk is in memory.
+    Every EXPORT_WINDOW_ROWS rows the cursor is closed and reopened after the
+    last id, so a long or slowly consumed export never pins one snapshot (on
+    SQLite an open reader keeps WAL checkpoints from completing). Reads go to
+    DB_READ_URL when set.
+    """
+    q, key = _export_query(table, since)
+    while True:
+        seen = 0
+        async with db.async_read_engine.connect() as conn:
+            result = await conn.stream(
+                q.where(key > after_id).order_by(key).limit(EXPORT_WINDOW_ROWS).execution_options(yield_per=chunk)
+            )
+            async for rows in result.partitions():
+                seen += len(rows)
+                after_id = rows[-1][0]
+                yield rows
+        if seen < EXPORT_WINDOW_ROWS:
+            return
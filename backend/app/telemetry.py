@@ -0,0 +1,331 @@
+import atexit
+import contextvars
+import functools
+import inspect
+import os
+import random
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+from .serialization import dumps
+
+# Seconds; spans the ~10 us rule nodes up to multi-second LLM calls
+DEFAULT_BUCKETS = (
+    0.00001, 0.00005, 0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0,
+)
+
+
+def _label_str(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    parts = [f'{n}="{str(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labelnames: Tuple[str, ...] = ()):
+        self.name, self.help, self.labelnames = name, help, labelnames
+        self._lock = threading.Lock()
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, labels: Tuple[str, ...] = (), amount: float = 1.0) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def render(self, out: List[str]) -> None:
+        out.append(f"# HELP {self.name} {self.help}")
+        out.append(f"# TYPE {self.name} counter")
+        with self._lock:
+            for labels, value in sorted(self._values.items()):
+                out.append(f"{self.name}{_label_str(self.labelnames, labels)} {value:g}")
+
+
+class Histogram:
+    def __init__(
+        self, name: str, help: str, labelnames: Tuple[str, ...] = (), buckets: Tuple[float, ...] = DEFAULT_BUCKETS,
+    ):
+        self.name, self.help, self.labelnames, self.buckets = name, help, labelnames, buckets
+        self._lock = threading.Lock()
+        # labels -> [per-bucket counts (+Inf last), sum]
+        self._series: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, labels: Tuple[str, ...], value: float) -> None:
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][i] += 1
+            series[1] += value
+
+    def render(self, out: List[str]) -> None:
+        out.append(f"# HELP {self.name} {self.help}")
+        out.append(f"# TYPE {self.name} histogram")
+        with self._lock:
+            snapshot = [(labels, list(counts), total) for labels, (counts, total) in sorted(self._series.items())]
+        for labels, counts, total in snapshot:
+            running = 0
+            for le, n in zip(self.buckets + (float("inf"),), counts):
+                running += n
+                bound = 'le="+Inf"' if le == float("inf") else f'le="{le:g}"'
+                out.append(f"{self.name}_bucket{_label_str(self.labelnames, labels, bound)} {running}")
+            out.append(f"{self.name}_sum{_label_str(self.labelnames, labels)} {total:.9g}")
+            out.append(f"{self.name}_count{_label_str(self.labelnames, labels)} {running}")
+
+
+OPERATION_SECONDS = Histogram(
+    "fitness_operation_seconds", "Wall time of graph nodes, storage helpers and LLM calls.", ("component", "name"),
+)
+OPERATION_ERRORS = Counter(
+    "fitness_operation_errors_total", "Graph nodes, storage helpers and LLM calls that raised.", ("component", "name"),
+)
+LLM_TOKENS = Counter("fitness_llm_tokens_total", "Tokens reported by the LLM provider.", ("kind",))
+LLM_RESILIENCE = Counter(
+    "fitness_llm_resilience_total", "LLM retries, hedges, deadlines, breaker trips and template fallbacks.", ("event",),
+)
+HTTP_SECONDS = Histogram("fitness_http_request_seconds", "HTTP request wall time by route.", ("method", "route", "status"))
+
+REGISTRY = [OPERATION_SECONDS, OPERATION_ERRORS, LLM_TOKENS, LLM_RESILIENCE, HTTP_SECONDS]
+
+
+def render_prometheus() -> str:
+    out: List[str] = []
+    for metric in REGISTRY:
+        metric.render(out)
+    return "\n".join(out) + "\n"
+
+
+# ---- spans (OpenTelemetry JSON shape, one per line) ----
+
+class SpanFileExporter:
+    """Appends finished spans as JSON lines in the OTLP/JSON span layout."""
+
+    def __init__(self, path: str, flush_every: int = 64):
+        self.path = path
+        self.flush_every = flush_every
+        self._lock = threading.Lock()
+        self._file = open(path, "ab", buffering=1 << 16)
+        self._pending = 0
+
+    def export(self, span: Dict[str, Any]) -> None:
+        line = dumps(span) + b"\n"
+        with self._lock:
+            self._file.write(line)
+            self._pending += 1
+            if self._pending >= self.flush_every:
+                self._file.flush()
+                self._pending = 0
+
+    def flush(self) -> None:
+        with self._lock:
+            self._file.flush()
+            self._pending = 0
+
+
+class Span:
+    __slots__ = ("name", "trace_id", "span_id", "parent_id", "start_ns", "attributes")
+
+    def __init__(self, name: str, parent: Optional["Span"]):
+        self.name = name
+        # Ids only need to be unique, not unpredictable
+        self.trace_id = parent.trace_id if parent is not None else f"{random.getrandbits(128):032x}"
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent_id = parent.span_id if parent is not None else ""
+        self.start_ns = time.time_ns()
+        self.attributes: Dict[str, Any] = {}
+
+    def set(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def to_otlp(self, end_ns: int, error: Optional[BaseException]) -> Dict[str, Any]:
+        return {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "parentSpanId": self.parent_id,
+            "name": self.name,
+            "kind": "SPAN_KIND_INTERNAL",
+            "startTimeUnixNano": self.start_ns,
+            "endTimeUnixNano": end_ns,
+            "attributes": [{"key": k, "value": _otlp_value(v)} for k, v in self.attributes.items()],
+            "status": {"code": "STATUS_CODE_ERROR", "message": repr(error)} if error is not None
+            else {"code": "STATUS_CODE_OK"},
+        }
+
+
+def _otlp_value(v: Any) -> Dict[str, Any]:
+    if isinstance(v, bool):
+        return {"boolValue": v}
+    if isinstance(v, int):
+        return {"intValue": str(v)}
+    if isinstance(v, float):
+        return {"doubleValue": v}
+    return {"stringValue": str(v)}
+
+
+def _exporter_from_env() -> Optional[SpanFileExporter]:
+    path = os.getenv("TRACE_SPANS_PATH", "").strip()
+    if not path:
+        return None
+    exporter = SpanFileExporter(path)
+    atexit.register(exporter.flush)
+    return exporter
+
+
+_exporter: Optional[SpanFileExporter] = _exporter_from_env()
+_current: "contextvars.ContextVar[Optional[Span]]" = contextvars.ContextVar("fitness_span", default=None)
+
+
+def set_exporter(exporter: Optional[SpanFileExporter]) -> None:
+    """Swap the span exporter (None turns span export off; metrics stay on)."""
+    global _exporter
+    _exporter = exporter
+
+
+def current_span() -> Optional[Span]:
+    return _current.get()
+
+
+@contextmanager
+def _span(name: str, activate: bool = True) -> Iterator[Optional[Span]]:
+    """Export a span around the block when an exporter is set; a no-op otherwise.
+
+    With activate=False the span is not made current, which async generators
+    need: their body runs interleaved with the consumer's code.
+    """
+    exporter = _exporter
+    if exporter is None:
+        yield None
+        return
+    span = Span(name, _current.get())
+    token = _current.set(span) if activate else None
+    error: Optional[BaseException] = None
+    try:
+        yield span
+    except Exception as e:
+        error = e
+        raise
+    finally:
+        if token is not None:
+            _current.reset(token)
+        exporter.export(span.to_otlp(time.time_ns(), error))
+
+
+@contextmanager
+def operation(component: str, name: str, activate: bool = True) -> Iterator[Optional[Span]]:
+    """Time a block into fitness_operation_seconds (and a span when export is on)."""
+    start = time.perf_counter()
+    try:
+        with _span(f"{component}.{name}", activate) as span:
+            yield span
+    except Exception:
+        # Cancellation and generator close aren't failures of the operation
+        OPERATION_ERRORS.inc((component, name))
+        raise
+    finally:
+        OPERATION_SECONDS.observe((component, name), time.perf_counter() - start)
+
+
+def traced(component: str, name: Optional[str] = None) -> Callable[[Callable], Callable]:
+    """Decorator form of operation() for sync, async and async-generator functions.
+
+    Without a span exporter the wrappers skip the context managers entirely;
+    the cost is then two perf_counter() calls and one histogram update.
+    """
+
+    def wrap(fn: Callable) -> Callable:
+        op = name or fn.__name__
+        labels = (component, op)
+
+        if inspect.isasyncgenfunction(fn):
+            @functools.wraps(fn)
+            async def agen(*args, **kwargs):
+                with operation(component, op, activate=False):
+                    async for item in fn(*args, **kwargs):
+                        yield item
+            return agen
+
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def coro(*args, **kwargs):
+                if _exporter is not None:
+                    with operation(component, op):
+                        return await fn(*args, **kwargs)
+                start = time.perf_counter()
+                try:
+                    return await fn(*args, **kwargs)
+                except Exception:
+                    OPERATION_ERRORS.inc(labels)
+                    raise
+                finally:
+                    OPERATION_SECONDS.observe(labels, time.perf_counter() - start)
+            return coro
+
+        @functools.wraps(fn)
+        def sync(*args, **kwargs):
+            if _exporter is not None:
+                with operation(component, op):
+                    return fn(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            except Exception:
+                OPERATION_ERRORS.inc(labels)
+                raise
+            finally:
+                OPERATION_SECONDS.observe(labels, time.perf_counter() - start)
+        return sync
+
+    return wrap
+
+
+def annotate(key: str, value: Any) -> None:
+    """Set an attribute on the current span, if one is being recorded."""
+    span = _current.get()
+    if span is not None:
+        span.set(key, value)
+
+
+def record_llm_usage(usage: Any) -> None:
+    """Count provider-reported prompt/completion tokens and tag the current span."""
+    if usage is None:
+        return
+    span = _current.get()
+    for kind in ("prompt_tokens", "completion_tokens"):
+        n = getattr(usage, kind, None)
+        if n:
+            LLM_TOKENS.inc((kind.split("_")[0],), n)
+            if span is not None:
+                span.set(f"llm.{kind}", n)
+
+
+class MetricsMiddleware:
+    """ASGI middleware: per-route request histogram and the root span of each request."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        with _span(f"{scope['method']} {scope['path']}") as span:
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                route = getattr(scope.get("route"), "path", "unmatched")
+                HTTP_SECONDS.observe((scope["method"], route, str(status["code"])), time.perf_counter() - start)
+                if span is not None:
+                    span.name = f"{scope['method']} {route}"
+                    span.set("http.route", route)
+                    span.set("http.status_code", status["code"])
@@ -0,0 +1,211 @@
+"""Bulk export: throughput, memory versus table size, and /log writers during an export.
+
+Seeds logs on a fresh SQLite database, then for each format (NDJSON, CSV,
+and Parquet when pyarrow is installed):
+
+  throughput  GET /export/logs through the app, rows/s and MB/s
+  memory      peak Python (tracemalloc) + Arrow allocations while exporting
+              a quarter of the table and then all of it; must stay flat
+
+While a deliberately slow client drains a full export, concurrent POST /log
+writers are timed against the same writers with no export running; none may
+fail. Row counts, id order, the `since` filter and an `after_id` increment
+that picks up exactly the rows written during the export are checked too.
+Any failure exits non-zero.
+
+    python -m benchmarks.bench_export [--rows 400000] [--writers 4]
+"""
+import argparse
+import asyncio
+import csv
+import io
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date, timedelta
+from typing import Dict, List, Tuple
+
+_TMP = tempfile.mkdtemp(prefix="bench_export_")
+os.environ["DB_URL"] = f"sqlite:///{_TMP}/export.db"
+os.environ.setdefault("TRACE_SPANS_PATH", "")
+
+import httpx
+import orjson
+from sqlmodel import Session
+from sqlalchemy import func, select
+
+from backend.app import storage
+from backend.app.export import aexport, parquet_available
+from backend.app.main import _default_profile, app
+
+PROFILES = 1000
+# Peak memory for the whole table may exceed the quarter-table peak by this much
+MEMORY_SLACK = 1.25
+MEMORY_SLACK_BYTES = 2 * 1024 * 1024
+
+
+def _seed(first: int, n: int, rnd: random.Random) -> None:
+    start = date(2016, 1, 1)
+    with Session(storage.db.engine) as s:
+        for lo in range(first, first + n, 20000):
+            s.exec(storage.Log.__table__.insert(), params=[{
+                "profile_id": 1 + i % PROFILES,
+                "date": (start + timedelta(days=i // PROFILES)).isoformat(),
+                "workout_done": rnd.random() < 0.6,
+                "steps": None if rnd.random() < 0.2 else rnd.randrange(1000, 16000),
+                "weight_kg": None if rnd.random() < 0.7 else round(rnd.uniform(60, 95), 1),
+                "notes": rnd.choice(("", "", "", "felt strong", 'knees, "a bit" sore')),
+            } for i in range(lo, min(first + n, lo + 20000))])
+        s.commit()
+
+
+def _count(since: str = "") -> int:
+    with Session(storage.db.engine) as s:
+        q = select(func.count()).select_from(storage.Log)
+        return s.exec(q.where(storage.Log.date >= since) if since else q).one()[0]
+
+
+def _rows_in(fmt: str, body: bytes) -> List[int]:
+    """Ids in an exported body."""
+    if fmt == "ndjson":
+        return [orjson.loads(line)["id"] for line in body.splitlines()]
+    if fmt == "csv":
+        return [int(r["id"]) for r in csv.DictReader(io.StringIO(body.decode()))]
+    import pyarrow.parquet as pq
+    return pq.read_table(io.BytesIO(body), columns=["id"]).column("id").to_pylist()
+
+
+async def _peak_memory(fmt: str, after_id: int) -> Tuple[int, int]:
+    """(rows, peak bytes) for exporting every log with id > after_id."""
+    pool = None
+    if fmt == "parquet":
+        import pyarrow as pa
+        pool = pa.default_memory_pool()
+    counts: Dict[str, int] = {}
+    tracemalloc.start()
+    base, peak = tracemalloc.get_traced_memory()[0], 0
+    tracemalloc.reset_peak()
+    async for _ in aexport("logs", fmt, after_id, counts=counts):
+        arrow = pool.bytes_allocated() if pool else 0
+        peak = max(peak, tracemalloc.get_traced_memory()[1] - base + arrow)
+        tracemalloc.reset_peak()
+    tracemalloc.stop()
+    return counts["rows"], peak
+
+
+async def _writers(c: httpx.AsyncClient, n: int, until: asyncio.Event, day: str) -> Tuple[List[float], int]:
+    latencies: List[float] = []
+    errors = 0
+
+    async def writer(k: int) -> None:
+        nonlocal errors
+        while not until.is_set():
+            t0 = time.perf_counter()
+            r = await c.post("/log", params={"profile_name": f"writer{k}"},
+                             json={"date": day, "workout_done": True, "steps": 1000})
+            latencies.append(time.perf_counter() - t0)
+            errors += r.status_code != 200
+
+    await asyncio.gather(*(writer(k) for k in range(n)))
+    return latencies, errors
+
+
+def _pct(samples: List[float], q: float) -> float:
+    return statistics.quantiles(samples, n=100)[q - 1] * 1e3 if len(samples) > 1 else 0.0
+
+
+async def run(total: int, writers: int, formats: List[str]) -> int:
+    rnd = random.Random(9)
+    failures: List[str] = []
+    async with app.router.lifespan_context(app):
+        with Session(storage.db.engine) as s:
+            s.exec(storage.Profile.__table__.insert(), params=[
+                {"name": f"p{i}", "data_json": orjson.dumps(_default_profile(f"p{i}"))} for i in range(PROFILES)
+            ])
+            s.commit()
+        quarter = total // 4
+        _seed(0, quarter, rnd)
+        small = {fmt: await _peak_memory(fmt, 0) for fmt in formats}
+        _seed(quarter, total - quarter, rnd)
+        large = {fmt: await _peak_memory(fmt, 0) for fmt in formats}
+        print(f"{total} logs, {PROFILES} profiles\n")
+
+        print(f"{'format':<9}{'rows/s':>10}{'MB/s':>8}{'MB':>8}  peak memory {quarter} rows -> {total} rows")
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as c:
+            for fmt in formats:
+                t0 = time.perf_counter()
+                r = await c.get("/export/logs", params={"format": fmt})
+                secs = time.perf_counter() - t0
+                ids = _rows_in(fmt, r.content)
+                if r.status_code != 200 or len(ids) != total or ids != sorted(set(ids)):
+                    failures.append(f"{fmt}: {r.status_code}, {len(ids)} rows of {total}, in id order: {ids == sorted(set(ids))}")
+                (n_small, m_small), (n_large, m_large) = small[fmt], large[fmt]
+                mb = len(r.content) / 1e6
+                print(f"{fmt:<9}{total / secs:>10.0f}{mb / secs:>8.1f}{mb:>8.1f}  "
+                      f"{m_small / 1e6:.1f} MB -> {m_large / 1e6:.1f} MB")
+                if n_large != total or m_large > m_small * MEMORY_SLACK + MEMORY_SLACK_BYTES:
+                    failures.append(f"{fmt}: memory grew with the table ({m_small} -> {m_large} bytes)")
+
+            since = "2016-06-01"
+            r = await c.get("/export/logs", params={"since": since})
+            if len(r.content.splitlines()) != _count(since):
+                failures.append(f"since={since}: {len(r.content.splitlines())} rows, expected {_count(since)}")
+
+            # Writers alone, then alongside a client that drains the export slowly
+            day = date.today().isoformat()
+            stop = asyncio.Event()
+            task = asyncio.create_task(_writers(c, writers, stop, day))
+            await asyncio.sleep(2)
+            stop.set()
+            alone, alone_errors = await task
+
+            stop = asyncio.Event()
+            task = asyncio.create_task(_writers(c, writers, stop, day))
+            counts: Dict[str, int] = {}
+            t0 = time.perf_counter()
+            async for _ in aexport("logs", "ndjson", counts=counts, chunk=500):
+                await asyncio.sleep(0.002)  # a slow consumer keeps each cursor open longer
+            slow_secs = time.perf_counter() - t0
+            stop.set()
+            during, during_errors = await task
+
+            # Everything written meanwhile (after the export's last id) and nothing else
+            written = total + len(alone) + len(during)
+            r = await c.get("/export/logs", params={"after_id": counts["last_id"]})
+            increment = _rows_in("ndjson", r.content)
+            if counts["last_id"] + len(increment) != written or _count() != written:
+                failures.append(f"after_id={counts['last_id']}: {len(increment)} rows, table has {_count()}")
+
+        print(f"\n/log with {writers} writers    p50 ms  p99 ms  writes  errors")
+        print(f"  no export             {_pct(alone, 50):>7.1f}{_pct(alone, 99):>8.1f}{len(alone):>8}{alone_errors:>8}")
+        print(f"  during export ({slow_secs:.0f}s) {_pct(during, 50):>7.1f}{_pct(during, 99):>8.1f}{len(during):>8}{during_errors:>8}")
+        if alone_errors or during_errors:
+            failures.append(f"/log failed {alone_errors + during_errors} times")
+        if not during:
+            failures.append("no /log completed during the export")
+
+    if failures:
+        print("\nFAILED:\n" + "\n".join(f"  {f}" for f in failures))
+        return 1
+    print("\nok: complete, ordered exports in flat memory; writers never failed")
+    return 0
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    ap.add_argument("--rows", type=int, default=400000)
+    ap.add_argument("--writers", type=int, default=4)
+    args = ap.parse_args()
+    formats = ["ndjson", "csv"] + (["parquet"] if parquet_available() else [])
+    if "parquet" not in formats:
+        print("pyarrow not installed: skipping Parquet")
+    return asyncio.run(run(args.rows, args.writers, formats))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,100 @@
+"""Microbenchmark for the deterministic plan nodes.
+
+Compares plan_workouts + plan_nutrition against the per-request builder they
+replaced, and checks both produce identical plans over the whole input space.
+
+    python -m benchmarks.bench_plan_rules
+"""
+import itertools
+import json
+import timeit
+from typing import Any, Dict
+
+from backend.app.graph import plan_nutrition, plan_workouts
+
+GOALS = ["lose_fat", "build_muscle", "improve_stamina"]
+EQUIPMENT = ["gym", "dumbbells", "bodyweight"]
+LEVELS = ["beginner", "intermediate"]
+
+
+# The original per-call implementation, kept here as the reference.
+def _legacy_title(goal: str, day: int) -> str:
+    if goal == "improve_stamina":
+        return "Cardio + mobility"
+    return "Full body strength" if day % 2 == 1 else "Strength + conditioning"
+
+
+def _legacy_session(goal: str, equipment: str, level: str) -> Dict[str, Any]:
+    if goal == "improve_stamina":
+        return {
+            "warmup": "5 min easy cardio",
+            "main": ["20–30 min steady cardio (zone 2)", "5–10 min mobility"],
+            "cooldown": "5 min walk + breathing"
+        }
+    if equipment == "bodyweight":
+        base = ["Squats", "Push-ups", "Glute bridge", "Plank"]
+    elif equipment == "dumbbells":
+        base = ["Goblet squat", "Dumbbell press", "One-arm row", "RDL", "Plank"]
+    else:
+        base = ["Leg press or squat", "Bench press", "Lat pulldown/row", "RDL", "Core"]
+    sets = "2–3 sets" if level == "beginner" else "3–4 sets"
+    return {
+        "warmup": "5–8 min mobility + light cardio",
+        "main": [f"{ex}: {sets} x 8–12 reps" for ex in base],
+        "cooldown": "5 min stretch"
+    }
+
+
+def legacy_plan(p: Dict[str, Any]) -> Dict[str, Any]:
+    workouts = []
+    for d in range(1, p["days_per_week"] + 1):
+        workouts.append({
+            "day": d,
+            "title": _legacy_title(p["goal"], d),
+            "duration_minutes": p["session_minutes"],
+            "session": _legacy_session(p["goal"], p["equipment"], p["level"]),
+        })
+    weight = p.get("weight_kg")
+    return {
+        "workouts": workouts,
+        "nutrition": {
+            "protein_g_per_day": int(round(1.6 * weight)) if weight else None,
+            "plate_method": [
+                "1/2 plate: vegetables/salad",
+                "1/4 plate: protein",
+                "1/4 plate: carbs",
+                "Add healthy fats in small amounts"
+            ],
+            "notes": "Not medical advice. Focus on consistency: protein + fiber + sleep + steps."
+        },
+    }
+
+
+def current_plan(p: Dict[str, Any]) -> Dict[str, Any]:
+    return plan_nutrition(plan_workouts({"profile": p}))["plan"]
+
+
+def profiles():
+    for goal, eq, lvl, days in itertools.product(GOALS, EQUIPMENT, LEVELS, range(1, 8)):
+        yield {
+            "goal": goal, "equipment": eq, "level": lvl, "days_per_week": days,
+            "session_minutes": 45, "weight_kg": 72.5,
+        }
+
+
+def main() -> None:
+    cases = list(profiles())
+    for p in cases:
+        assert json.dumps(current_plan(p)) == json.dumps(legacy_plan(p)), p
+
+    n = 200
+    legacy = min(timeit.repeat(lambda: [legacy_plan(p) for p in cases], number=n, repeat=5))
+    current = min(timeit.repeat(lambda: [current_plan(p) for p in cases], number=n, repeat=5))
+    calls = n * len(cases)
+    print(f"{len(cases)} profiles x {n} rounds, outputs identical")
+    print(f"legacy : {legacy / calls * 1e6:8.2f} us/plan")
+    print(f"current: {current / calls * 1e6:8.2f} us/plan  ({legacy / current:.1f}x faster)")
+
+
+if __name__ == "__main__":
+    main()
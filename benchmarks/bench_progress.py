@@ -0,0 +1,275 @@
+"""GET /progress on a long history: vectorized metrics vs. a per-row Python reference.
+
+Seeds one profile with --years of daily logs (skipped days, null steps and
+weights, same-day duplicates and a few unparseable dates) on a fresh SQLite
+database, then times:
+
+  reference   the same metrics computed row by row in plain Python
+  compute     the same rows -> columns -> every metric, vectorized
+  cold        read every log + compute (empty cache)
+  warm        cached result -> response JSON
+  add_log     POST /log, then the next /progress folding it in
+  http        GET /progress through the app, cached
+
+Every metric is checked against the reference, on the seeded history and again
+after a batch of add_log calls (back-filled days, same-day corrections) has
+been folded in incrementally. A mismatch, or a cold request slower than
+--budget-ms (PROGRESS_BUDGET_MS), exits non-zero.
+
+    python -m benchmarks.bench_progress [--years 12] [--runs 20]
+"""
+import argparse
+import asyncio
+import math
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+_TMP = tempfile.mkdtemp(prefix="bench_progress_")
+os.environ["DB_URL"] = f"sqlite:///{_TMP}/progress.db"
+os.environ.setdefault("TRACE_SPANS_PATH", "")
+
+import httpx
+import numpy as np
+from sqlmodel import Session
+
+from backend.app import storage
+from backend.app.main import _default_profile, app
+from backend.app.progress import ROLLING_WINDOWS, TREND_WINDOWS, aget_progress, columns, compute, progress_response
+from backend.app.serialization import dumps
+
+PROFILE = "bench"
+
+
+def _seed_rows(years: int, rnd: random.Random) -> List[Dict[str, Any]]:
+    start = date(2026, 1, 1) - timedelta(days=365 * years)
+    rows, weight = [], 92.0
+    for i in range(365 * years):
+        if rnd.random() < 0.08:
+            continue  # no log that day
+        weight += rnd.gauss(-0.002, 0.12)
+        for _ in range(2 if rnd.random() < 0.03 else 1):  # legacy same-day duplicates
+            rows.append({
+                "date": (start + timedelta(days=i)).isoformat(),
+                "workout_done": rnd.random() < 0.6,
+                "steps": None if rnd.random() < 0.15 else rnd.randrange(1500, 16000),
+                "weight_kg": None if rnd.random() < 0.75 else round(weight, 1),
+                "notes": "",
+            })
+    for bad in ("", "yesterday", "2026-13-40"):
+        rows.insert(rnd.randrange(len(rows)), {"date": bad, "workout_done": True, "steps": 1, "weight_kg": 70.0, "notes": ""})
+    return rows
+
+
+# Row-by-row reference, written for clarity rather than speed
+
+def _mean(xs: List[float]) -> Optional[float]:
+    return sum(xs) / len(xs) if xs else None
+
+
+def _slope(points: List[Tuple[int, float]]) -> Optional[float]:
+    if len(points) < 2:
+        return None
+    mx = sum(x for x, _ in points) / len(points)
+    my = sum(y for _, y in points) / len(points)
+    var = sum((x - mx) ** 2 for x, _ in points)
+    return sum((x - mx) * (y - my) for x, y in points) / var * 7 if var else None
+
+
+def _streaks(flags: List[bool]) -> Tuple[int, int]:
+    longest = run = 0
+    for f in flags:
+        run = run + 1 if f else 0
+        longest = max(longest, run)
+    return longest, run
+
+
+def reference(rows: List[Tuple[Any, ...]]) -> Dict[str, Any]:
+    by_day: Dict[date, Tuple[Any, ...]] = {}
+    for row in sorted(rows, key=lambda r: r[0]):
+        try:
+            by_day[date.fromisoformat(row[1])] = row  # newest id wins
+        except ValueError:
+            pass
+    first, last = min(by_day), max(by_day)
+    days = [first + timedelta(days=i) for i in range((last - first).days + 1)]
+    logs = [by_day.get(d) for d in days]
+    steps = [r[3] if r else None for r in logs]
+    weight = [r[4] if r else None for r in logs]
+    done = [bool(r and r[2]) for r in logs]
+
+    def rolling(xs: List[Optional[float]], w: int) -> List[Optional[float]]:
+        return [_mean([x for x in xs[max(0, i + 1 - w):i + 1] if x is not None]) for i in range(len(xs))]
+
+    weeks: Dict[str, Dict[str, Any]] = {}
+    for d, r, s, kg in zip(days, logs, steps, weight):
+        y, n, _ = d.isocalendar()
+        wk = weeks.setdefault(f"{y:04d}-W{n:02d}", {"logged": 0, "done": 0, "steps": [], "weight": None})
+        wk["logged"] += r is not None
+        wk["done"] += bool(r and r[2])
+        if s is not None:
+            wk["steps"].append(s)
+        if kg is not None:
+            wk["weight"] = kg
+
+    weighins = [(i, kg) for i, kg in enumerate(weight) if kg is not None]
+    trend = {}
+    for name, span in TREND_WINDOWS.items():
+        pts = [(x, y) for x, y in weighins if not span or x > weighins[-1][0] - span]
+        trend[name] = _slope(pts)
+    return {
+        "logged_days": len(by_day),
+        "workouts": sum(done),
+        "streaks": {"workout": _streaks(done), "logging": _streaks([r is not None for r in logs])},
+        "weight": {"first_kg": weighins[0][1], "latest_kg": weighins[-1][1], "trend": trend},
+        "daily": {
+            "date": days, "steps": steps, "weight_kg": weight, "workout_done": done,
+            **{f"steps_avg_{w}d": rolling(steps, w) for w in ROLLING_WINDOWS},
+            "weight_avg_7d": rolling(weight, 7),
+        },
+        "weekly": {
+            "week": list(weeks),
+            "logged_days": [w["logged"] for w in weeks.values()],
+            "workouts": [w["done"] for w in weeks.values()],
+            "adherence": [w["done"] / w["logged"] if w["logged"] else None for w in weeks.values()],
+            "avg_steps": [_mean(w["steps"]) for w in weeks.values()],
+            "weight_kg": [w["weight"] for w in weeks.values()],
+        },
+    }
+
+
+def _same(a: Any, b: Any) -> bool:
+    if a is None or b is None:
+        return a is None and b is None
+    if isinstance(a, float) or isinstance(b, float):
+        return math.isclose(a, b, rel_tol=1e-9, abs_tol=1e-9)
+    return a == b
+
+
+def check(result: Dict[str, Any], ref: Dict[str, Any]) -> List[str]:
+    misses = []
+
+    def cmp(where: str, got: List[Any], want: List[Any]) -> None:
+        if len(got) != len(want):
+            misses.append(f"{where}: {len(got)} values, expected {len(want)}")
+            return
+        bad = [i for i, (g, w) in enumerate(zip(got, want)) if not _same(g, w)]
+        if bad:
+            misses.append(f"{where}[{bad[0]}]: {got[bad[0]]!r} != {want[bad[0]]!r} ({len(bad)} differ)")
+
+    def values(a: np.ndarray) -> List[Any]:
+        return [None if isinstance(v, float) and v != v else v for v in a.tolist()]
+
+    for k in ("logged_days", "workouts", "streaks"):
+        cmp(k, [result[k]], [ref[k]])
+    w = result["weight"]
+    cmp("weight", [w["first_kg"], w["latest_kg"], *w["trend"].values()],
+        [ref["weight"]["first_kg"], ref["weight"]["latest_kg"], *ref["weight"]["trend"].values()])
+    for k, want in ref["daily"].items():
+        got = result["daily"][k]
+        cmp(f"daily.{k}", got.astype(object).tolist() if k == "date" else values(got), want)
+    for k, want in ref["weekly"].items():
+        got = result["weekly"][k]
+        cmp(f"weekly.{k}", got if k == "week" else values(got), want)
+    return misses
+
+
+def _median_ms(samples: List[float]) -> float:
+    return statistics.median(samples) * 1e3
+
+
+async def _timed(fn: Callable, runs: int) -> List[float]:
+    out = []
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        await fn()
+        out.append(time.perf_counter() - t0)
+    return out
+
+
+async def run(years: int, runs: int, budget_ms: float) -> int:
+    rnd = random.Random(11)
+    seed = _seed_rows(years, rnd)
+    async with app.router.lifespan_context(app):
+        pid = storage.upsert_profile(PROFILE, _default_profile(PROFILE))
+        with Session(storage.db.engine) as s:
+            s.exec(storage.Log.__table__.insert(), params=[{"profile_id": pid, **r} for r in seed])
+            s.commit()
+        rows = await storage.aget_log_rows(pid)
+        print(f"{len(rows)} logs over {years} years")
+
+        async def ref_run():
+            return reference(rows)
+
+        async def compute_run():
+            return compute(columns(rows))
+
+        ref_s = await _timed(ref_run, max(1, runs // 4))
+        ref = reference(rows)
+        compute_s = await _timed(compute_run, runs)
+
+        async def cold():
+            storage.progress_cache.clear()
+            return await aget_progress(pid)
+
+        cold_s = await _timed(cold, runs)
+        failures = check(await cold(), ref)
+
+        async def warm():
+            dumps(progress_response(PROFILE, await aget_progress(pid), 90))
+
+        warm_s = await _timed(warm, runs)
+
+        # Appended rows are folded into the cached columns, not re-read
+        last = max(ref["daily"]["date"])
+        add_s = []
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as c:
+            for i in range(runs):
+                day = last + timedelta(days=i + 1) if i % 4 else last - timedelta(days=rnd.randrange(3000))
+                log = {"date": day.isoformat(), "workout_done": rnd.random() < 0.5,
+                       "steps": rnd.choice((None, 9000)), "weight_kg": rnd.choice((None, 85.0))}
+                await c.post("/log", params={"profile_name": PROFILE}, json=log)
+                t0 = time.perf_counter()
+                await aget_progress(pid)
+                add_s.append(time.perf_counter() - t0)
+            if storage.progress_cache.stats()["appends"] < runs:
+                failures.append("add_log did not append to the cached columns")
+            failures += [f"after add_log: {m}" for m in check(await aget_progress(pid), reference(await storage.aget_log_rows(pid)))]
+
+            async def http():
+                r = await c.get("/progress", params={"profile_name": PROFILE})
+                r.raise_for_status()
+
+            http_s = await _timed(http, runs)
+
+    print(f"{'':<12}{'median ms':>10}")
+    for name, samples in (("reference", ref_s), ("compute", compute_s), ("cold", cold_s), ("warm", warm_s), ("add_log", add_s), ("http", http_s)):
+        print(f"{name:<12}{_median_ms(samples):>10.2f}")
+    print(f"\ncompute speed-up over the reference: {_median_ms(ref_s) / _median_ms(compute_s):.0f}x")
+
+    if _median_ms(cold_s) > budget_ms:
+        failures.append(f"cold /progress {_median_ms(cold_s):.0f} ms > budget {budget_ms:.0f} ms")
+    if failures:
+        print("\nFAILED:\n" + "\n".join(f"  {f}" for f in failures))
+        return 1
+    print("ok: every metric matches the reference")
+    return 0
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    ap.add_argument("--years", type=int, default=12)
+    ap.add_argument("--runs", type=int, default=20)
+    ap.add_argument("--budget-ms", type=float, default=float(os.getenv("PROGRESS_BUDGET_MS", "250")),
+                    help="median cold-request budget (PROGRESS_BUDGET_MS)")
+    args = ap.parse_args()
+    return asyncio.run(run(args.years, args.runs, args.budget_ms))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
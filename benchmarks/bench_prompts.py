@@ -0,0 +1,218 @@
+"""Prompt size before and after compaction, plus a check that nothing was lost.
+
+"before" is the old prompt builders (plan and logs interpolated with repr);
+"after" is graph.plan_explanation_prompt / weekly_review_prompt. Tokens use
+the same chars/4 estimate as the rate limiter.
+
+Every fact the explanation draws on must survive: each workout's day, title,
+duration and exercises, the nutrition fields, profile fields, preferences and
+warnings; the compact log table must parse back to the original logs and the
+review fields must all appear. Any miss exits non-zero.
+
+    python -m benchmarks.bench_prompts
+"""
+import random
+import re
+import sys
+from datetime import date, timedelta
+from typing import Any, Dict, List, Tuple
+
+from backend.app.graph import (
+    LOG_COLUMNS, build_plan_graph, plan_explanation_prompt, weekly_review_prompt, weekly_review_rules,
+)
+from backend.app.ratelimit import estimate_tokens
+
+GOALS = ("lose_fat", "build_muscle", "improve_stamina")
+EQUIPMENT = ("bodyweight", "dumbbells", "gym")
+LEVELS = ("beginner", "intermediate")
+NOTES = ("", "", "", "knees a bit sore after squats", "short on time, did half", "great session | new PR")
+
+
+def legacy_plan_prompt(state) -> Tuple[str, str]:
+    p = state["profile"]
+    system = ("You are a practical fitness coach. Be concise and encouraging. "
+              "No medical advice. Do not invent user details.")
+    user = f"""
+User profile:
+- goal: {p['goal']}
+- level: {p['level']}
+- days_per_week: {p['days_per_week']}
+- session_minutes: {p['session_minutes']}
+- equipment: {p['equipment']}
+- weight_kg: {p.get('weight_kg')}
+- preferences: {p.get('preferences', {})}
+
+Safety warnings: {state.get('warnings', [])}
+
+Plan:
+{state['plan']}
+
+Write:
+1) 5 bullet points explaining why this plan fits this user.
+2) 3 personalization tips aligned with equipment and time.
+3) One fallback rule for missed sessions.
+
+Keep it realistic.
+"""
+    return system, user
+
+
+def legacy_review_prompt(state) -> Tuple[str, str]:
+    system = ("You are a fitness coach writing a weekly reflection. "
+              "Be specific, non-judgmental, and actionable. No medical advice. "
+              "Don't invent facts not present in logs/review.")
+    user = f"""
+Deterministic review:
+{state.get('review', {})}
+
+Logs:
+{state.get('logs', [])[-14:]}
+
+Write:
+- 3 observations based only on logs
+- 2 likely friction points (if unclear, say 'possibly')
+- 3 small changes for next week
+- a 1–2 sentence motivational closer
+"""
+    return system, user
+
+
+def _tokens(prompt: Tuple[str, str]) -> int:
+    return sum(estimate_tokens(part) for part in prompt)
+
+
+def _plan_states() -> List[Dict[str, Any]]:
+    graph = build_plan_graph(with_llm=False)
+    rnd = random.Random(3)
+    states = []
+    for goal in GOALS:
+        for eq in EQUIPMENT:
+            for level in LEVELS:
+                for days in range(1, 8):
+                    prefs = {"injuries": "left knee"} if rnd.random() < 0.3 else {}
+                    profile = {"name": "Bench", "goal": goal, "level": level, "days_per_week": days,
+                               "session_minutes": rnd.choice((30, 45, 60, 120)), "equipment": eq,
+                               "weight_kg": rnd.choice((None, 72.5, 95.0)), "preferences": prefs}
+                    states.append(graph.invoke({"profile": profile}))
+    return states
+
+
+def _review_states() -> List[Dict[str, Any]]:
+    rnd = random.Random(5)
+    states = []
+    for n in (0, 3, 7, 14):
+        for _ in range(10):
+            logs = [{"date": (date(2026, 3, 1) + timedelta(days=i)).isoformat(),
+                     "workout_done": rnd.random() < 0.6,
+                     "steps": rnd.choice((None, rnd.randrange(2000, 14000))),
+                     "weight_kg": rnd.choice((None, None, round(rnd.uniform(70, 80), 1))),
+                     "notes": rnd.choice(NOTES)} for i in range(n)]
+            rnd.shuffle(logs)  # storage returns newest first; order shouldn't matter
+            states.append(weekly_review_rules({"logs": logs}))
+    return states
+
+
+def check_plan(state, user: str) -> List[str]:
+    misses = []
+    p, plan = state["profile"], state["plan"]
+    head = user.split("\nPlan:\n")[0]
+    for k in ("goal", "level", "days_per_week", "session_minutes", "equipment", "weight_kg"):
+        if p.get(k) is not None and f"{k}: {p[k]}" not in head:
+            misses.append(f"profile {k}")
+    for k, v in p.get("preferences", {}).items():
+        if f"{k}: {v}" not in head:
+            misses.append(f"preference {k}")
+    for w in state.get("warnings", []):
+        if w not in head:
+            misses.append(f"warning {w!r}")
+
+    lines = {}
+    for line in user.split("\nPlan:\n")[1].splitlines():
+        m = re.match(r"Days (.+?) \((\d+) min\): (.*)$", line)
+        if not m:
+            continue
+        for group in m.group(1).split(", "):
+            days, title = group.split(" ", 1)
+            for d in days.split("/"):
+                lines[int(d)] = (title, int(m.group(2)), m.group(3))
+    for w in plan["workouts"]:
+        found = lines.get(w["day"])
+        if found is None:
+            misses.append(f"day {w['day']}")
+            continue
+        title, minutes, body = found
+        s = w["session"]
+        if title != w["title"] or minutes != w["duration_minutes"]:
+            misses.append(f"day {w['day']} title/duration")
+        for item in [f"warmup {s['warmup']}", f"cooldown {s['cooldown']}", *s["main"]]:
+            if item not in body:
+                misses.append(f"day {w['day']} {item!r}")
+
+    nutrition = next((l for l in user.splitlines() if l.startswith("Nutrition: ")), "")
+    n = plan["nutrition"]
+    for item in [n["notes"], *n["plate_method"]] + ([str(n["protein_g_per_day"])] if n["protein_g_per_day"] else []):
+        if item not in nutrition:
+            misses.append(f"nutrition {item!r}")
+    return misses
+
+
+def _parse_log_table(user: str) -> List[Dict[str, Any]]:
+    if "\nLogs: none\n" in user:
+        return []
+    block = user.split("Logs (workout_done y/n):\n")[1].split("\n\n")[0]
+    header, *rows = block.splitlines()
+    cols = header.split("|")
+    return [dict(zip(cols, row.split("|"))) for row in rows]
+
+
+def check_review(state, user: str) -> List[str]:
+    misses = [f"review {k}" for k, v in state["review"].items() if f"{k}: {v}" not in user]
+    parsed = _parse_log_table(user)
+    expected = sorted(state["logs"][-14:], key=lambda l: l["date"])
+    if len(parsed) != len(expected):
+        return misses + [f"{len(parsed)} log rows, expected {len(expected)}"]
+    for got, log in zip(parsed, expected):
+        for c in LOG_COLUMNS:
+            v = log.get(c)
+            want = ("y" if v else "n") if isinstance(v, bool) else "" if v is None else " ".join(
+                str(v).replace("|", "/").split())
+            if got.get(c, "") != want:
+                misses.append(f"log {log['date']} {c}: {got.get(c)!r} != {want!r}")
+    return misses
+
+
+def main() -> int:
+    failures = []
+    by_days: Dict[int, List[Tuple[int, int]]] = {}
+    for state in _plan_states():
+        before, after = _tokens(legacy_plan_prompt(state)), _tokens(plan_explanation_prompt(state))
+        by_days.setdefault(state["profile"]["days_per_week"], []).append((before, after))
+        failures += [f"plan {state['profile']}: {m}" for m in check_plan(state, plan_explanation_prompt(state)[1])]
+
+    by_logs: Dict[int, List[Tuple[int, int]]] = {}
+    for state in _review_states():
+        before, after = _tokens(legacy_review_prompt(state)), _tokens(weekly_review_prompt(state))
+        by_logs.setdefault(len(state["logs"]), []).append((before, after))
+        failures += [f"review ({len(state['logs'])} logs): {m}" for m in check_review(state, weekly_review_prompt(state)[1])]
+
+    print(f"{'plan explanation prompt':<26}{'before':>9}{'after':>9}{'saved':>8}")
+    for label, groups in (("days_per_week", by_days), ("logs", by_logs)):
+        for key, pairs in sorted(groups.items()):
+            before = sum(b for b, _ in pairs) / len(pairs)
+            after = sum(a for _, a in pairs) / len(pairs)
+            print(f"{f'{label}={key}':<26}{before:>9.0f}{after:>9.0f}{1 - after / before:>8.0%}")
+            if after > before:
+                failures.append(f"{label}={key}: compact prompt is larger ({after:.0f} > {before:.0f})")
+        if label == "days_per_week":
+            print(f"\n{'weekly review prompt':<26}{'before':>9}{'after':>9}{'saved':>8}")
+
+    if failures:
+        print(f"\n{len(failures)} problems:")
+        print("\n".join(f"  {f}" for f in failures[:50]))
+        return 1
+    print("\nall plan and log facts preserved")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
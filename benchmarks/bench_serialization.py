@@ -0,0 +1,74 @@
+"""Per-request JSON cost of POST /plan, before and after the orjson layer.
+
+"before" is the old path: json.dumps for the profile, plan and warnings
+columns, then PlanOut (free-form plan dict) validated and rendered through
+JSONResponse. "after" encodes each document once with orjson and splices the
+same bytes into the response. Also times validating the typed PlanOut.
+
+    python -m benchmarks.bench_serialization
+"""
+import json
+import timeit
+from typing import Dict, List, Optional
+
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel, Field
+
+from backend.app.graph import build_plan_graph
+from backend.app.schemas import PlanOut, ProfileIn
+from backend.app.serialization import Fragment, JSONBytesResponse, dumps
+
+N = 5000
+
+
+class LegacyPlanOut(BaseModel):
+    profile: ProfileIn
+    plan: Dict
+    warnings: List[str] = Field(default_factory=list)
+    plan_id: Optional[int] = None
+
+
+def _fixture():
+    profile = ProfileIn(name="Bench", goal="build_muscle", level="intermediate", days_per_week=6,
+                        session_minutes=60, equipment="gym", weight_kg=82.5, preferences={"diet": "vegetarian"})
+    out = build_plan_graph(with_llm=False).invoke({"profile": profile.model_dump()})
+    out["plan"]["explanation"] = "• Fits a 6-day gym schedule with progressive overload. " * 12
+    return profile, out["plan"], out["warnings"]
+
+
+def before(profile, plan, warnings):
+    stored = [json.dumps(x, ensure_ascii=False) for x in (profile.model_dump(), plan, warnings)]
+    body = LegacyPlanOut(profile=profile, plan=plan, warnings=warnings, plan_id=1).model_dump(mode="json")
+    return stored, JSONResponse(body).body
+
+
+def after(profile, plan, warnings):
+    stored = [dumps(x) for x in (profile.model_dump(), plan, warnings)]
+    body = dumps({"profile": Fragment(stored[0]), "plan": Fragment(stored[1]),
+                  "warnings": Fragment(stored[2]), "plan_id": 1})
+    return stored, JSONBytesResponse(body).body
+
+
+def main() -> None:
+    profile, plan, warnings = _fixture()
+    b_stored, b_body = before(profile, plan, warnings)
+    a_stored, a_body = after(profile, plan, warnings)
+    assert json.loads(b_body) == json.loads(a_body)
+
+    print(f"{'path':<26}{'us/request':>12}{'stored bytes':>14}{'response bytes':>16}")
+    for label, fn, stored, body in [("before (json + Dict)", before, b_stored, b_body),
+                                    ("after (orjson, once)", after, a_stored, a_body)]:
+        us = timeit.timeit(lambda: fn(profile, plan, warnings), number=N) / N * 1e6
+        size = sum(len(s.encode() if isinstance(s, str) else s) for s in stored)
+        print(f"{label:<26}{us:>12.1f}{size:>14}{len(body):>16}")
+
+    # What response_model validation would cost on each model (the endpoint now skips it)
+    doc = json.loads(a_body)
+    print(f"\n{'PlanOut validate + dump':<26}{'us/request':>12}")
+    for label, model in [("typed plan", PlanOut), ("free-form Dict", LegacyPlanOut)]:
+        us = timeit.timeit(lambda: model.model_validate(doc).model_dump(mode="json"), number=N) / N * 1e6
+        print(f"{label:<26}{us:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""Cold start: time from process launch to the first answered request.
+
+Each run is a fresh interpreter that imports backend.app.main, runs the
+startup hook against an existing SQLite database (schema already current)
+and answers one POST /log, the kind of request a freshly scaled-up worker
+or a CLI sees first. The ASGI app is driven directly so no HTTP client is
+imported. The median over --runs must stay under --budget-ms, and the
+langgraph / langchain_core / groq / httpx / numpy imports must still be deferred
+after that request; either failure exits non-zero.
+
+A `python -X importtime` breakdown (self time summed per top-level package)
+shows where import time goes, followed by the first rule-only /plan, which
+pays for compiling the graph.
+
+    python -m benchmarks.bench_startup [--runs 5] [--budget-ms 1500]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LAZY = ("langgraph", "langchain_core", "groq", "httpx", "numpy", "pyarrow")
+
+CHILD = r"""
+import asyncio, json, sys, time
+t_start = time.time()
+from backend.app.main import app
+t_import = time.time()
+
+async def call(method, path, query=b"", body=b""):
+    scope = {"type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": method,
+             "scheme": "http", "path": path, "raw_path": path.encode(), "query_string": query,
+             "headers": [(b"content-type", b"application/json"), (b"host", b"bench")],
+             "client": ("127.0.0.1", 1), "server": ("bench", 80)}
+    sent, status = [False], [0]
+    async def receive():
+        if sent[0]:
+            await asyncio.sleep(3600)
+        sent[0] = True
+        return {"type": "http.request", "body": body, "more_body": False}
+    async def send(message):
+        if message["type"] == "http.response.start":
+            status[0] = message["status"]
+    await app(scope, receive, send)
+    return status[0]
+
+async def main():
+    async with app.router.lifespan_context(app):
+        t_ready = time.time()
+        status = await call("POST", "/log", b"profile_name=bench", b'{"date": "2026-01-05", "workout_done": true}')
+        t_first = time.time()
+        lazy = [m for m in LAZY if m in sys.modules]
+        plan = {"name": "bench", "goal": "lose_fat", "level": "beginner", "days_per_week": 3,
+                "session_minutes": 45, "equipment": "bodyweight", "weight_kg": None, "preferences": {}}
+        t0 = time.time()
+        plan_status = await call("POST", "/plan", b"explain=background", json.dumps(plan).encode())
+        t_plan = time.time() - t0
+    print(json.dumps({"start": t_start, "import": t_import, "ready": t_ready, "first": t_first,
+                      "status": status, "loaded": lazy, "plan_s": t_plan, "plan_status": plan_status}))
+
+asyncio.run(main())
+"""
+
+
+def _run_child(env: Dict[str, str]) -> Dict[str, float]:
+    launched = time.time()
+    out = subprocess.run([sys.executable, "-c", f"LAZY = {LAZY!r}\n" + CHILD], cwd=ROOT, env=env,
+                         capture_output=True, text=True, check=True)
+    r = json.loads(out.stdout.strip().splitlines()[-1])
+    if r["status"] != 200:
+        raise RuntimeError(f"first request returned {r['status']}: {out.stderr[-2000:]}")
+    return {
+        "interpreter_ms": (r["start"] - launched) * 1e3,
+        "import_ms": (r["import"] - r["start"]) * 1e3,
+        "startup_ms": (r["ready"] - r["import"]) * 1e3,
+        "first_request_ms": (r["first"] - r["ready"]) * 1e3,
+        "total_ms": (r["first"] - launched) * 1e3,
+        "first_plan_ms": r["plan_s"] * 1e3,
+        "loaded": r["loaded"],
+    }
+
+
+def _importtime(env: Dict[str, str]) -> List[Tuple[str, float]]:
+    out = subprocess.run([sys.executable, "-X", "importtime", "-c", "import backend.app.main"], cwd=ROOT,
+                         env=env, capture_output=True, text=True, check=True)
+    by_package: Dict[str, float] = defaultdict(float)
+    for line in out.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, _, name = line[len("import time:"):].split("|")
+        name = name.strip()
+        top = ".".join(name.split(".")[:2]) if name.startswith("backend.") else name.split(".")[0]
+        by_package[top] += int(self_us) / 1e3
+    return sorted(by_package.items(), key=lambda kv: -kv[1])
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    ap.add_argument("--runs", type=int, default=5)
+    ap.add_argument("--budget-ms", type=float, default=float(os.getenv("STARTUP_BUDGET_MS", "1500")),
+                    help="median launch-to-first-response budget (STARTUP_BUDGET_MS)")
+    args = ap.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="bench_startup_")
+    env = {**os.environ, "DB_URL": f"sqlite:///{tmp}/startup.db", "TRACE_SPANS_PATH": "", "WARM_GRAPHS": "0"}
+
+    fresh = _run_child(env)  # creates the schema; later runs find it current
+    runs = [_run_child(env) for _ in range(args.runs)]
+
+    phases = ("interpreter_ms", "import_ms", "startup_ms", "first_request_ms", "total_ms", "first_plan_ms")
+    print(f"{'phase (median of ' + str(args.runs) + ')':<26}{'ms':>9}{'fresh db':>11}")
+    for p in phases:
+        print(f"{p:<26}{statistics.median(r[p] for r in runs):>9.1f}{fresh[p]:>11.1f}")
+
+    print("\nimport self-time by package (ms)")
+    for name, ms in _importtime(env)[:12]:
+        print(f"  {name:<32}{ms:>8.1f}")
+
+    failures = []
+    total = statistics.median(r["total_ms"] for r in runs)
+    if total > args.budget_ms:
+        failures.append(f"time to first request {total:.0f} ms > budget {args.budget_ms:.0f} ms")
+    loaded = sorted({m for r in runs for m in r["loaded"]})
+    if loaded:
+        failures.append(f"imported before they were needed: {', '.join(loaded)}")
+    if failures:
+        print("\nFAILED:\n" + "\n".join(f"  {f}" for f in failures))
+        return 1
+    print(f"\nok: {total:.0f} ms to first request (budget {args.budget_ms:.0f} ms), {', '.join(LAZY)} deferred")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,49 @@
+"""Overhead of the telemetry layer.
+
+Times a trivial function bare, wrapped with telemetry.traced (metrics only),
+and wrapped with span export to a temp file; then the rule-only plan graph,
+whose nodes are all traced.
+
+    python -m benchmarks.bench_telemetry
+"""
+import os
+import tempfile
+import timeit
+
+from backend.app import telemetry
+from backend.app.graph import build_plan_graph
+
+N = 200_000
+
+
+def noop(x):
+    return x
+
+
+def main() -> None:
+    traced = telemetry.traced("bench")(noop)
+    bare_us = timeit.timeit(lambda: noop(1), number=N) / N * 1e6
+    metrics_us = timeit.timeit(lambda: traced(1), number=N) / N * 1e6
+
+    with tempfile.TemporaryDirectory() as tmp:
+        telemetry.set_exporter(telemetry.SpanFileExporter(os.path.join(tmp, "spans.jsonl")))
+        spans_us = timeit.timeit(lambda: traced(1), number=N // 10) / (N // 10) * 1e6
+
+        graph = build_plan_graph(with_llm=False)
+        profile = {"name": "Bench", "goal": "build_muscle", "level": "beginner", "days_per_week": 4,
+                   "session_minutes": 60, "equipment": "gym", "weight_kg": 80.0, "preferences": {}}
+        run = lambda: graph.invoke({"profile": dict(profile)})
+        graph_spans_us = timeit.timeit(run, number=2000) / 2000 * 1e6
+        telemetry.set_exporter(None)
+        graph_us = timeit.timeit(run, number=2000) / 2000 * 1e6
+
+    print(f"{'call':<34}{'us/call':>10}")
+    print(f"{'bare function':<34}{bare_us:>10.2f}")
+    print(f"{'traced (metrics)':<34}{metrics_us:>10.2f}")
+    print(f"{'traced (metrics + span export)':<34}{spans_us:>10.2f}")
+    print(f"{'plan rules graph (metrics)':<34}{graph_us:>10.1f}")
+    print(f"{'plan rules graph (+ span export)':<34}{graph_spans_us:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
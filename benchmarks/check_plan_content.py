@@ -0,0 +1,127 @@
+"""Stored plan content and reviews across an LLM outage.
+
+Plans with the same inputs share one PlanContent row. This plans a profile
+while the (fake) provider is healthy, then makes the same plan again through
+/plans/batch, /plan/stream and /plan while every provider call fails, and
+checks that the first plan still returns its real explanation rather than the
+template fallback. A fallback stored for new inputs during the outage must
+still be replaced once the provider recovers. A profile the safety check caps
+must be stored by /plan/stream under the same content key as /plan, with the
+submitted (uncapped) profile as its snapshot.
+
+With only the offline stub (a last-resort provider) answering, plans and
+reviews must take the same fallback path: template text with
+explanation_error, and no stored review. Any failure exits non-zero.
+
+    python -m benchmarks.check_plan_content
+"""
+import asyncio
+import os
+import sys
+import tempfile
+from typing import Any, Dict, List
+
+_TMP = tempfile.mkdtemp(prefix="check_plan_content_")
+os.environ["DB_URL"] = f"sqlite:///{_TMP}/content.db"
+os.environ.setdefault("TRACE_SPANS_PATH", "")
+# One attempt per call and no breaker, so every call during the outage really fails
+os.environ["LLM_MAX_RETRIES"] = "0"
+os.environ["LLM_BREAKER_FAILURES"] = "0"
+
+import httpx
+from sqlalchemy import func, select
+from sqlmodel import Session
+
+from backend.app import llm, storage
+from backend.app.graph import profile_fingerprint
+from backend.app.main import app
+from backend.app.providers import Router, provider_from_env
+from backend.app.schemas import ProfileIn
+from benchmarks.fake_llm import FakeProvider
+
+PROFILE = {"goal": "build_muscle", "level": "intermediate", "days_per_week": 4, "session_minutes": 60,
+           "equipment": "gym", "weight_kg": 80, "preferences": {}}
+
+
+async def _plan(c: httpx.AsyncClient, plan_id: int) -> Dict[str, Any]:
+    r = await c.get(f"/plans/{plan_id}")
+    r.raise_for_status()
+    return r.json()["plan"]
+
+
+async def run() -> int:
+    provider = FakeProvider(latency_ms=5, jitter_ms=0).install()
+    llm.set_cache(None)
+    failures: List[str] = []
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://check", timeout=None) as c:
+            alice = (await c.post("/plan", json={"name": "alice", **PROFILE})).json()
+            good = alice["plan"].get("explanation")
+            if not good or "explanation_error" in alice["plan"]:
+                failures.append(f"healthy /plan was not explained: {alice['plan']}")
+
+            provider.error_rate = 1.0
+            await c.post("/plans/batch", json=[{"name": "bob", **PROFILE}])
+            await c.post("/plan/stream", json={"name": "sam", **PROFILE})
+            await c.post("/plan", json={"name": "carol", **PROFILE})
+            after = await _plan(c, alice["plan_id"])
+            if after.get("explanation") != good or "explanation_error" in after:
+                failures.append(f"outage replaced alice's explanation: {after.get('explanation_error')!r}")
+
+            # New inputs during the outage get the fallback; a healthy run upgrades it
+            other = {**PROFILE, "goal": "lose_fat"}
+            erin = (await c.post("/plan", json={"name": "erin", **other})).json()
+            if "explanation_error" not in erin["plan"]:
+                failures.append("the fake outage did not produce a fallback")
+            provider.error_rate = 0.0
+            await c.post("/plan", json={"name": "frank", **other})
+            upgraded = await _plan(c, erin["plan_id"])
+            if "explanation_error" in upgraded:
+                failures.append("a healthy run did not replace the stored fallback")
+
+            capped = {**PROFILE, "level": "beginner", "days_per_week": 7, "session_minutes": 120}
+            await c.post("/plan/stream", json={"name": "jade", **capped})
+            content = await storage.aget_plan_content(profile_fingerprint(ProfileIn(name="jade", **capped).model_dump()))
+            if content is None or not content["explained"]:
+                failures.append("/plan/stream stored a capped plan under a different key than /plan")
+            latest = (await c.get("/plans/jade/latest")).json()["profile"]
+            if (latest["days_per_week"], latest["session_minutes"]) != (7, 120):
+                failures.append(f"/plan/stream stored the capped profile as its snapshot: {latest}")
+
+            # Only the stub answers: its text is a placeholder, not an explanation or coach notes
+            llm.set_router(Router([provider_from_env("stub")]))
+            stub = {**PROFILE, "goal": "improve_stamina"}
+            gina = (await c.post("/plan", json={"name": "gina", **stub})).json()["plan"]
+            streamed = (await c.post("/plan/stream", json={"name": "hank", **stub})).text
+            content = await storage.aget_plan_content(profile_fingerprint(ProfileIn(name="gina", **stub).model_dump()))
+            if "explanation_error" not in gina or "offline stub" in gina.get("explanation", ""):
+                failures.append(f"/plan used stub text as the explanation: {gina.get('explanation')!r}")
+            if "offline stub" in streamed:
+                failures.append("/plan/stream sent stub text instead of the template")
+            if content is None or content["explained"]:
+                failures.append("stub output was stored as explained plan content")
+            await c.post("/log", params={"profile_name": "ivy"}, json={"date": "2026-01-05", "workout_done": True})
+            review = (await c.get("/review", params={"profile_name": "ivy"})).json()
+            streamed = (await c.get("/review/stream", params={"profile_name": "ivy"})).text
+            with Session(storage.db.engine) as s:
+                stored = s.exec(select(func.count()).select_from(storage.Review)).one()[0]
+            if "offline stub" in review["coach_notes"] or "offline stub" in streamed:
+                failures.append("a review used stub text as coach notes")
+            if stored:
+                failures.append(f"{stored} review(s) generated by the stub were stored")
+
+    print(f"fake provider: {provider.stats()}")
+    if failures:
+        print("FAILED:\n" + "\n".join(f"  {f}" for f in failures))
+        return 1
+    print("ok: outages and stub output never replace or become stored explanations and reviews")
+    return 0
+
+
+def main() -> int:
+    return asyncio.run(run())
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,125 @@
+"""Local stand-in for the provider's chat.completions surface.
+
+Implements the calls llm.py makes (sync, async and stream=True) with
+configurable latency, jitter and error rate, honours the per-call timeout,
+and reports usage the way Groq
+does (on the response, and under x_groq on the last stream chunk). Install it
+with llm.set_client(); nothing leaves the process.
+
+    from benchmarks.fake_llm import FakeProvider
+    FakeProvider(latency_ms=300, jitter_ms=100, error_rate=0.02).install()
+"""
+import asyncio
+import os
+import random
+import threading
+import time
+from types import SimpleNamespace
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from backend.app import llm
+from backend.app.ratelimit import estimate_tokens
+
+WORDS = ("Keep the load progressive and the rest days honest; consistency beats intensity over a "
+         "training block, so hit the planned sessions, eat enough protein and sleep well.").split()
+
+
+class FakeProviderError(RuntimeError):
+    """Raised for injected failures, like an upstream 5xx."""
+
+    status_code = 503
+
+
+class _Completions:
+    def __init__(self, provider: "FakeProvider", is_async: bool):
+        self._p, self._async = provider, is_async
+
+    def create(self, model: str, messages: List[Dict[str, str]], temperature: float = 0.3,
+               stream: bool = False, timeout: Optional[float] = None, **_: Any) -> Any:
+        if self._async:
+            return self._p._acreate(messages, stream, timeout)
+        delay, fail = self._p._draw()
+        if timeout is not None and delay > timeout:
+            time.sleep(timeout)
+            raise TimeoutError("fake provider request timed out")
+        time.sleep(delay)
+        if fail:
+            raise FakeProviderError("injected provider error")
+        return self._p._response(messages)
+
+
+class FakeProvider:
+    """Fake chat.completions with latency ~ U(latency - jitter, latency + jitter)."""
+
+    def __init__(self, latency_ms: float = 250.0, jitter_ms: float = 100.0, error_rate: float = 0.0,
+                 completion_tokens: int = 120, stream_chunks: int = 24, seed: Optional[int] = None):
+        self.latency_ms, self.jitter_ms, self.error_rate = latency_ms, jitter_ms, error_rate
+        self.completion_tokens, self.stream_chunks = completion_tokens, stream_chunks
+        self._rnd = random.Random(seed)
+        self._lock = threading.Lock()
+        self.calls = self.errors = 0
+        self.sync = SimpleNamespace(chat=SimpleNamespace(completions=_Completions(self, False)))
+        self.aio = SimpleNamespace(chat=SimpleNamespace(completions=_Completions(self, True)))
+
+    @classmethod
+    def from_env(cls, seed: Optional[int] = None) -> "FakeProvider":
+        return cls(
+            latency_ms=float(os.getenv("FAKE_LLM_LATENCY_MS", "250")),
+            jitter_ms=float(os.getenv("FAKE_LLM_JITTER_MS", "100")),
+            error_rate=float(os.getenv("FAKE_LLM_ERROR_RATE", "0")),
+            seed=seed,
+        )
+
+    def install(self) -> "FakeProvider":
+        llm.set_client(self.sync, self.aio)
+        return self
+
+    def stats(self) -> Dict[str, int]:
+        return {"calls": self.calls, "errors": self.errors}
+
+    def _draw(self):
+        with self._lock:
+            self.calls += 1
+            delay = max(0.0, self.latency_ms + self._rnd.uniform(-self.jitter_ms, self.jitter_ms)) / 1e3
+            fail = self._rnd.random() < self.error_rate
+            self.errors += fail
+        return delay, fail
+
+    def _text(self) -> str:
+        n = self.completion_tokens
+        return " ".join(WORDS[i % len(WORDS)] for i in range(n))
+
+    def _usage(self, messages: List[Dict[str, str]]) -> SimpleNamespace:
+        prompt = sum(estimate_tokens(m["content"]) for m in messages)
+        return SimpleNamespace(prompt_tokens=prompt, completion_tokens=self.completion_tokens,
+                               total_tokens=prompt + self.completion_tokens)
+
+    def _response(self, messages: List[Dict[str, str]]) -> SimpleNamespace:
+        message = SimpleNamespace(role="assistant", content=self._text())
+        return SimpleNamespace(choices=[SimpleNamespace(index=0, message=message, finish_reason="stop")],
+                               usage=self._usage(messages))
+
+    async def _acreate(self, messages: List[Dict[str, str]], stream: bool, timeout: Optional[float]) -> Any:
+        delay, fail = self._draw()
+        if timeout is not None and delay > timeout:
+            await asyncio.sleep(timeout)
+            raise TimeoutError("fake provider request timed out")
+        if not stream:
+            await asyncio.sleep(delay)
+            if fail:
+                raise FakeProviderError("injected provider error")
+            return self._response(messages)
+        # Time to first token is a third of the latency; the rest is spread over the chunks
+        await asyncio.sleep(delay / 3)
+        if fail:
+            raise FakeProviderError("injected provider error")
+        return self._astream(messages, delay * 2 / 3)
+
+    async def _astream(self, messages: List[Dict[str, str]], duration: float) -> AsyncIterator[Any]:
+        words = self._text().split(" ")
+        step = max(1, len(words) // self.stream_chunks)
+        for i in range(0, len(words), step):
+            await asyncio.sleep(duration / self.stream_chunks)
+            delta = SimpleNamespace(content=" ".join(words[i:i + step]) + " ")
+            yield SimpleNamespace(choices=[SimpleNamespace(index=0, delta=delta, finish_reason=None)], x_groq=None)
+        yield SimpleNamespace(choices=[], x_groq=SimpleNamespace(usage=self._usage(messages)))
@@ -0,0 +1,295 @@
+"""Scripted load against /plan, /log and /review with a fake LLM provider.
+
+Each scenario gets a fresh SQLite database, optionally seeded with logs, and
+drives the app in process (httpx over ASGI) either closed-loop (N clients
+sending back to back) or open-loop (Poisson arrivals at a fixed rate; latency
+is measured from the scheduled arrival, so queueing shows up). The provider
+is benchmarks.fake_llm with a fixed seed; the LLM response cache is off so
+every plan and review reaches it.
+
+Reports throughput, p50/p95/p99 latency and database growth per scenario and
+compares them with benchmarks/baselines/load_api.json; any regression beyond
+the tolerance makes the run exit non-zero.
+
+    python -m benchmarks.load_api                    # run all, check baselines
+    python -m benchmarks.load_api -k review          # scenarios whose name contains "review"
+    python -m benchmarks.load_api --update-baseline  # record this machine's numbers (median of 3 runs)
+
+FAKE_LLM_LATENCY_MS / FAKE_LLM_JITTER_MS / FAKE_LLM_ERROR_RATE shape the
+provider; baselines are only comparable under the same settings and machine.
+--scale changes request counts, and with them cache and stored-review hit
+rates, so a run is only checked against a baseline recorded at its scale.
+"""
+import argparse
+import asyncio
+import glob
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+# A fake provider has no quota; the concurrency cap stays at the app default
+os.environ.setdefault("LLM_RPM", "1000000")
+os.environ.setdefault("LLM_TPM", "1000000000")
+os.environ.setdefault("FAKE_LLM_LATENCY_MS", "200")
+os.environ.setdefault("FAKE_LLM_JITTER_MS", "50")
+# Steady-state numbers: compile the graphs at startup, not in the first request
+# (cold start is benchmarks.bench_startup's job)
+os.environ.setdefault("WARM_GRAPHS", "1")
+_TMP = tempfile.mkdtemp(prefix="bench_api_")
+os.environ["DB_URL"] = f"sqlite:///{_TMP}/import.db"
+
+import httpx
+import orjson
+
+from backend.app import llm, storage
+from backend.app.backends import SQLiteBackend
+from backend.app.main import _default_profile, app
+from backend.app.serialization import dumps, loads
+from benchmarks.fake_llm import FakeProvider
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baselines", "load_api.json")
+SEED_PROFILES = 100
+
+# name, endpoint, loop, concurrency (closed) or arrivals/s (open), requests, seeded logs
+SCENARIOS: List[Tuple[str, str, str, float, int, int]] = [
+    ("plan-closed-c1", "plan", "closed", 1, 20, 0),
+    ("plan-closed-c16", "plan", "closed", 16, 160, 0),
+    ("plan-open-20rps", "plan", "open", 20, 160, 0),
+    ("log-closed-c16-empty", "log", "closed", 16, 2000, 0),
+    ("log-closed-c16-50k", "log", "closed", 16, 2000, 50_000),
+    ("log-open-60rps-50k", "log", "open", 60, 1200, 50_000),
+    ("review-closed-c8-empty", "review", "closed", 8, 120, 0),
+    ("review-closed-c8-50k", "review", "closed", 8, 120, 50_000),
+    ("review-open-20rps-50k", "review", "open", 20, 160, 50_000),
+]
+
+GOALS = ("lose_fat", "build_muscle", "improve_stamina")
+EQUIPMENT = ("bodyweight", "dumbbells", "gym")
+START = date(2025, 1, 1)
+
+
+def _plan_request(rnd: random.Random) -> Tuple[str, str, Dict[str, Any], Any]:
+    # Weights make most fingerprints distinct, so plans are generated rather than reused
+    profile = {"name": f"user{rnd.randrange(SEED_PROFILES)}", "goal": rnd.choice(GOALS),
+               "level": rnd.choice(("beginner", "intermediate")), "days_per_week": rnd.randint(2, 6),
+               "session_minutes": rnd.choice((30, 45, 60, 75)), "equipment": rnd.choice(EQUIPMENT),
+               "weight_kg": round(rnd.uniform(50, 110), 1), "preferences": {}}
+    return "POST", "/plan", {}, profile
+
+
+def _log_request(rnd: random.Random) -> Tuple[str, str, Dict[str, Any], Any]:
+    log = {"date": (START + timedelta(days=rnd.randrange(730))).isoformat(), "workout_done": rnd.random() < 0.7,
+           "steps": rnd.randrange(2000, 14000), "weight_kg": round(rnd.uniform(60, 90), 1), "notes": ""}
+    return "POST", "/log", {"profile_name": f"user{rnd.randrange(SEED_PROFILES)}"}, log
+
+
+def _review_request(rnd: random.Random) -> Tuple[str, str, Dict[str, Any], Any]:
+    return "GET", "/review", {"profile_name": f"user{rnd.randrange(SEED_PROFILES)}"}, None
+
+
+REQUESTS = {"plan": _plan_request, "log": _log_request, "review": _review_request}
+
+
+async def _seed(n_logs: int) -> None:
+    rnd = random.Random(7)
+    per_profile = max(1, n_logs // SEED_PROFILES)
+    rows = []
+    for p in range(SEED_PROFILES):
+        for d in range(per_profile):
+            rows.append((f"user{p}", {"date": (START + timedelta(days=d)).isoformat(),
+                                      "workout_done": rnd.random() < 0.7, "steps": rnd.randrange(2000, 14000),
+                                      "weight_kg": round(rnd.uniform(60, 90), 1), "notes": ""}))
+    for i in range(0, len(rows), 10_000):
+        await storage.abulk_upsert_logs(rows[i:i + 10_000], _default_profile)
+
+
+def _db_bytes(backend: SQLiteBackend, path: str) -> int:
+    # Fold the WAL back in first so growth isn't masked by (or charged for) checkpoint timing
+    with backend.engine.connect() as conn:
+        conn.exec_driver_sql("PRAGMA wal_checkpoint(TRUNCATE)")
+    return sum(os.path.getsize(p) for p in glob.glob(path + "*"))
+
+
+def _pct(xs: List[float], q: float) -> float:
+    return xs[min(len(xs) - 1, int(len(xs) * q))] if xs else 0.0
+
+
+async def _send(client: httpx.AsyncClient, req, since: float, lat: List[float], errors: List[int]) -> None:
+    method, path, params, body = req
+    content = dumps(body) if body is not None else None
+    r = await client.request(method, path, params=params, content=content,
+                             headers={"content-type": "application/json"})
+    lat.append(time.perf_counter() - since)
+    if r.status_code >= 400:
+        errors.append(r.status_code)
+
+
+async def _closed(client, make, rnd, concurrency: int, n: int, lat, errors) -> None:
+    reqs = [make(rnd) for _ in range(n)]
+
+    async def worker() -> None:
+        while reqs:
+            req = reqs.pop()
+            await _send(client, req, time.perf_counter(), lat, errors)
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+
+
+async def _open(client, make, rnd, rate: float, n: int, lat, errors) -> None:
+    tasks = []
+    t0 = time.perf_counter()
+    at = 0.0
+    for _ in range(n):
+        at += rnd.expovariate(rate)
+        delay = t0 + at - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tasks.append(asyncio.create_task(_send(client, make(rnd), t0 + at, lat, errors)))
+    await asyncio.gather(*tasks)
+
+
+async def _run(scenario, scale: float) -> Dict[str, Any]:
+    name, endpoint, loop, level, n, seed_logs = scenario
+    n = max(1, int(n * scale))
+    path = os.path.join(tempfile.mkdtemp(prefix=f"{name}_", dir=_TMP), "bench.db")
+    backend = SQLiteBackend(f"sqlite:///{path}")
+    storage.configure_backend(backend)
+    rnd = random.Random(name)
+    lat: List[float] = []
+    errors: List[int] = []
+    async with app.router.lifespan_context(app):
+        if seed_logs:
+            await _seed(seed_logs)
+        size_before = _db_bytes(backend, path)
+        transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            t0 = time.perf_counter()
+            if loop == "closed":
+                await _closed(client, REQUESTS[endpoint], rnd, int(level), n, lat, errors)
+            else:
+                await _open(client, REQUESTS[endpoint], rnd, level, n, lat, errors)
+            elapsed = time.perf_counter() - t0
+    growth = _db_bytes(backend, path) - size_before
+    await backend.adispose()
+    lat.sort()
+    return {
+        "requests": n,
+        "throughput_rps": round(n / elapsed, 2),
+        "p50_ms": round(_pct(lat, 0.50) * 1e3, 2),
+        "p95_ms": round(_pct(lat, 0.95) * 1e3, 2),
+        "p99_ms": round(_pct(lat, 0.99) * 1e3, 2),
+        "error_rate": round(len(errors) / n, 4),
+        "db_growth_bytes": growth,
+        "db_growth_per_request": round(growth / n, 1),
+    }
+
+
+def _print_row(name: str, r: Dict[str, Any]) -> None:
+    print(f"{name:<38}{r['requests']:>6}{r['throughput_rps']:>9.1f}{r['p50_ms']:>9.1f}"
+          f"{r['p95_ms']:>9.1f}{r['p99_ms']:>9.1f}{r['error_rate']:>7.1%}{r['db_growth_bytes'] / 1024:>9.0f}")
+
+
+def _median_result(runs: List[Dict[str, Any]]) -> Dict[str, Any]:
+    return {k: statistics.median(r[k] for r in runs) for k in runs[0]}
+
+
+async def _run_all(scenarios, scale: float, known: Dict[str, Any], tol: float, confirm: int, repeat: int):
+    # One event loop for everything: the LLM gate's primitives bind to the first loop that uses them
+    print(f"{'scenario':<38}{'reqs':>6}{'rps':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'err':>7}{'db +KiB':>9}")
+    results: Dict[str, Dict[str, Any]] = {}
+    failures: List[str] = []
+    for scenario in scenarios:
+        name = scenario[0]
+        runs = [await _run(scenario, scale) for _ in range(repeat)]
+        r = results[name] = runs[0] if repeat == 1 else _median_result(runs)
+        _print_row(name if repeat == 1 else f"{name} (median of {repeat})", r)
+        found = _regressions(name, r, known[name], tol) if name in known else []
+        # A regression has to reproduce; one noisy run on a shared machine doesn't count
+        for _ in range(confirm):
+            if not found:
+                break
+            r = await _run(scenario, scale)
+            _print_row(f"  (rerun) {name}", r)
+            found = _regressions(name, r, known[name], tol)
+        failures += found
+    return results, failures
+
+
+def _regressions(name: str, cur: Dict[str, Any], base: Dict[str, Any], tol: float) -> List[str]:
+    out = []
+    if cur["throughput_rps"] < base["throughput_rps"] * (1 - tol):
+        out.append(f"throughput {cur['throughput_rps']} < {base['throughput_rps']} rps")
+    # p99 rests on a handful of samples, so it gets twice the slack; the absolute
+    # 2 ms keeps jitter on fast endpoints from failing the run
+    for key, slack in (("p50_ms", tol), ("p95_ms", tol), ("p99_ms", 2 * tol)):
+        if cur[key] > base[key] * (1 + slack) + 2.0:
+            out.append(f"{key} {cur[key]} > {base[key]}")
+    if cur["error_rate"] > base["error_rate"] + 0.01:
+        out.append(f"error_rate {cur['error_rate']} > {base['error_rate']}")
+    if cur["db_growth_per_request"] > base["db_growth_per_request"] * (1 + tol) + 512:
+        out.append(f"db_growth_per_request {cur['db_growth_per_request']} > {base['db_growth_per_request']} B")
+    return [f"{name}: {r}" for r in out]
+
+
+def _load_baseline(path: str) -> Dict[str, Any]:
+    if not os.path.exists(path):
+        return {}
+    with open(path, "rb") as f:
+        return loads(f.read())
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    ap.add_argument("-k", dest="select", default="", help="only scenarios whose name contains this")
+    ap.add_argument("--scale", type=float, default=1.0, help="multiply request counts (e.g. 0.25 for a quick run)")
+    ap.add_argument("--baseline", default=BASELINE_PATH)
+    ap.add_argument("--tolerance", type=float, default=float(os.getenv("BENCH_TOLERANCE", "0.35")))
+    ap.add_argument("--confirm", type=int, default=1, help="re-runs a regressed scenario must also fail")
+    ap.add_argument("--update-baseline", action="store_true")
+    ap.add_argument("--repeat", type=int, default=3, help="runs per scenario when recording a baseline (median kept)")
+    args = ap.parse_args(argv)
+
+    provider = FakeProvider.from_env(seed=1234).install()
+    llm.set_cache(None)
+    fake = {"latency_ms": provider.latency_ms, "jitter_ms": provider.jitter_ms, "error_rate": provider.error_rate}
+
+    baseline = _load_baseline(args.baseline)
+    if baseline and baseline.get("fake_llm") != fake and not args.update_baseline:
+        print(f"note: baseline was recorded with fake_llm={baseline.get('fake_llm')}, this run uses {fake}")
+    same_scale = baseline.get("scale", 1.0) == args.scale
+    if baseline and not same_scale:
+        print(f"note: baseline was recorded at --scale {baseline.get('scale', 1.0):g}, this run uses "
+              f"{args.scale:g}; " + ("replacing it" if args.update_baseline else "not comparing"))
+
+    selected = [s for s in SCENARIOS if args.select in s[0]]
+    known = baseline.get("scenarios", {}) if same_scale and not args.update_baseline else {}
+    results, failures = asyncio.run(_run_all(selected, args.scale, known, args.tolerance, args.confirm,
+                                              args.repeat if args.update_baseline else 1))
+    print(f"fake provider: {provider.stats()}")
+
+    if args.update_baseline:
+        scenarios = dict(baseline.get("scenarios", {})) if same_scale else {}
+        scenarios.update(results)
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, "wb") as f:
+            f.write(orjson.dumps({"fake_llm": fake, "scale": args.scale, "scenarios": scenarios},
+                                 option=orjson.OPT_INDENT_2 | orjson.OPT_SORT_KEYS) + b"\n")
+        print(f"baseline written to {args.baseline}")
+        return 0
+
+    missing = [name for name in results if name not in known]
+    if missing and same_scale:
+        print(f"no baseline for: {', '.join(missing)}")
+    if failures:
+        print(f"\nREGRESSIONS (tolerance {args.tolerance:.0%}):")
+        print("\n".join(f"  {m}" for m in failures))
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
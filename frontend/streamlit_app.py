@@ -1,9 +1,13 @@
 import os
 import json
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
 import requests
 import streamlit as st
+from requests.adapters import HTTPAdapter
 from dotenv import load_dotenv
 from datetime import date
+from urllib.parse import quote
 
 load_dotenv()
 
@@ -20,19 +24,169 @@ api_base = st.sidebar.text_input("API Base URL", value=DEFAULT_API).rstrip("/")
 
 st.sidebar.markdown("---")
 st.sidebar.write("Available endpoints:")
-st.sidebar.code("/plan (POST)\n/log (POST)\n/review (GET)")
+st.sidebar.code("/plan (POST)\n/plan/stream (POST, SSE)\n/plans/{name}/latest (GET)\n/log (POST)\n/review (GET)\n/review/stream (GET, SSE)")
 
 # Helpers
 def pretty(obj) -> str:
     return json.dumps(obj, indent=2, ensure_ascii=False)
 
+@st.cache_resource
+def http() -> requests.Session:
+    # One keep-alive pool shared by every session and background job
+    s = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16)
+    s.mount("http://", adapter)
+    s.mount("https://", adapter)
+    return s
+
+@st.cache_resource
+def background() -> ThreadPoolExecutor:
+    return ThreadPoolExecutor(max_workers=8, thread_name_prefix="backend-call")
+
 def post_json(path: str, payload: dict, params: dict | None = None):
     url = f"{api_base}{path}"
-    return requests.post(url, params=params, json=payload, timeout=60)
+    return http().post(url, params=params, json=payload, timeout=60)
 
 def get_json(path: str, params: dict | None = None):
     url = f"{api_base}{path}"
-    return requests.get(url, params=params, timeout=60)
+    return http().get(url, params=params, timeout=60)
+
+def stream_events(method: str, url: str, payload: dict | None = None, params: dict | None = None):
+    """Yield (event, data) pairs from a server-sent events endpoint."""
+    with http().request(method, url, params=params, json=payload, stream=True, timeout=60) as r:
+        if r.status_code != 200:
+            raise RuntimeError(f"Backend error: {r.status_code}\n{r.text}")
+        r.encoding = "utf-8"
+        event, data = "message", []
+        for line in r.iter_lines(decode_unicode=True):
+            if line == "":
+                if data:
+                    yield event, json.loads("\n".join(data))
+                event, data = "message", []
+            elif line.startswith("event:"):
+                event = line[len("event:"):].strip()
+            elif line.startswith("data:"):
+                data.append(line[len("data:"):].lstrip())
+
+def fingerprint(*parts) -> str:
+    return hashlib.sha256(json.dumps(parts, sort_keys=True).encode()).hexdigest()[:16]
+
+class StreamJob:
+    """One SSE call (/plan/stream or /review/stream) running on the background pool.
+
+    `head` is the first structured event (plan or review), `text` the streamed
+    tokens so far; the page polls it across reruns instead of waiting on it.
+    """
+
+    def __init__(self, method: str, path: str, head_event: str, text_field: str,
+                 payload: dict | None = None, params: dict | None = None):
+        self.head: dict = {}
+        self.text = ""
+        self.error = ""
+        self._args = (method, f"{api_base}{path}", head_event, text_field, payload, params)
+        self.future = background().submit(self._run)
+
+    def _run(self) -> dict:
+        method, url, head_event, text_field, payload, params = self._args
+        try:
+            for event, data in stream_events(method, url, payload, params):
+                if event == head_event:
+                    self.head = data
+                elif event == "token":
+                    self.text += data
+                elif event == "done":
+                    self.text = data.get(text_field, self.text)
+                elif event == "error":
+                    self.error = str(data)
+        except Exception as e:
+            self.error = str(e)
+        return {"head": self.head, "text": self.text, "error": self.error}
+
+    def done(self) -> bool:
+        return self.future.done()
+
+# Finished results; an exception means "not cached yet" (st.cache_data doesn't cache those).
+# _job is excluded from the cache key, so later lookups only need the fingerprint.
+@st.cache_data(ttl=3600, max_entries=256, show_spinner=False)
+def _plan_result(api: str, key: str, _job: StreamJob | None = None) -> dict:
+    if _job is None or not _job.done() or _job.future.result()["error"]:
+        raise LookupError(key)
+    return _job.future.result()
+
+# Shorter TTL: logs saved from other clients don't clear this cache
+@st.cache_data(ttl=300, max_entries=256, show_spinner=False)
+def _review_result(api: str, key: str, _job: StreamJob | None = None) -> dict:
+    if _job is None or not _job.done() or _job.future.result()["error"]:
+        raise LookupError(key)
+    return _job.future.result()
+
+def cached(result_fn, key: str, job: StreamJob | None = None) -> dict | None:
+    try:
+        return result_fn(api_base, key, job)
+    except LookupError:
+        return None
+
+def show_result(result: dict, render, text_title: str, error_title: str) -> None:
+    render(result["head"])
+    st.markdown(f"### {text_title}")
+    st.markdown(result["text"])
+    if result["error"]:
+        st.error(error_title)
+        st.code(result["error"])
+    with st.expander("Full response JSON"):
+        st.code(pretty({**result["head"], "streamed_text": result["text"]}), language="json")
+
+def run_job(slot: str, result_fn, render, text_title: str, error_title: str) -> None:
+    """Show the result for session_state[slot] = (key, job), polling while the job streams."""
+    key, job = st.session_state.get(slot, (None, None))
+    if key is None:
+        return
+    if job is None or job.done():
+        result = cached(result_fn, key, job)
+        if result is not None:
+            # Served from st.cache_data from now on
+            st.session_state[slot] = (key, None)
+        elif job is not None:
+            result = job.future.result()  # failed; not cached, shown until the next request
+        else:
+            return
+        show_result(result, render, text_title, error_title)
+        return
+
+    # Only this fragment reruns while the job streams; the other tabs stay usable
+    @st.fragment(run_every=0.5)
+    def progress():
+        if job.done():
+            st.rerun()
+        if job.head:
+            render(job.head)
+        else:
+            st.info("Working on it… you can keep using the other tabs.")
+        st.markdown(f"### {text_title}")
+        st.markdown(job.text + "▌")
+
+    progress()
+
+def show_workouts(plan: dict) -> None:
+    for w in plan.get("workouts", []):
+        st.markdown(f"**Day {w['day']}: {w['title']}** ({w['duration_minutes']} min)")
+        st.write("\n".join(f"- {item}" for item in w["session"]["main"]))
+
+def show_plan(data: dict) -> None:
+    st.markdown("## 🏋️ Your Training Plan")
+    show_workouts(data.get("plan", {}))
+    warnings = data.get("warnings", [])
+    if warnings:
+        st.warning("Warnings")
+        st.code(pretty(warnings), language="json")
+
+def show_review(data: dict) -> None:
+    st.markdown("### Summary")
+    st.write(data.get("summary", ""))
+    st.markdown("### Adherence")
+    st.write(data.get("adherence", ""))
+    st.markdown("### Next Week Adjustment")
+    st.write(data.get("next_week_adjustment", ""))
 
 tabs = st.tabs(["🧠 Create Plan", "📅 Log Day", "📊 Weekly Review"])
 
@@ -42,6 +196,24 @@ tabs = st.tabs(["🧠 Create Plan", "📅 Log Day", "📊 Weekly Review"])
 with tabs[0]:
     st.subheader("Create a training plan")
 
+    saved_name = st.text_input("Show the last saved plan for", value="khushal", key="saved_plan_profile")
+    if st.button("Show saved plan"):
+        # Served from the backend's plan cache; nothing is regenerated
+        r = get_json(f"/plans/{quote(saved_name.strip() or 'User', safe='')}/latest")
+        if r.status_code == 200:
+            saved = r.json()
+            st.caption(f"Plan #{saved['plan_id']} saved {saved.get('created_at') or 'earlier'}")
+            show_workouts(saved["plan"])
+            if saved["plan"].get("explanation"):
+                st.markdown(saved["plan"]["explanation"])
+            with st.expander("Full response JSON"):
+                st.code(pretty(saved), language="json")
+        elif r.status_code == 404:
+            st.info("No saved plan for this profile yet.")
+        else:
+            st.error(f"Backend error: {r.status_code}")
+            st.code(r.text)
+
     with st.form("plan_form"):
         name = st.text_input("Name", value="khushal")
 
@@ -80,45 +252,12 @@ with tabs[0]:
             "weight_kg": None if weight_kg == 0.0 else float(weight_kg),
             "preferences": prefs,
         }
+        # Resubmitting the same profile reuses the cached plan instead of calling /plan again
+        key = fingerprint(profile)
+        job = None if cached(_plan_result, key) else StreamJob("POST", "/plan/stream", "plan", "explanation", payload=profile)
+        st.session_state["plan_job"] = (key, job)
 
-try:
-    with st.spinner("Generating plan..."):
-        r = post_json("/plan", profile)
-
-    if r.status_code == 200:
-        data = r.json()
-        st.success("Plan generated ✅")
-
-        #st.markdown("### Plan")
-        #st.code(pretty(data.get("plan", {})), language="json")
-        plan = data.get("plan", {})
-
-        st.markdown("## 🏋️ Your Training Plan")
-
-        if "week" in plan:
-            for day in plan["week"]:
-                st.markdown(f"### {day.get('day', 'Workout Day')}")
-                st.write(day.get("workout", ""))
-
-        if "explanation" in plan:
-            st.markdown("### Why this works")
-            st.write(plan["explanation"])
-
-        warnings = data.get("warnings", [])
-        if warnings:
-            st.warning("Warnings")
-            st.code(pretty(warnings), language="json")
-
-        with st.expander("Full response JSON"):
-            st.code(pretty(data), language="json")
-
-    else:
-        st.error(f"Backend error: {r.status_code}")
-        st.code(r.text)
-
-except Exception as e:
-    st.error("Request failed")
-    st.code(str(e))
+    run_job("plan_job", _plan_result, show_plan, "Why this works", "Explanation failed")
 
 # -------------------------
 # TAB 2: LOG DAY
@@ -151,6 +290,9 @@ with tabs[1]:
                 r = post_json("/log", payload, params={"profile_name": profile_name.strip() or "User"})
 
             if r.status_code == 200:
+                # Reviews are built from logs; plans aren't
+                _review_result.clear()
+                st.session_state.pop("review_job", None)
                 st.success("Log saved ✅")
                 st.code(pretty(r.json()), language="json")
             else:
@@ -170,35 +312,9 @@ with tabs[2]:
     profile_name = st.text_input("Profile name for review", value="khushal", key="review_profile")
 
     if st.button("Get Review"):
-        try:
-            with st.spinner("Reviewing..."):
-                r = get_json("/review", params={"profile_name": profile_name.strip() or "User"})
+        params = {"profile_name": profile_name.strip() or "User"}
+        key = fingerprint(params)
+        job = None if cached(_review_result, key) else StreamJob("GET", "/review/stream", "review", "coach_notes", params=params)
+        st.session_state["review_job"] = (key, job)
 
-            if r.status_code == 200:
-                data = r.json()
-                st.success("Review ready ✅")
-
-                st.markdown("### Summary")
-                st.write(data.get("summary", ""))
-
-                st.markdown("### Adherence")
-                st.write(data.get("adherence", ""))
-
-                st.markdown("### Next Week Adjustment")
-                st.write(data.get("next_week_adjustment", ""))
-
-                coach_notes = data.get("coach_notes", "")
-                if coach_notes:
-                    st.markdown("### Coach Notes")
-                    st.write(coach_notes)
-
-                with st.expander("Full response JSON"):
-                    st.code(pretty(data), language="json")
-
-            else:
-                st.error(f"Backend error: {r.status_code}")
-                st.code(r.text)
-
-        except Exception as e:
-            st.error("Request failed")
-            st.code(str(e))
+    run_job("review_job", _review_result, show_review, "Coach Notes", "Coach notes failed")